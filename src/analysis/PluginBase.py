@@ -1,8 +1,11 @@
 import logging
-from multiprocessing import Manager, Queue, Value
+import traceback
+from multiprocessing import Manager, Pipe, Process, Queue, Value
 from queue import Empty
 from time import time
+from typing import List, Optional, Tuple
 
+from analysis.plugin_metrics import PluginMetrics, get_resource_usage
 from helperFunctions.process import (
     ExceptionSafeProcess, check_worker_exceptions, start_single_worker, terminate_process_and_childs
 )
@@ -21,9 +24,19 @@ class AnalysisBasePlugin(BasePlugin):  # pylint: disable=too-many-instance-attri
     '''
     This is the base plugin. All plugins should be subclass of this.
     recursive flag: If True (default) recursively analyze included files
+    FULL_ISOLATION: If True each job runs in a new process (e.g. for crash-prone plugins).
+        Otherwise each worker keeps a persistent job process that is only respawned after a timeout or an exception
+    REQUIRED_ANALYSES: Results of other plugins that are read in addition to DEPENDENCIES (and file_type).
+        Only these results are sent to the plugin with each job
+    BATCH_SIZE: If > 1 each worker collects up to BATCH_SIZE jobs (waiting at most BATCH_TIMEOUT seconds for the
+        queue to fill) and analyzes them with one call of process_batch in its job process (ignored with FULL_ISOLATION)
     '''
     VERSION = 'not set'
     SYSTEM_VERSION = None
+    FULL_ISOLATION = False
+    REQUIRED_ANALYSES = []
+    BATCH_SIZE = 1
+    BATCH_TIMEOUT = 0.05
 
     timeout = None
 
@@ -35,8 +48,15 @@ class AnalysisBasePlugin(BasePlugin):  # pylint: disable=too-many-instance-attri
         self.out_queue = Queue()
         self.stop_condition = Value('i', 0)
         self.workers = []
-        self.thread_count = int(self.config[self.NAME]['threads'])
-        self.active = [Value('i', 0) for _ in range(self.thread_count)]
+        self.job_processes = {}  # only used inside the worker processes
+        self.unfinished_tasks = {}  # only used inside the worker processes
+        thread_count = int(self.config[self.NAME]['threads'])
+        self.configured_threads = thread_count
+        self.min_threads = max(min(self.config[self.NAME].getint('min_threads', thread_count), thread_count), 1)
+        self.max_threads = max(self.config[self.NAME].getint('max_threads', thread_count), thread_count)
+        self.worker_count = Value('i', thread_count)
+        self.active = [Value('i', 0) for _ in range(self.max_threads)]
+        self.metrics = PluginMetrics()
         if self.timeout is None:
             self.timeout = timeout
         self.register_plugin()
@@ -65,11 +85,20 @@ class AnalysisBasePlugin(BasePlugin):  # pylint: disable=too-many-instance-attri
         '''
         return file_object
 
+    def process_batch(self, file_objects: List[FileObject]) -> List[FileObject]:
+        '''
+        This function can be overwritten by plugins that analyze multiple objects at once more efficiently (see BATCH_SIZE)
+        '''
+        return [self.process_object(file_object) for file_object in file_objects]
+
     def analyze_file(self, file_object):
         fo = self.process_object(file_object)
         fo = self._add_plugin_version_and_timestamp_to_analysis_result(fo)
         return fo
 
+    def analyze_batch(self, file_objects: List[FileObject]) -> List[FileObject]:
+        return [self._add_plugin_version_and_timestamp_to_analysis_result(fo) for fo in self.process_batch(file_objects)]
+
     def _add_plugin_version_and_timestamp_to_analysis_result(self, fo):
         fo.processed_analysis[self.NAME].update(self.init_dict())
         return fo
@@ -112,43 +141,178 @@ class AnalysisBasePlugin(BasePlugin):  # pylint: disable=too-many-instance-attri
             self.config.add_section(self.NAME)
         if 'threads' not in self.config[self.NAME] or no_multithread:
             self.config.set(self.NAME, 'threads', '1')
+        if no_multithread:
+            self.config.remove_option(self.NAME, 'min_threads')
+            self.config.remove_option(self.NAME, 'max_threads')
+
+    @property
+    def thread_count(self):
+        return self.worker_count.value
 
     def start_worker(self):
         for process_index in range(self.thread_count):
             self.workers.append(start_single_worker(process_index, 'Analysis', self.worker))
         logging.debug('{}: {} worker threads started'.format(self.NAME, len(self.workers)))
 
+    def scale_workers(self, worker_count: int) -> int:
+        '''
+        Change the number of workers (limited to min_threads and max_threads) and return the new number.
+        Surplus workers stop after their current job (or batch) and do not take further jobs. Queued jobs stay in the
+        in_queue shared by all workers, so the remaining workers (at least one) process them and return their results
+        '''
+        self.worker_count.value = min(max(worker_count, self.min_threads), self.max_threads)
+        self._remove_stopped_workers()
+        running_workers = {self._get_worker_id(process) for process in self.workers}
+        for worker_id in range(self.thread_count):
+            if worker_id not in running_workers:
+                self.workers.append(start_single_worker(worker_id, 'Analysis', self.worker))
+        return self.thread_count
+
+    def _remove_stopped_workers(self):
+        for process in [process for process in self.workers if process.exitcode == 0]:
+            process.join()
+            self.workers.remove(process)
+
+    @staticmethod
+    def _get_worker_id(process):
+        return int(process.name.split('-')[-1])
+
     def process_next_object(self, task, result):
         task.processed_analysis.update({self.NAME: {}})
         finished_task = self.analyze_file(task)
         result.append(finished_task)
 
+    def process_next_batch(self, tasks, result):
+        for task in tasks:
+            task.processed_analysis.update({self.NAME: {}})
+        result.extend(self.analyze_batch(tasks))
+
     @staticmethod
     def timeout_happened(process):
         return process.is_alive()
 
     def worker_processing_with_timeout(self, worker_id, next_task):
+        '''
+        the resource usage of the job process is measured after it was joined but before the manager is shut down,
+        so that it does not include the manager process
+        '''
+        start_time = time()
         manager = Manager()
         result = manager.list()
         process = ExceptionSafeProcess(target=self.process_next_object, args=(next_task, result))
+        start_cpu_time, _ = get_resource_usage(children_only=True)
         process.start()
         process.join(timeout=self.timeout)
+        error, finished_task = None, None
         if self.timeout_happened(process):
-            self._handle_failed_analysis(next_task, process, worker_id, 'Timeout')
+            error = 'Timeout'
         elif process.exception:
-            self._handle_failed_analysis(next_task, process, worker_id, 'Exception')
+            error = 'Exception'
         else:
-            self.out_queue.put(result.pop())
+            finished_task = result.pop()
+        if error:
+            terminate_process_and_childs(process)
+        cpu_time, peak_rss = get_resource_usage(children_only=True)
+        manager.shutdown()
+        self.metrics.add_job(time() - start_time, cpu_time - start_cpu_time, peak_rss, next_task.size, error)
+        if error:
+            self._report_failed_analysis(next_task, worker_id, error)
+        else:
+            self._return_result(finished_task)
             logging.debug('Worker {}: Finished {} analysis on {}'.format(worker_id, self.NAME, next_task.uid))
 
-    def _handle_failed_analysis(self, fw_object, process, worker_id, cause: str):
-        terminate_process_and_childs(process)
+    def worker_processing_in_job_process(self, worker_id, next_task):
+        start_time = time()
+        result, error, (cpu_time, peak_rss) = self._run_in_job_process(worker_id, next_task, self.timeout)
+        self.metrics.add_job(time() - start_time, cpu_time, peak_rss, next_task.size, error)
+        if error:
+            self._report_failed_analysis(next_task, worker_id, error)
+        else:
+            self._return_result(result)
+            logging.debug('Worker {}: Finished {} analysis on {}'.format(worker_id, self.NAME, next_task.uid))
+
+    def worker_processing_batch_in_job_process(self, worker_id, tasks):
+        start_time = time()
+        results, error, (cpu_time, peak_rss) = self._run_in_job_process(worker_id, tasks, self.timeout * len(tasks))
+        if error:  # analyze the objects one by one so that only the culprit fails
+            self.metrics.add_failed_batch(time() - start_time)
+            logging.warning('Worker {}: {} during {} batch analysis -> analyzing {} objects separately'.format(worker_id, error, self.NAME, len(tasks)))
+            for task in tasks:
+                self.worker_processing_in_job_process(worker_id, task)
+            return
+        wall_time = time() - start_time
+        for result in results:
+            self.metrics.add_job(wall_time / len(tasks), cpu_time / len(tasks), peak_rss, result.size)
+            self._return_result(result)
+        logging.debug('Worker {}: Finished {} analysis on batch of {} objects'.format(worker_id, self.NAME, len(tasks)))
+
+    def _run_in_job_process(self, worker_id, job, timeout) -> Tuple[object, Optional[str], Tuple[float, int]]:
+        '''
+        returns the result of the job (an object or a batch), the cause of the failure (or None) and the CPU time and
+        peak RSS of the job process (0 if it failed)
+        '''
+        connection = self._get_job_process(worker_id)
+        try:
+            connection.send(job)
+        except OSError:  # job process died while idle -> start a new one
+            self._stop_job_process(worker_id)
+            connection = self._get_job_process(worker_id)
+            connection.send(job)
+        if not connection.poll(timeout=timeout):
+            self._stop_job_process(worker_id)
+            return None, 'Timeout', (0.0, 0)
+        try:
+            status, result, resource_usage = connection.recv()
+        except EOFError:  # job process crashed
+            status, result = 'exception', 'job process terminated unexpectedly'
+        if status == 'exception':
+            logging.error('Worker {}: Exception in {} job process:\n{}'.format(worker_id, self.NAME, result))
+            self._stop_job_process(worker_id)
+            return None, 'Exception', (0.0, 0)
+        return result, None, resource_usage
+
+    def _get_job_process(self, worker_id):
+        if worker_id not in self.job_processes:
+            worker_connection, job_connection = Pipe()
+            process = Process(target=self._job_process, args=(job_connection, worker_connection), name='{}-Job-{}'.format(self.NAME, worker_id))
+            process.start()
+            job_connection.close()
+            self.job_processes[worker_id] = (process, worker_connection)
+        return self.job_processes[worker_id][1]
+
+    def _job_process(self, connection, worker_connection):
+        worker_connection.close()  # so that recv raises EOFError if the worker is gone
+        while True:
+            try:
+                task = connection.recv()
+            except EOFError:
+                break
+            start_cpu_time, _ = get_resource_usage()
+            try:
+                result = []
+                if isinstance(task, list):
+                    self.process_next_batch(task, result)
+                else:
+                    self.process_next_object(task, result)
+                    result = result.pop()
+                cpu_time, peak_rss = get_resource_usage()
+                connection.send(('result', result, (cpu_time - start_cpu_time, peak_rss)))
+            except Exception:  # pylint: disable=broad-except
+                connection.send(('exception', traceback.format_exc(), None))
+
+    def _stop_job_process(self, worker_id):
+        if worker_id in self.job_processes:
+            process, connection = self.job_processes.pop(worker_id)
+            terminate_process_and_childs(process)
+            connection.close()
+
+    def _report_failed_analysis(self, fw_object, worker_id, cause: str):
         fw_object.analysis_exception = (self.NAME, '{} occurred during analysis'.format(cause))
         logging.error('Worker {}: {} during analysis {} on {}'.format(worker_id, cause, self.NAME, fw_object.uid))
-        self.out_queue.put(fw_object)
+        self._return_result(fw_object)
 
     def worker(self, worker_id):
-        while self.stop_condition.value == 0:
+        while self.stop_condition.value == 0 and worker_id < self.worker_count.value:
             try:
                 next_task = self.in_queue.get(timeout=float(self.config['ExpertSettings']['block_delay']))
                 logging.debug('Worker {}: Begin {} analysis on {}'.format(worker_id, self.NAME, next_task.uid))
@@ -157,9 +321,48 @@ class AnalysisBasePlugin(BasePlugin):  # pylint: disable=too-many-instance-attri
             else:
                 self.active[worker_id].value = 1
                 next_task.processed_analysis.update({self.NAME: {}})
-                self.worker_processing_with_timeout(worker_id, next_task)
+                self.unfinished_tasks = {next_task.uid: next_task}
+                try:
+                    self._process_task(worker_id, next_task)
+                except Exception:
+                    self._report_unfinished_tasks(worker_id)
+                    raise
 
+        self._stop_job_process(worker_id)
+        self.active[worker_id].value = 0
         logging.debug('worker {} stopped'.format(worker_id))
 
+    def _process_task(self, worker_id, next_task):
+        if self.FULL_ISOLATION:
+            self.worker_processing_with_timeout(worker_id, next_task)
+        elif self.BATCH_SIZE > 1:
+            self.worker_processing_batch_in_job_process(worker_id, self._collect_batch(next_task))
+        else:
+            self.worker_processing_in_job_process(worker_id, next_task)
+
+    def _report_unfinished_tasks(self, worker_id):
+        '''
+        every job taken from the in_queue must be returned: the scheduler only dispatches further jobs to the plugin
+        once the results of its jobs in flight arrive (the worker is restarted after the exception)
+        '''
+        for task in list(self.unfinished_tasks.values()):
+            self._report_failed_analysis(task, worker_id, 'Worker exception')
+
+    def _return_result(self, fw_object):
+        self.unfinished_tasks.pop(fw_object.uid, None)
+        self.out_queue.put(fw_object)
+
+    def _collect_batch(self, first_task):
+        batch, deadline = [first_task], time() + self.BATCH_TIMEOUT
+        while len(batch) < self.BATCH_SIZE:
+            try:
+                next_task = self.in_queue.get(timeout=max(deadline - time(), 0))
+            except Empty:
+                break
+            next_task.processed_analysis.update({self.NAME: {}})
+            self.unfinished_tasks[next_task.uid] = next_task
+            batch.append(next_task)
+        return batch
+
     def check_exceptions(self):
         return check_worker_exceptions(self.workers, 'Analysis', self.config, self.worker)
@@ -0,0 +1,72 @@
+from multiprocessing import Array, Lock, Value
+from resource import RUSAGE_CHILDREN, RUSAGE_SELF, getrusage
+from typing import Optional, Tuple
+
+# upper bounds of the wall time histogram buckets (the last bucket counts all slower jobs)
+HISTOGRAM_BUCKETS = [(0.01, '10ms'), (0.1, '100ms'), (1, '1s'), (10, '10s'), (60, '1min'), (300, '5min')]
+
+
+class PluginMetrics:
+    '''
+    Execution metrics of all jobs of an analysis plugin (shared between its worker processes)
+    '''
+
+    COUNTERS = ['jobs', 'wall_time', 'cpu_time', 'input_size', 'timeouts', 'exceptions', 'failed_batches']
+
+    def __init__(self):
+        self._lock = Lock()
+        self._counters = {name: Value('d', 0.0, lock=False) for name in self.COUNTERS}
+        self._peak_rss = Value('q', 0, lock=False)
+        self._histogram = Array('q', len(HISTOGRAM_BUCKETS) + 1, lock=False)
+
+    def add_job(self, wall_time: float, cpu_time: float, peak_rss: int, input_size: Optional[int], error: Optional[str] = None):
+        with self._lock:
+            self._counters['jobs'].value += 1
+            self._counters['wall_time'].value += wall_time
+            self._counters['cpu_time'].value += cpu_time
+            self._counters['input_size'].value += input_size or 0
+            if error == 'Timeout':
+                self._counters['timeouts'].value += 1
+            elif error == 'Exception':
+                self._counters['exceptions'].value += 1
+            self._peak_rss.value = max(self._peak_rss.value, peak_rss)
+            self._histogram[self._get_bucket(wall_time)] += 1
+
+    def add_failed_batch(self, wall_time: float):
+        '''
+        the objects of a failed batch are analyzed again one by one (and counted as jobs then)
+        so only the time of the failed attempt is added
+        '''
+        with self._lock:
+            self._counters['failed_batches'].value += 1
+            self._counters['wall_time'].value += wall_time
+
+    def get_summary(self) -> dict:
+        with self._lock:
+            summary = {name: counter.value for name, counter in self._counters.items()}
+            summary['peak_rss'] = self._peak_rss.value
+            histogram = list(self._histogram)
+        summary['jobs'] = int(summary['jobs'])
+        summary['failed_batches'] = int(summary['failed_batches'])
+        summary['time_per_mb'] = summary['wall_time'] / summary['input_size'] * 2 ** 20 if summary['input_size'] else 0.0
+        summary['histogram'] = [
+            ['<{}'.format(label), count] for (_, label), count in zip(HISTOGRAM_BUCKETS, histogram)
+        ] + [['>{}'.format(HISTOGRAM_BUCKETS[-1][1]), histogram[-1]]]
+        return summary
+
+    @staticmethod
+    def _get_bucket(wall_time: float) -> int:
+        for index, (upper_bound, _) in enumerate(HISTOGRAM_BUCKETS):
+            if wall_time < upper_bound:
+                return index
+        return len(HISTOGRAM_BUCKETS)
+
+
+def get_resource_usage(children_only: bool = False) -> Tuple[float, int]:
+    '''
+    returns the CPU time (seconds) and the peak RSS (bytes) of the current process and its (terminated) child processes
+    (or of the terminated child processes only)
+    '''
+    usages = [getrusage(RUSAGE_CHILDREN)] if children_only else [getrusage(RUSAGE_SELF), getrusage(RUSAGE_CHILDREN)]
+    cpu_time = sum(usage.ru_utime + usage.ru_stime for usage in usages)
+    return cpu_time, max(usage.ru_maxrss for usage in usages) * 1024
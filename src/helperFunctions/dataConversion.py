@@ -1,5 +1,5 @@
 from datetime import datetime
-from itertools import combinations
+from itertools import chain, combinations
 from pickle import dumps
 from typing import KT, VT, Dict, Iterable, List, Optional, Set
 
@@ -28,6 +28,31 @@ def get_dict_size(dict_object):
     return len(dumps(dict_object))
 
 
+def exceeds_size_limit(data, limit: int) -> bool:
+    '''
+    cheap estimate if the serialized size of data is larger than limit: the lengths of all strings and byte strings
+    (and 8 bytes for every other value) are added up until the limit is exceeded without serializing data
+    '''
+    size, iterators = 0, [iter([data])]
+    while iterators:
+        for item in iterators[-1]:
+            if isinstance(item, (str, bytes, bytearray)):
+                size += len(item)
+            elif isinstance(item, dict):
+                iterators.append(chain.from_iterable(item.items()))
+                break
+            elif isinstance(item, (list, tuple, set, frozenset)):
+                iterators.append(iter(item))
+                break
+            else:
+                size += 8
+            if size > limit:
+                return True
+        else:
+            iterators.pop()
+    return False
+
+
 def list_of_lists_to_list_of_sets(list_of_lists):
     tmp = []
     for item in list_of_lists:
@@ -0,0 +1,23 @@
+import re
+from typing import List
+
+
+class MimeFilter:
+    '''
+    MIME blacklist or whitelist of an analysis plugin compiled into a single regular expression (substring match)
+    The decision for each MIME type is memoized
+    '''
+
+    def __init__(self, blacklist: List[str], whitelist: List[str]):
+        self.is_whitelist = bool(whitelist)
+        mime_types = whitelist if whitelist else blacklist
+        self.empty = not mime_types
+        self._pattern = re.compile('|'.join(re.escape(mime_type) for mime_type in mime_types))
+        self._decisions = {}
+
+    def is_blacklisted(self, mime: str) -> bool:
+        if self.empty:
+            return False
+        if mime not in self._decisions:
+            self._decisions[mime] = (self._pattern.search(mime) is None) == self.is_whitelist
+        return self._decisions[mime]
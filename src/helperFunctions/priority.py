@@ -0,0 +1,57 @@
+from collections import deque
+from queue import Empty
+from typing import Any, Hashable
+
+
+class AnalysisPriority:
+    INTERACTIVE = 0  # single file analysis
+    UPLOAD = 1  # new firmware submissions (web interface and REST)
+    BULK = 2  # re-analysis and updates of existing firmware
+    ALL = [INTERACTIVE, UPLOAD, BULK]
+    NAMES = {INTERACTIVE: 'interactive', UPLOAD: 'upload', BULK: 'bulk'}
+    WEIGHTS = {INTERACTIVE: 100, UPLOAD: 10, BULK: 1}
+
+
+class FairQueue:
+    '''
+    Single consumer queue with weighted fair share between flows (stride scheduling):
+    Each flow (e.g. all files of one firmware submission) has its own FIFO and the flow with the lowest pass value is
+    served next. Serving a flow advances its pass by 1 / weight, so a flow with weight 10 gets ten times as many items
+    as a flow with weight 1 and a big submission cannot starve the ones arriving after it.
+    '''
+
+    def __init__(self):
+        self._flows = {}
+        self._pass = {}
+        self._weights = {}
+        self._virtual_time = 0.0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def put(self, item: Any, flow: Hashable, weight: int = 1):
+        if flow not in self._flows:
+            self._flows[flow] = deque()
+            self._pass[flow] = self._virtual_time
+        self._weights[flow] = weight
+        self._flows[flow].append(item)
+        self._size += 1
+
+    def get(self) -> Any:
+        if not self._size:
+            raise Empty()
+        flow = min(self._flows, key=self._pass.get)
+        item = self._flows[flow].popleft()
+        self._size -= 1
+        self._virtual_time = self._pass[flow]
+        if self._flows[flow]:
+            self._pass[flow] += 1 / self._weights[flow]
+        else:
+            self._remove_flow(flow)
+        return item
+
+    def _remove_flow(self, flow: Hashable):
+        self._flows.pop(flow)
+        self._pass.pop(flow)
+        self._weights.pop(flow)
@@ -5,7 +5,8 @@ import signal
 import traceback
 from configparser import ConfigParser
 from contextlib import suppress
-from multiprocessing import Pipe, Process, pool
+from multiprocessing import Pipe, Process, Queue, pool
+from multiprocessing.connection import wait
 from typing import Callable, List, Optional
 
 import psutil
@@ -108,3 +109,12 @@ def check_worker_exceptions(process_list: List[ExceptionSafeProcess], worker_lab
 
 def new_worker_was_started(new_process: ExceptionSafeProcess, old_process: ExceptionSafeProcess) -> bool:
     return new_process != old_process
+
+
+def get_ready_queues(queues: List[Queue], timeout: Optional[float] = None) -> List[Queue]:
+    '''
+    Block until at least one of the queues has data available or the timeout expires.
+    Returns the list of queues that are ready for reading (empty on timeout).
+    '''
+    readers = {queue._reader: queue for queue in queues}  # pylint: disable=protected-access
+    return [readers[reader] for reader in wait(list(readers), timeout=timeout)]
@@ -20,12 +20,14 @@
 import logging
 import sys
 
+from helperFunctions.database import ConnectTo
+from storage.db_interface_index import IndexProvisioner
 from storage.MongoMgr import MongoMgr
 from helperFunctions.program_setup import program_setup
 
 
 PROGRAM_NAME = 'FACT Database Initializer'
-PROGRAM_DESCRIPTION = 'Initialize authentication and users for FACT\'s Database'
+PROGRAM_DESCRIPTION = 'Initialize authentication, users and indexes for FACT\'s Database (and migrate data of older versions)'
 
 
 def main(command_line_options=None):
@@ -35,6 +37,11 @@ def main(command_line_options=None):
     logging.info('Trying to start Mongo Server and initializing users...')
     mongo_manger = MongoMgr(config=config, auth=False)
     mongo_manger.init_users()
+    with ConnectTo(IndexProvisioner, config) as provisioner:
+        logging.info('Adding missing root firmware uids to file objects...')
+        logging.info('Added root firmware uids to {} file objects'.format(provisioner.add_missing_root_firmware_uids()))
+        logging.info('Creating database indexes...')
+        provisioner.create_missing_indexes()
     mongo_manger.shutdown()
 
     return 0
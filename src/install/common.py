@@ -67,7 +67,7 @@ def main(distribution):  # pylint: disable=too-many-statements
     pip3_install_packages('requests')
 
     # install python MongoDB bindings
-    pip3_install_packages('pymongo', 'pyyaml')
+    pip3_install_packages('pymongo', 'pyyaml', 'msgpack', 'zstandard')
 
     # VarietyJS (is executed by update_statistic.py)
     if Path('../bin/spec').exists():
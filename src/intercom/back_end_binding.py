@@ -6,6 +6,7 @@ from time import sleep
 from common_helper_mongo.gridfs import overwrite_file
 
 from helperFunctions.database import ConnectTo
+from helperFunctions.priority import AnalysisPriority
 from helperFunctions.process import no_operation
 from helperFunctions.yara_binary_search import YaraBinarySearchScanner
 from intercom.common_mongo_binding import InterComListener, InterComListenerAndResponder, InterComMongoInterface
@@ -54,7 +55,11 @@ class InterComBackEndBinding:
         self._start_listener(InterComBackEndAnalysisTask, self.unpacking_service.add_task)
 
     def start_re_analyze_listener(self):
-        self._start_listener(InterComBackEndReAnalyzeTask, self.unpacking_service.add_task)
+        self._start_listener(InterComBackEndReAnalyzeTask, self._re_analyze)
+
+    def _re_analyze(self, fw):
+        self.analysis_service.invalidate_result_cache()  # "re-do analysis" deletes the old results first
+        self.unpacking_service.add_task(fw)
 
     def start_update_listener(self):
         self._start_listener(InterComBackEndUpdateTask, self.analysis_service.update_analysis_of_object_and_children)
@@ -75,7 +80,7 @@ class InterComBackEndBinding:
         self._start_listener(InterComBackEndBinarySearchTask, no_operation)
 
     def start_delete_file_listener(self):
-        self._start_listener(InterComBackEndDeleteFile, no_operation)
+        self._start_listener(InterComBackEndDeleteFile, self.analysis_service.invalidate_result_cache)
 
     def _start_listener(self, communication_backend, do_after_function):
         process = Process(target=self._backend_worker, args=(communication_backend, do_after_function))
@@ -100,7 +105,7 @@ class InterComBackEndAnalysisPlugInsPublisher(InterComMongoInterface):
     def __init__(self, config=None, analysis_service=None):
         super().__init__(config=config)
         self.publish_available_analysis_plugins(analysis_service)
-        self.client.close()
+        self.shutdown()
 
     def publish_available_analysis_plugins(self, analysis_service):
         available_plugin_dictionary = analysis_service.get_plugin_dict()
@@ -129,6 +134,7 @@ class InterComBackEndReAnalyzeTask(InterComListener):
     def post_processing(self, task, task_id):
         file_path = self.fs_organizer.generate_path(task)
         task.set_file_path(file_path)
+        task.priority = AnalysisPriority.BULK
         return task
 
 
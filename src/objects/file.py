@@ -1,10 +1,12 @@
 import logging
 import os
+from typing import Optional
 
 from common_helper_files import get_binary_from_file
 
 from helperFunctions.dataConversion import get_value_of_first_key, make_bytes, make_unicode_string
 from helperFunctions.hash import get_sha256
+from helperFunctions.priority import AnalysisPriority
 from helperFunctions.uid import create_uid
 
 
@@ -15,6 +17,8 @@ class FileObject():  # pylint: disable=too-many-instance-attributes
 
     def __init__(self, binary=None, file_name=None, file_path=None, scheduled_analysis=None):
         self._uid = None
+        self._binary = None
+        self.file_path = None
         self.files_included = set()
         self.list_of_all_included_files = None
         self.parents = []
@@ -27,6 +31,7 @@ class FileObject():  # pylint: disable=too-many-instance-attributes
         self.temporary_data = {}
         self.analysis_tags = {}
         self.analysis_exception = None
+        self.priority = AnalysisPriority.UPLOAD
         if binary is not None:
             self.set_binary(binary)
         else:
@@ -39,10 +44,28 @@ class FileObject():  # pylint: disable=too-many-instance-attributes
             self.file_name = None
         if file_path is not None:
             self.set_file_path(file_path)
-        else:
-            self.file_path = None
         self.virtual_file_path = {}
 
+    @property
+    def binary(self) -> Optional[bytes]:
+        '''
+        The binary is loaded from file_path on first access.
+        Objects are passed between processes without it (see __getstate__), so it is only read where it is needed.
+        '''
+        if self._binary is None and self.file_path is not None and os.path.isfile(self.file_path):
+            self._binary = get_binary_from_file(self.file_path)
+        return self._binary
+
+    @binary.setter
+    def binary(self, binary: Optional[bytes]):
+        self._binary = binary
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.file_path is not None and os.path.isfile(self.file_path):
+            state['_binary'] = None
+        return state
+
     def set_binary(self, binary):
         self.binary = make_bytes(binary)
         self.sha256 = get_sha256(self.binary)
@@ -54,7 +77,7 @@ class FileObject():  # pylint: disable=too-many-instance-attributes
 
     def set_file_path(self, file_path):
         self.file_path = file_path
-        if self.binary is None:
+        if self._uid is None and self._binary is None:  # the file must be read once to get uid and hashes
             self.create_from_file(file_path)
         if self.file_name is None:
             self.set_name(os.path.basename(file_path))
@@ -94,6 +117,7 @@ class FileObject():  # pylint: disable=too-many-instance-attributes
         file_object.add_virtual_file_path_if_none_exists(self.get_virtual_paths_for_one_uid(root_uid=self.root_uid), self.uid)
         file_object.depth = self.depth + 1
         file_object.scheduled_analysis = self.scheduled_analysis
+        file_object.priority = self.priority
         self.files_included.add(file_object.uid)
 
     def add_virtual_file_path_if_none_exists(self, parent_paths, parent_uid):
@@ -40,6 +40,10 @@ class Firmware(FileObject):
         self._update_root_id_and_virtual_path()
         self.md5 = get_md5(binary)
 
+    def set_file_path(self, file_path):
+        super().set_file_path(file_path)
+        self._update_root_id_and_virtual_path()
+
     def set_vendor(self, vendor):
         self.vendor = vendor
 
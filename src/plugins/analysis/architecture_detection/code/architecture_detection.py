@@ -11,6 +11,7 @@ class AnalysisPlugin(AnalysisBasePlugin):
     DEPENDENCIES = ['file_type']
     DESCRIPTION = 'identify CPU architecture'
     VERSION = '0.3.2'
+    BATCH_SIZE = 20
 
     def __init__(self, plugin_administrator, config=None, recursive=True):
         '''
@@ -12,15 +12,30 @@ class AnalysisPlugin(AnalysisBasePlugin):
     DEPENDENCIES = ['file_type']
     MIME_WHITELIST = ['application/x-executable', 'application/x-object', 'application/x-sharedlib']
     VERSION = "0.1.2"
+    BATCH_SIZE = 20
 
     def __init__(self, plugin_administrator, config=None, recursive=True):
         self.config = config
         super().__init__(plugin_administrator, config=config, recursive=recursive, plugin_path=__file__)
 
     def process_object(self, file_object):
+        return self._process_object_with_readelf_results(file_object, {})
+
+    def process_batch(self, file_objects):
+        '''
+        readelf is only invoked once for all ELF files of the batch
+        '''
+        elf_files = [file_object.file_path for file_object in file_objects if self._is_elf(file_object)]
+        readelf_results = get_readelf_results(elf_files) if len(elf_files) > 1 else {}
+        return [self._process_object_with_readelf_results(file_object, readelf_results) for file_object in file_objects]
+
+    def _process_object_with_readelf_results(self, file_object, readelf_results):
         try:
-            if re.search(r'.*elf.*', file_object.processed_analysis['file_type']['full'].lower()) is not None:
-                mitigation_dict, mitigation_dict_summary = check_mitigations(file_object.file_path)
+            if self._is_elf(file_object):
+                if file_object.file_path in readelf_results:
+                    mitigation_dict, mitigation_dict_summary = evaluate_mitigations(file_object.file_path, readelf_results[file_object.file_path])
+                else:
+                    mitigation_dict, mitigation_dict_summary = check_mitigations(file_object.file_path)
                 file_object.processed_analysis[self.NAME] = mitigation_dict
                 file_object.processed_analysis[self.NAME]['summary'] = list(mitigation_dict_summary.keys())
             else:
@@ -29,12 +44,28 @@ class AnalysisPlugin(AnalysisBasePlugin):
             file_object.processed_analysis[self.NAME]['summary'] = ['Error - Firmware could not be processed properly: {}'.format(e)]
         return file_object
 
+    @staticmethod
+    def _is_elf(file_object):
+        return re.search(r'.*elf.*', file_object.processed_analysis['file_type']['full'].lower()) is not None
+
 
 def get_readelf_result(path):
     readelf_full = execute_shell_command(READELF_FULL.format(path))
     return readelf_full
 
 
+def get_readelf_results(paths):
+    '''
+    readelf output for multiple files is separated by "File: <path>" lines
+    '''
+    return split_readelf_output(get_readelf_result(' '.join(paths)))
+
+
+def split_readelf_output(readelf_output):
+    sections = re.split(r'^File: (.+)$', readelf_output, flags=re.MULTILINE)
+    return dict(zip(sections[1::2], sections[2::2]))
+
+
 def check_relro(file_path, dict_res, dict_sum, readelf):
     if re.search(r'GNU_RELRO', readelf):
         if re.search(r'BIND_NOW', readelf):
@@ -97,8 +128,11 @@ def check_nx_or_canary(file_path, dict_res, dict_sum, readelf, flag):
 
 
 def check_mitigations(file_path):
+    return evaluate_mitigations(file_path, get_readelf_result(file_path))
+
+
+def evaluate_mitigations(file_path, readelf_results):
     dict_res, dict_sum = {}, {}
-    readelf_results = get_readelf_result(file_path)
     check_relro(file_path, dict_res, dict_sum, readelf_results)
     check_nx_or_canary(file_path, dict_res, dict_sum, readelf_results, 'NX')
     check_nx_or_canary(file_path, dict_res, dict_sum, readelf_results, 'Canary')
@@ -2,7 +2,7 @@
 
 
 from test.unit.analysis.analysis_plugin_test_class import AnalysisPluginTest
-from ..code.checksec import check_pie, check_relro, check_mitigations, check_nx_or_canary, check_fortify
+from ..code.checksec import check_pie, check_relro, check_mitigations, check_nx_or_canary, check_fortify, split_readelf_output
 from ..code.checksec import AnalysisPlugin
 
 
@@ -107,3 +107,11 @@ class TestAnalysisPluginChecksec(AnalysisPluginTest):
     def test_check_mitigations(self):
         results = check_mitigations(FILE_PATH)
         self.assertEqual(2, len(results))
+
+    def test_split_readelf_output(self):
+        readelf = '\nFile: /foo/bar\nType: EXEC\n\nFile: /foo/other\nType: DYN __stack_chk_fail\n'
+        results = split_readelf_output(readelf)
+        self.assertEqual(set(results), {'/foo/bar', '/foo/other'})
+        self.assertIn('EXEC', results['/foo/bar'])
+        self.assertNotIn('__stack_chk_fail', results['/foo/bar'])
+        self.assertIn('__stack_chk_fail', results['/foo/other'])
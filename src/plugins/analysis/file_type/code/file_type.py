@@ -10,6 +10,7 @@ class AnalysisPlugin(AnalysisBasePlugin):
     NAME = "file_type"
     DESCRIPTION = "identify the file type"
     VERSION = "1.0"
+    BATCH_SIZE = 20
 
     def __init__(self, plugin_administrator, config=None, recursive=True):
         '''
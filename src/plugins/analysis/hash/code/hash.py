@@ -14,6 +14,7 @@ class AnalysisPlugin(AnalysisBasePlugin):
     DEPENDENCIES = ['file_type']
     DESCRIPTION = 'calculate different hash values of the file'
     VERSION = '1.1'
+    BATCH_SIZE = 20
 
     def __init__(self, plugin_administrator, config=None, recursive=True):
         '''
@@ -1,26 +1,36 @@
 import logging
+import pickle
 from concurrent.futures import ThreadPoolExecutor
 from configparser import ConfigParser
 from copy import copy
 from distutils.version import LooseVersion
-from multiprocessing import Manager, Queue, Value
+from multiprocessing import Queue, Value
 from queue import Empty
-from time import sleep, time
-from typing import List, Optional, Set, Tuple, Union
+from time import time
+from typing import Dict, List, Optional, Set, Tuple, Union
 
 from analysis.PluginBase import AnalysisBasePlugin
-from helperFunctions.compare_sets import substring_is_in_list
 from helperFunctions.config import read_list_from_config
 from helperFunctions.logging import TerminalColors, color_string
-from helperFunctions.merge_generators import shuffled
+from helperFunctions.mime_filter import MimeFilter
 from helperFunctions.plugin import import_plugins
-from helperFunctions.process import ExceptionSafeProcess, check_worker_exceptions
+from helperFunctions.priority import AnalysisPriority, FairQueue
+from helperFunctions.process import ExceptionSafeProcess, check_worker_exceptions, get_ready_queues
 from helperFunctions.tag import add_tags_to_object, check_tags
 from objects.file import FileObject
 from objects.firmware import Firmware
+from scheduler.analysis_autoscaler import WorkerAutoscaler
+from scheduler.analysis_status import AnalysisStatus
 from storage.db_interface_backend import BackEndDbInterface
+from storage.db_interface_analysis_cache import AnalysisResultCache
+from storage.db_interface_task_journal import TaskJournal
 
 MANDATORY_PLUGINS = ['file_type', 'file_hashes']
+ANALYSIS_VERSION_FIELDS = ['failed', 'file_system_flag', 'plugin_version', 'system_version']
+# plugin in_queues are kept short so that the fair share scheduling of the job queues takes effect
+QUEUED_JOBS_PER_WORKER = 2
+# the pickled size of every n-th job of a plugin is measured for the payload size metric
+PAYLOAD_SAMPLE_RATE = 10
 
 
 class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
@@ -31,16 +41,35 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
     def __init__(self, config: Optional[ConfigParser] = None, pre_analysis=None, post_analysis=None, db_interface=None):
         self.config = config
         self.analysis_plugins = {}
+        self.mime_filters = {}
         self.load_plugins()
         self.stop_condition = Value('i', 0)
         self.process_queue = Queue()
+        self.result_queue = Queue()
         self.tag_queue = Queue()
-        self.manager = Manager()
-        self.currently_running = self.manager.dict()
+        # the following are only used inside the scheduling process
+        self.analyses_in_progress = {}
+        self.running_analyses = {}
+        self.analysis_version_cache = {}
+        self.job_queues = {}
+        self.jobs_in_flight = {}
+        self.pending_jobs = {}
+        self.dispatched_jobs = {}
+        self.payload_sizes = {}
+        self._setup_job_queues()
+        self.status = AnalysisStatus(block_delay=float(self.config['ExpertSettings']['block_delay']))
 
         self.db_backend_service = db_interface if db_interface else BackEndDbInterface(config=config)
         self.pre_analysis = pre_analysis if pre_analysis else self.db_backend_service.add_object
-        self.post_analysis = post_analysis if post_analysis else self.db_backend_service.add_analysis
+        self.post_analysis = post_analysis if post_analysis else self._store_analysis_results
+        self.buffer_analysis_results = post_analysis is None and self.config.getint('ExpertSettings', 'analysis_write_interval', fallback=200) > 0
+        self.task_journal = self._get_task_journal()
+        self.result_cache = self._get_result_cache()
+        self.unflushed_cache_keys = []  # only used inside the scheduling process
+        self.autoscaler = WorkerAutoscaler(
+            worker_limit=self.config.getint('ExpertSettings', 'autoscaling_worker_limit', fallback=0),
+            memory_limit=self.config.getfloat('ExpertSettings', 'autoscaling_memory_limit', fallback=90.0),
+        )
         self.start_scheduling_process()
         self.start_result_collector()
         logging.info('Analysis System online...')
@@ -55,11 +84,17 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         with ThreadPoolExecutor() as executor:
             executor.submit(self.schedule_process.join)
             executor.submit(self.result_collector_process.join)
+            executor.submit(self.status.shutdown)
             for plugin in self.analysis_plugins:
                 executor.submit(self.analysis_plugins[plugin].shutdown)
         if getattr(self.db_backend_service, 'shutdown', False):
             self.db_backend_service.shutdown()
+        if self.task_journal:
+            self.task_journal.shutdown()
+        if self.result_cache:
+            self.result_cache.shutdown()
         self.tag_queue.close()
+        self.result_queue.close()
         self.process_queue.close()
         logging.info('Analysis System offline')
 
@@ -67,8 +102,12 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         '''
         This function is used to recursively analyze an object without need of the unpacker
         '''
+        fo.priority = AnalysisPriority.BULK
         for included_file in self.db_backend_service.get_list_of_all_included_files(fo):
+            if self._analysis_results_are_cached(included_file, fo.scheduled_analysis):
+                continue
             child = self.db_backend_service.get_object(included_file)
+            child.priority = AnalysisPriority.BULK
             self._schedule_analysis_tasks(child, fo.scheduled_analysis)
         self.check_further_process_or_complete(fo)
 
@@ -76,46 +115,66 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         '''
         This function should be used to add a new firmware object to the scheduler
         '''
-        self._add_to_current_analyses(fo)
-        self._schedule_analysis_tasks(fo, fo.scheduled_analysis, mandatory=True)
+        self.status.add_object(fo)
+        if self._analysis_results_are_cached(fo.uid, fo.scheduled_analysis, mandatory=True):
+            logging.debug('skipping analysis of {} (all results cached)'.format(fo.uid))
+            self.pre_analysis(fo)
+            self._complete_analysis(fo)
+        else:
+            self._schedule_analysis_tasks(fo, fo.scheduled_analysis, mandatory=True)
 
     def update_analysis_of_single_object(self, fo: FileObject):
         '''
         This function is used to add analysis tasks for a single file
         '''
+        fo.priority = AnalysisPriority.INTERACTIVE
         self._schedule_analysis_tasks(fo, fo.scheduled_analysis)
 
     def _schedule_analysis_tasks(self, fo, scheduled_analysis, mandatory=False):
         scheduled_analysis = self._add_dependencies_recursively(copy(scheduled_analysis) or [])
-        fo.scheduled_analysis = self._smart_shuffle(scheduled_analysis + MANDATORY_PLUGINS if mandatory else scheduled_analysis)
+        fo.scheduled_analysis = list(set(scheduled_analysis + MANDATORY_PLUGINS)) if mandatory else scheduled_analysis
         self.check_further_process_or_complete(fo)
 
-    def _smart_shuffle(self, plugin_list: List[str]) -> List[str]:
-        scheduled_plugins = []
-        remaining_plugins = set(plugin_list)
-
-        while remaining_plugins:
-            next_plugins = self._get_plugins_with_met_dependencies(remaining_plugins, scheduled_plugins)
-            if not next_plugins:
-                logging.error('Error: Could not schedule plugins because dependencies cannot be fulfilled: {}'.format(remaining_plugins))
-                break
-            scheduled_plugins[:0] = shuffled(next_plugins)
-            remaining_plugins.difference_update(next_plugins)
-
-        # assure file type is first for blacklist functionality
-        if 'file_type' in scheduled_plugins and scheduled_plugins[-1] != 'file_type':
-            scheduled_plugins.remove('file_type')
-            scheduled_plugins.append('file_type')
-        return scheduled_plugins
-
-    def _get_plugins_with_met_dependencies(self, remaining_plugins: Set[str], scheduled_plugins: List[str]) -> List[str]:
-        met_dependencies = scheduled_plugins
+    def _get_plugins_with_met_dependencies(self, remaining_plugins: List[str], running_plugins: Set[str]) -> List[str]:
+        '''
+        returns all remaining plugins that do not depend on a plugin that is still remaining or running
+        '''
+        unfinished_plugins = set(remaining_plugins).union(running_plugins)
         return [
             plugin
             for plugin in remaining_plugins
-            if all(dependency in met_dependencies for dependency in self.analysis_plugins[plugin].DEPENDENCIES)
+            if not unfinished_plugins.intersection(self._get_dependencies_for_dispatch(plugin))
         ]
 
+    def _get_dependencies_for_dispatch(self, plugin: str) -> List[str]:
+        dependencies = self.analysis_plugins[plugin].DEPENDENCIES
+        if plugin in MANDATORY_PLUGINS:
+            return dependencies
+        # non-mandatory plugins wait for file type because of blacklist functionality
+        return dependencies + ['file_type']
+
+    def resume_analyses_from_journal(self):
+        '''
+        This function reschedules the pending analysis tasks of the previous run (e.g. after a crash of the backend)
+        Plugins that already finished are not run again
+        '''
+        if not self.task_journal:
+            return
+        pending_tasks = self.task_journal.get_pending_tasks()
+        for entry in pending_tasks:
+            fo = self.db_backend_service.get_object(entry['_id'])
+            if fo is None:
+                logging.warning('Could not resume analysis of {}: object not found in database'.format(entry['_id']))
+                self.task_journal.finish_object(entry['_id'])
+                continue
+            fo.priority = entry['priority']
+            if entry.get('root_uid'):
+                fo.root_uid = entry['root_uid']
+            self._schedule_analysis_tasks(fo, [plugin for plugin in entry['pending_plugins'] if plugin in self.analysis_plugins])
+        self.task_journal.flush(force=True)
+        if pending_tasks:
+            logging.info('Resumed analysis of {} objects from task journal'.format(len(pending_tasks)))
+
     def get_list_of_available_plugins(self):
         '''
         returns a list of all loaded plugins
@@ -162,14 +221,24 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         workload = {
             'analysis_main_scheduler': self.process_queue.qsize(),
             'plugins': {},
-            'current_analyses': {uid: len(included_files) for uid, included_files in self.currently_running.items()}
+            'current_analyses': self.status.get_current_analyses(),
+            'priorities': {name: 0 for name in AnalysisPriority.NAMES.values()},
+            'autoscaling': self.autoscaler.get_decisions(),
         }
         for plugin_name in self.analysis_plugins:
             plugin = self.analysis_plugins[plugin_name]
+            pending_jobs = {AnalysisPriority.NAMES[priority]: counter.value for priority, counter in self.pending_jobs[plugin_name].items()}
             workload['plugins'][plugin_name] = {
-                'queue': plugin.in_queue.qsize(),
-                'active': (sum(plugin.active[i].value for i in range(plugin.thread_count))),
+                'queue': plugin.in_queue.qsize() + sum(pending_jobs.values()),
+                'active': sum(active.value for active in plugin.active),
+                'workers': plugin.thread_count,
+                'max_workers': plugin.max_threads,
+                'priorities': pending_jobs,
+                'payload_size': int(self.payload_sizes[plugin_name].value),
+                'metrics': plugin.metrics.get_summary(),
             }
+            for name, count in pending_jobs.items():
+                workload['priorities'][name] += count
         return workload
 
     def register_plugin(self, name, plugin_instance):
@@ -177,6 +246,7 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         This function is called upon plugin init to announce its presence
         '''
         self.analysis_plugins[name] = plugin_instance
+        self.mime_filters[name] = self._create_mime_filter(name)
 
     def load_plugins(self):
         source = import_plugins('analysis.plugins', 'plugins/analysis')
@@ -184,6 +254,53 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
             plugin = source.load_plugin(plugin_name)
             plugin.AnalysisPlugin(self, config=self.config)
 
+    def scale_workers(self):
+        '''
+        adjust the worker pools of the plugins to their current queue depth (must be called from the main process)
+        '''
+        workload = self.get_scheduled_workload()
+        self.autoscaler.scale(self.analysis_plugins, {name: plugin['queue'] for name, plugin in workload['plugins'].items()})
+
+    def invalidate_result_cache(self, *_):
+        '''
+        must be called if analysis results are deleted from the database
+        '''
+        if self.result_cache:
+            self.result_cache.invalidate_memory()
+
+    def _get_result_cache(self) -> Optional[AnalysisResultCache]:
+        if self.config.getboolean('ExpertSettings', 'analysis_result_cache', fallback=False):
+            return AnalysisResultCache(config=self.config)
+        return None
+
+    def _get_result_cache_key(self, plugin: str) -> str:
+        analysis_plugin = self.analysis_plugins[plugin]
+        return AnalysisResultCache.get_key(plugin, analysis_plugin.VERSION, getattr(analysis_plugin, 'SYSTEM_VERSION', None))
+
+    def _analysis_results_are_cached(self, uid: str, scheduled_analysis: List[str], mandatory: bool = False) -> bool:
+        '''
+        True if the database contains up-to-date results of all scheduled plugins (and their dependencies) for uid
+        '''
+        if not self.result_cache or not set(scheduled_analysis or []).union(MANDATORY_PLUGINS if mandatory else []).issubset(self.analysis_plugins):
+            return False
+        plugins = set(self._add_dependencies_recursively(copy(scheduled_analysis) or []))
+        if mandatory:
+            plugins.update(MANDATORY_PLUGINS)
+        return {self._get_result_cache_key(plugin) for plugin in plugins}.issubset(self.result_cache.get_keys(uid))
+
+    def _add_to_result_cache(self, uid: str, plugin: str):
+        if not self.result_cache:
+            return
+        if self.buffer_analysis_results:  # the key must not be stored before the (buffered) result
+            self.unflushed_cache_keys.append((uid, self._get_result_cache_key(plugin)))
+        else:
+            self.result_cache.add_keys(uid, [self._get_result_cache_key(plugin)])
+
+    def _get_task_journal(self) -> Optional[TaskJournal]:
+        if self.config.getboolean('ExpertSettings', 'analysis_task_journal', fallback=False):
+            return TaskJournal(config=self.config)
+        return None
+
     def start_scheduling_process(self):
         logging.debug('Starting scheduler...')
         self.schedule_process = ExceptionSafeProcess(target=self.scheduler)
@@ -191,47 +308,219 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
 
     def scheduler(self):
         while self.stop_condition.value == 0:
-            try:
-                task = self.process_queue.get(timeout=float(self.config['ExpertSettings']['block_delay']))
-            except Empty:
-                pass
-            else:
-                self.process_next_analysis(task)
-
-    def _reschedule_failed_analysis_task(self, fw_object: Union[Firmware, FileObject]):
+            ready_queues = get_ready_queues([self.result_queue, self.process_queue], timeout=float(self.config['ExpertSettings']['block_delay']))
+            for queue in ready_queues:
+                try:
+                    task = queue.get_nowait()
+                except Empty:
+                    continue
+                if queue is self.result_queue:
+                    self._merge_analysis_result(*task)
+                else:
+                    self.process_next_analysis(task)
+            self._flush_buffers()
+        self._flush_buffers(force=True)
+
+    def _flush_buffers(self, force: bool = False):
+        '''
+        analysis results are written before the task journal so that no finished task is removed from the journal
+        before its result is stored
+        '''
+        force = force or bool(self.task_journal and self.task_journal.flush_is_due())
+        if self.buffer_analysis_results and self.db_backend_service.flush_analysis_buffer(force=force):
+            for uid, key in self.unflushed_cache_keys:
+                self.result_cache.add_keys(uid, [key])
+            self.unflushed_cache_keys = []
+        if self.task_journal:
+            self.task_journal.flush(force=force)
+
+    def _store_analysis_results(self, fw_object: FileObject, plugins: Optional[List[str]] = None):
+        if self.buffer_analysis_results:
+            self.db_backend_service.buffer_analysis(fw_object, plugins)
+        else:
+            self.db_backend_service.add_analysis(fw_object, plugins)
+
+    def _reschedule_failed_analysis_task(self, fw_object: Union[Firmware, FileObject]) -> List[str]:
+        '''
+        returns the plugins that were unscheduled because they depend on the failed plugin
+        '''
         failed_plugin, cause = fw_object.analysis_exception
         fw_object.processed_analysis[failed_plugin] = {'failed': cause}
+        unscheduled_plugins = []
         for plugin in fw_object.scheduled_analysis[:]:
             if failed_plugin in self.analysis_plugins[plugin].DEPENDENCIES:
                 fw_object.scheduled_analysis.remove(plugin)
                 logging.warning('Unscheduled analysis {} for {} because dependency {} failed'.format(plugin, fw_object.uid, failed_plugin))
                 fw_object.processed_analysis[plugin] = {'failed': 'Analysis of dependency {} failed'.format(failed_plugin)}
+                unscheduled_plugins.append(plugin)
         fw_object.analysis_exception = None
+        return unscheduled_plugins
 
     # ---- analysis skipping ----
 
     def process_next_analysis(self, fw_object: FileObject):
         self.pre_analysis(fw_object)
-        analysis_to_do = fw_object.scheduled_analysis.pop()
-        if analysis_to_do not in self.analysis_plugins:
-            logging.error('Plugin \'{}\' not available'.format(analysis_to_do))
-            self.check_further_process_or_complete(fw_object)
+        for plugin in fw_object.scheduled_analysis[:]:
+            if plugin not in self.analysis_plugins:
+                logging.error('Plugin \'{}\' not available'.format(plugin))
+                fw_object.scheduled_analysis.remove(plugin)
+        if self.task_journal:
+            self.task_journal.add_tasks(fw_object, fw_object.scheduled_analysis)
+        if fw_object.uid in self.analyses_in_progress:
+            fw_object = self._add_to_analysis_in_progress(fw_object)
         else:
-            self._start_or_skip_analysis(analysis_to_do, fw_object)
+            self.analyses_in_progress[fw_object.uid] = fw_object
+            self.running_analyses[fw_object.uid] = set()
+            self.analysis_version_cache[fw_object.uid] = self._get_analysis_versions_from_db(fw_object.uid, fw_object.scheduled_analysis)
+        self._start_ready_analyses(fw_object)
 
-    def _start_or_skip_analysis(self, analysis_to_do: str, file_object: FileObject):
+    def _add_to_analysis_in_progress(self, fw_object: FileObject) -> FileObject:
+        '''
+        the object is merged into the running analysis of the same uid (e.g. a file shared by several firmware images):
+        its parents and virtual file paths are kept, so the completion is reported for the firmware of each copy
+        '''
+        in_progress = self.analyses_in_progress[fw_object.uid]
+        in_progress.priority = min(in_progress.priority, fw_object.priority)
+        in_progress.parent_firmware_uids = set(in_progress.parent_firmware_uids).union(fw_object.parent_firmware_uids)
+        for root_uid, paths in fw_object.virtual_file_path.items():
+            merged_paths = in_progress.virtual_file_path.setdefault(root_uid, [])
+            merged_paths.extend(path for path in paths if path not in merged_paths)
+        for plugin in fw_object.scheduled_analysis:
+            if plugin not in in_progress.scheduled_analysis and plugin not in self.running_analyses[fw_object.uid]:
+                in_progress.scheduled_analysis.append(plugin)
+        return in_progress
+
+    def _start_ready_analyses(self, fw_object: FileObject):
+        '''
+        dispatch every scheduled plugin whose dependencies are met (skipped analyses may unlock further plugins)
+        '''
+        running_plugins = self.running_analyses[fw_object.uid]
+        ready_plugins = self._get_plugins_with_met_dependencies(fw_object.scheduled_analysis, running_plugins)
+        while ready_plugins:
+            for plugin in ready_plugins:
+                fw_object.scheduled_analysis.remove(plugin)
+                if self._start_or_skip_analysis(plugin, fw_object):
+                    running_plugins.add(plugin)
+            ready_plugins = self._get_plugins_with_met_dependencies(fw_object.scheduled_analysis, running_plugins)
+
+        if not running_plugins:
+            if fw_object.scheduled_analysis:
+                logging.error('Error: Could not schedule plugins because dependencies cannot be fulfilled: {}'.format(fw_object.scheduled_analysis))
+                fw_object.scheduled_analysis = []
+            self.analyses_in_progress.pop(fw_object.uid)
+            self.running_analyses.pop(fw_object.uid)
+            self.analysis_version_cache.pop(fw_object.uid, None)
+            if self.task_journal:
+                self.task_journal.finish_object(fw_object.uid)
+            self._complete_analysis(fw_object)
+
+    def _merge_analysis_result(self, plugin: str, result: FileObject):
+        self.jobs_in_flight[plugin] -= 1
+        self._dispatch_queued_jobs(plugin)
+        fw_object = self.analyses_in_progress.get(result.uid)
+        if fw_object is None:
+            logging.warning('Received {} result for {} which is not being analyzed'.format(plugin, result.uid))
+            return
+        self.running_analyses[result.uid].discard(plugin)
+        if plugin in result.processed_analysis:
+            fw_object.processed_analysis[plugin] = result.processed_analysis[plugin]
+            if plugin in result.analysis_tags:
+                fw_object.analysis_tags[plugin] = result.analysis_tags[plugin]
+            finished_plugins = [plugin]
+            if result.analysis_exception:
+                fw_object.analysis_exception = result.analysis_exception
+                finished_plugins.extend(self._reschedule_failed_analysis_task(fw_object))
+            self.post_analysis(fw_object, finished_plugins)
+            if 'failed' not in fw_object.processed_analysis[plugin]:
+                self._add_to_result_cache(result.uid, plugin)
+            if self.task_journal:
+                self.task_journal.finish_task(result.uid, plugin)
+        self._start_ready_analyses(fw_object)
+
+    def _start_or_skip_analysis(self, analysis_to_do: str, file_object: FileObject) -> bool:
+        '''
+        returns True if a job was added to the plugin and False if the analysis was skipped
+        '''
         if self._analysis_is_already_in_db_and_up_to_date(analysis_to_do, file_object.uid):
             logging.debug('skipping analysis "{}" for {} (analysis already in DB)'.format(analysis_to_do, file_object.uid))
-            if analysis_to_do in self._get_cumulative_remaining_dependencies(file_object.scheduled_analysis):
+            self._add_to_result_cache(file_object.uid, analysis_to_do)
+            if analysis_to_do in self._get_required_analyses_of_remaining_plugins(file_object.scheduled_analysis):
                 self._add_completed_analysis_results_to_file_object(analysis_to_do, file_object)
-            self.check_further_process_or_complete(file_object)
-        elif analysis_to_do not in MANDATORY_PLUGINS and self._next_analysis_is_blacklisted(analysis_to_do, file_object):
+            return False
+        if analysis_to_do not in MANDATORY_PLUGINS and self._next_analysis_is_blacklisted(analysis_to_do, file_object):
             logging.debug('skipping analysis "{}" for {} (blacklisted file type)'.format(analysis_to_do, file_object.uid))
             file_object.processed_analysis[analysis_to_do] = self._get_skipped_analysis_result(analysis_to_do)
-            self.post_analysis(file_object)
-            self.check_further_process_or_complete(file_object)
-        else:
-            self.analysis_plugins[analysis_to_do].add_job(file_object)
+            self.post_analysis(file_object, [analysis_to_do])
+            self._add_to_result_cache(file_object.uid, analysis_to_do)
+            return False
+        self._add_job_to_queue(analysis_to_do, self._create_analysis_task(file_object, analysis_to_do))
+        return True
+
+    # ---- fair share job queues ----
+
+    def _setup_job_queues(self):
+        for plugin in self.analysis_plugins:
+            self.job_queues[plugin] = FairQueue()
+            self.jobs_in_flight[plugin] = 0
+            self.pending_jobs[plugin] = {priority: Value('i', 0) for priority in AnalysisPriority.ALL}
+            self.dispatched_jobs[plugin] = 0
+            self.payload_sizes[plugin] = Value('d', 0.0)
+
+    def _add_job_to_queue(self, plugin: str, task: FileObject):
+        '''
+        jobs are queued per plugin with weighted fair share between the root objects of all current analyses
+        '''
+        flow = (task.priority, task.get_root_uid())
+        self.job_queues[plugin].put(task, flow, weight=AnalysisPriority.WEIGHTS[task.priority])
+        self._update_pending_jobs(plugin, task.priority, 1)
+        self._dispatch_queued_jobs(plugin)
+
+    def _dispatch_queued_jobs(self, plugin: str):
+        if not self.job_queues[plugin]:
+            return
+        job_limit = QUEUED_JOBS_PER_WORKER * self.analysis_plugins[plugin].thread_count * getattr(self.analysis_plugins[plugin], 'BATCH_SIZE', 1)
+        while self.job_queues[plugin] and self.jobs_in_flight[plugin] < job_limit:
+            task = self.job_queues[plugin].get()
+            self._update_pending_jobs(plugin, task.priority, -1)
+            self.jobs_in_flight[plugin] += 1
+            self.dispatched_jobs[plugin] += 1
+            if self.dispatched_jobs[plugin] % PAYLOAD_SAMPLE_RATE == 1:
+                self._update_payload_size(plugin, task)
+            self.analysis_plugins[plugin].add_job(task)
+
+    def _update_pending_jobs(self, plugin: str, priority: int, difference: int):
+        with self.pending_jobs[plugin][priority].get_lock():
+            self.pending_jobs[plugin][priority].value += difference
+
+    def _update_payload_size(self, plugin: str, task: FileObject):
+        '''
+        moving average of the pickled job size (the binary is not part of the payload if the file is stored)
+        '''
+        payload_size = self.payload_sizes[plugin]
+        size = len(pickle.dumps(task, protocol=pickle.HIGHEST_PROTOCOL))
+        payload_size.value = size if not payload_size.value else 0.9 * payload_size.value + 0.1 * size
+
+    def _create_analysis_task(self, file_object: FileObject, plugin: str) -> FileObject:
+        '''
+        The task only contains the analysis results the plugin reads (its dependencies and REQUIRED_ANALYSES).
+        Queues pickle their content asynchronously -> the task must not share mutable state with the scheduled object
+        '''
+        task = copy(file_object)
+        task.processed_analysis = {
+            analysis: file_object.processed_analysis[analysis]
+            for analysis in self._get_required_analyses(plugin)
+            if analysis in file_object.processed_analysis
+        }
+        task.analysis_tags = {}
+        task.scheduled_analysis = []
+        return task
+
+    def _get_required_analyses(self, plugin: str) -> Set[str]:
+        required_analyses = getattr(self.analysis_plugins[plugin], 'REQUIRED_ANALYSES', [])
+        return set(self._get_dependencies_for_dispatch(plugin)).union(required_analyses)
+
+    def _get_required_analyses_of_remaining_plugins(self, scheduled_analyses: List[str]) -> Set[str]:
+        return set().union(*(self._get_required_analyses(plugin) for plugin in scheduled_analyses))
 
     def _add_completed_analysis_results_to_file_object(self, analysis_to_do: str, fw_object: FileObject):
         db_entry = self.db_backend_service.get_specific_fields_of_db_entry(
@@ -241,26 +530,44 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         fw_object.processed_analysis[analysis_to_do] = desanitized_analysis[analysis_to_do]
 
     def _analysis_is_already_in_db_and_up_to_date(self, analysis_to_do: str, uid: str):
-        db_entry = self.db_backend_service.get_specific_fields_of_db_entry(
-            uid,
-            {
-                'processed_analysis.{plugin}.{key}'.format(plugin=analysis_to_do, key=key): 1
-                for key in ['failed', 'file_system_flag', 'plugin_version', 'system_version']
-            }
-        )
-        if not db_entry or analysis_to_do not in db_entry['processed_analysis'] or 'failed' in db_entry['processed_analysis'][analysis_to_do]:
+        analysis_entry = self._get_analysis_version_entry(analysis_to_do, uid)
+        if not analysis_entry or 'failed' in analysis_entry:
             return False
-        if 'plugin_version' not in db_entry['processed_analysis'][analysis_to_do]:
+        if 'plugin_version' not in analysis_entry:
             logging.error('Plugin Version missing: UID: {}, Plugin: {}'.format(uid, analysis_to_do))
             return False
 
-        if db_entry['processed_analysis'][analysis_to_do]['file_system_flag']:
-            db_entry['processed_analysis'] = self.db_backend_service.retrieve_analysis(db_entry['processed_analysis'], analysis_filter=[analysis_to_do])
-            if 'file_system_flag' in db_entry['processed_analysis'][analysis_to_do]:
+        if analysis_entry['file_system_flag']:
+            analysis_entry = self.db_backend_service.retrieve_analysis({analysis_to_do: dict(analysis_entry)}, analysis_filter=[analysis_to_do])[analysis_to_do]
+            if 'file_system_flag' in analysis_entry:
                 logging.warning('Desanitization of version string failed')
                 return False
 
-        return self._analysis_is_up_to_date(db_entry['processed_analysis'][analysis_to_do], self.analysis_plugins[analysis_to_do])
+        return self._analysis_is_up_to_date(analysis_entry, self.analysis_plugins[analysis_to_do])
+
+    def _get_analysis_version_entry(self, analysis_to_do: str, uid: str) -> Optional[dict]:
+        cached_versions = self.analysis_version_cache.setdefault(uid, {})
+        if analysis_to_do not in cached_versions:
+            cached_versions.update(self._get_analysis_versions_from_db(uid, [analysis_to_do]))
+        return cached_versions[analysis_to_do]
+
+    def _get_analysis_versions_from_db(self, uid: str, plugin_list: List[str]) -> Dict[str, Optional[dict]]:
+        '''
+        fetch the version information of all plugins in plugin_list with a single projection query
+        (plugins without an analysis entry in the DB are mapped to None)
+        '''
+        if not plugin_list:
+            return {}
+        projection = {
+            'processed_analysis.{plugin}.{key}'.format(plugin=plugin, key=key): 1
+            for plugin in plugin_list
+            for key in ANALYSIS_VERSION_FIELDS
+        }
+        if 'file_type' in plugin_list:  # needed for the blacklist if file_type is skipped
+            projection['processed_analysis.file_type.mime'] = 1
+        db_entry = self.db_backend_service.get_specific_fields_of_db_entry(uid, projection)
+        processed_analysis = db_entry.get('processed_analysis', {}) if db_entry else {}
+        return {plugin: processed_analysis.get(plugin) for plugin in plugin_list}
 
     @staticmethod
     def _analysis_is_up_to_date(analysis_db_entry: dict, analysis_plugin: AnalysisBasePlugin):
@@ -287,25 +594,30 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
             'plugin_version': self.analysis_plugins[analysis_to_do].VERSION
         }
 
-    def _next_analysis_is_blacklisted(self, next_analysis: str, fw_object: FileObject):
-        blacklist, whitelist = self._get_blacklist_and_whitelist(next_analysis)
-        if not (blacklist or whitelist):
+    def _next_analysis_is_blacklisted(self, next_analysis: str, fw_object: FileObject) -> bool:
+        if next_analysis not in self.mime_filters:
+            self.mime_filters[next_analysis] = self._create_mime_filter(next_analysis)
+        if self.mime_filters[next_analysis].empty:
             return False
+        return self.mime_filters[next_analysis].is_blacklisted(self._get_file_type(fw_object))
+
+    def _create_mime_filter(self, analysis_plugin: str) -> MimeFilter:
+        blacklist, whitelist = self._get_blacklist_and_whitelist(analysis_plugin)
         if blacklist and whitelist:
-            message = color_string('Configuration of plugin "{}" erroneous'.format(next_analysis), TerminalColors.FAIL)
+            message = color_string('Configuration of plugin "{}" erroneous'.format(analysis_plugin), TerminalColors.FAIL)
             logging.error('{}: found blacklist and whitelist. Ignoring blacklist.'.format(message))
+        return MimeFilter(blacklist, whitelist)
 
-        file_type = self._get_file_type_from_object_or_db(fw_object)
-
-        if whitelist:
-            return not substring_is_in_list(file_type, whitelist)
-        return substring_is_in_list(file_type, blacklist)
-
-    def _get_file_type_from_object_or_db(self, fw_object: FileObject) -> Optional[str]:
-        if 'file_type' not in fw_object.processed_analysis:
-            self._add_completed_analysis_results_to_file_object('file_type', fw_object)
-
-        return fw_object.processed_analysis['file_type']['mime'].lower()
+    def _get_file_type(self, fw_object: FileObject) -> str:
+        '''
+        the MIME type is taken from the file_type result of the object or (if file_type was skipped because it is
+        already in the DB) from the analysis version entry that was fetched when the analysis of the object started
+        '''
+        if 'file_type' in fw_object.processed_analysis:
+            mime = fw_object.processed_analysis['file_type'].get('mime')
+        else:
+            mime = (self._get_analysis_version_entry('file_type', fw_object.uid) or {}).get('mime')
+        return mime.lower() if mime else ''
 
     def _get_blacklist_and_whitelist(self, next_analysis: str) -> Tuple[List, List]:
         blacklist, whitelist = self._get_blacklist_and_whitelist_from_config(next_analysis)
@@ -332,38 +644,44 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
 
 # ---- miscellaneous functions ----
 
-    def result_collector(self):  # pylint: disable=too-complex
+    def result_collector(self):
+        plugin_by_out_queue = {plugin.out_queue: plugin_name for plugin_name, plugin in self.analysis_plugins.items()}
         while self.stop_condition.value == 0:
-            nop = True
-            for plugin in self.analysis_plugins:
+            ready_queues = get_ready_queues(list(plugin_by_out_queue), timeout=float(self.config['ExpertSettings']['block_delay']))
+            for out_queue in ready_queues:
                 try:
-                    fw = self.analysis_plugins[plugin].out_queue.get_nowait()
-                    fw = self._handle_analysis_tags(fw, plugin)
+                    fw = out_queue.get_nowait()
                 except Empty:
-                    pass
-                else:
-                    nop = False
-                    if plugin in fw.processed_analysis:
-                        if fw.analysis_exception:
-                            self._reschedule_failed_analysis_task(fw)
+                    continue
+                self._handle_analysis_result(fw, plugin_by_out_queue[out_queue])
 
-                        self.post_analysis(fw)
-                    self.check_further_process_or_complete(fw)
-            if nop:
-                sleep(float(self.config['ExpertSettings']['block_delay']))
+    def _handle_analysis_result(self, fw, plugin):
+        fw = self._handle_analysis_tags(fw, plugin)
+        self.result_queue.put((plugin, fw))
 
     def _handle_analysis_tags(self, fw, plugin):
         self.tag_queue.put(check_tags(fw, plugin))
         return add_tags_to_object(fw, plugin)
 
     def check_further_process_or_complete(self, fw_object):
+        '''
+        queued objects are journaled right away (and not only when the scheduler process dispatches them), so that
+        tasks still waiting in the process queue can be resumed after a crash
+        (this may run outside of the scheduler process which flushes the journal buffer, so it is written immediately)
+        '''
         if not fw_object.scheduled_analysis:
-            logging.info('Analysis Completed:\n{}'.format(fw_object))
-            if not isinstance(fw_object, Firmware):
-                self._remove_from_current_analyses(fw_object)
+            self._complete_analysis(fw_object)
         else:
+            if self.task_journal:
+                self.task_journal.add_tasks(fw_object, fw_object.scheduled_analysis)
+                self.task_journal.flush(force=True)
             self.process_queue.put(fw_object)
 
+    def _complete_analysis(self, fw_object):
+        logging.info('Analysis Completed:\n{}'.format(fw_object))
+        if not isinstance(fw_object, Firmware):
+            self.status.remove_object(fw_object)
+
     @staticmethod
     def _remove_unwanted_plugins(list_of_plugins):
         defaults = ['dummy_plugin_for_testing_only']
@@ -375,6 +693,8 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         for _, plugin in self.analysis_plugins.items():
             if plugin.check_exceptions():
                 return True
+        if self.status.check_exceptions():
+            return True
         return check_worker_exceptions([self.schedule_process, self.result_collector_process], 'Scheduler')
 
     def _add_dependencies_recursively(self, scheduled_analyses: List[str]) -> List[str]:
@@ -392,23 +712,3 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
             for plugin in scheduled_analyses
             for dependency in self.analysis_plugins[plugin].DEPENDENCIES
         }.difference(scheduled_analyses)
-
-    # currently running analyses
-
-    def _add_to_current_analyses(self, fw_object: Union[Firmware, FileObject]):
-        if isinstance(fw_object, Firmware):
-            self.currently_running[fw_object.uid] = list(fw_object.files_included)
-        elif fw_object.files_included:
-            for parent in self._find_currently_analyzed_parents(fw_object):
-                union = set(fw_object.files_included).union(self.currently_running[parent])
-                self.currently_running[parent] = list(union)
-
-    def _remove_from_current_analyses(self, fw_object: Union[Firmware, FileObject]):
-        for parent in self._find_currently_analyzed_parents(fw_object):
-            self.currently_running[parent] = [uid for uid in self.currently_running[parent] if uid != fw_object.uid]
-            if len(self.currently_running[parent]) == 0:
-                self.currently_running.pop(parent)
-                logging.info('Analysis of firmware {} completed'.format(parent))
-
-    def _find_currently_analyzed_parents(self, fo):
-        return set(self.currently_running.keys()).intersection(fo.parent_firmware_uids)
@@ -0,0 +1,64 @@
+import logging
+from collections import deque
+from time import time
+from typing import Dict, List
+
+import psutil
+
+from analysis.PluginBase import AnalysisBasePlugin
+
+
+class WorkerAutoscaler:
+    '''
+    Scales the worker pools of the analysis plugins (between min_threads and max_threads) based on their queue depth:
+    Plugins with more queued jobs than workers and no idle worker get an additional worker (largest backlog per worker
+    first) as long as the number of additional workers (above the configured threads of all plugins) stays within the
+    worker limit and the memory usage below the memory limit. Plugins with an empty queue and idle workers lose a
+    worker. Each pool changes by one worker per call.
+    '''
+
+    HISTORY_LENGTH = 20
+
+    def __init__(self, worker_limit: int = 0, memory_limit: float = 90.0):
+        self.worker_limit = worker_limit if worker_limit > 0 else psutil.cpu_count()
+        self.memory_limit = memory_limit
+        self.decisions = deque(maxlen=self.HISTORY_LENGTH)
+
+    def scale(self, plugins: Dict[str, AnalysisBasePlugin], queue_lengths: Dict[str, int]):
+        for name, plugin in plugins.items():
+            if self._has_surplus_workers(plugin, queue_lengths[name]):
+                self._change_worker_count(name, plugin, -1, 'idle')
+
+        additional_workers = sum(max(plugin.thread_count - plugin.configured_threads, 0) for plugin in plugins.values())
+        candidates = [name for name, plugin in plugins.items() if self._needs_more_workers(plugin, queue_lengths[name])]
+        for name in sorted(candidates, key=lambda name: queue_lengths[name] / plugins[name].thread_count, reverse=True):
+            if additional_workers >= self.worker_limit or psutil.virtual_memory().percent >= self.memory_limit:
+                break
+            self._change_worker_count(name, plugins[name], 1, '{} queued jobs'.format(queue_lengths[name]))
+            additional_workers += 1
+
+    def get_decisions(self) -> List[dict]:
+        return list(self.decisions)
+
+    def _has_surplus_workers(self, plugin: AnalysisBasePlugin, queue_length: int) -> bool:
+        return (
+            plugin.thread_count > plugin.min_threads
+            and queue_length == 0
+            and self._get_active_workers(plugin) < plugin.thread_count
+        )
+
+    def _needs_more_workers(self, plugin: AnalysisBasePlugin, queue_length: int) -> bool:
+        return (
+            plugin.thread_count < plugin.max_threads
+            and queue_length > plugin.thread_count
+            and self._get_active_workers(plugin) >= plugin.thread_count
+        )
+
+    @staticmethod
+    def _get_active_workers(plugin: AnalysisBasePlugin) -> int:
+        return sum(active.value for active in plugin.active)
+
+    def _change_worker_count(self, name: str, plugin: AnalysisBasePlugin, difference: int, reason: str):
+        worker_count = plugin.scale_workers(plugin.thread_count + difference)
+        logging.info('Scaled {} to {} workers ({})'.format(name, worker_count, reason))
+        self.decisions.appendleft({'time': time(), 'plugin': name, 'workers': worker_count, 'reason': reason})
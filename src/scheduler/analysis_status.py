@@ -0,0 +1,87 @@
+import logging
+from multiprocessing import Manager, Queue, Value
+from queue import Empty
+from time import time
+from typing import Dict, Iterable, Set
+
+from helperFunctions.process import ExceptionSafeProcess, check_worker_exceptions
+from objects.file import FileObject
+from objects.firmware import Firmware
+
+
+class AnalysisStatus:
+    '''
+    Progress index of the currently running firmware analyses:
+    Updates (from any process) are sent to a dedicated worker process that keeps the set of pending files for each
+    firmware (O(1) per analyzed file) and publishes a snapshot of the remaining file counts at most once per interval
+    '''
+
+    def __init__(self, block_delay: float = 0.1, snapshot_interval: float = 1.0):
+        self.block_delay = block_delay
+        self.snapshot_interval = snapshot_interval
+        self.currently_running = {}  # firmware uid -> uids of pending files (only used inside the worker process)
+        self.stop_condition = Value('i', 0)
+        self.update_queue = Queue()
+        self.manager = Manager()
+        self.snapshot = self.manager.Namespace()
+        self.snapshot.current_analyses = {}
+        self.worker_process = ExceptionSafeProcess(target=self._worker)
+        self.worker_process.start()
+
+    def shutdown(self):
+        self.stop_condition.value = 1
+        self.worker_process.join()
+        self.manager.shutdown()
+
+    def add_object(self, fw_object: FileObject):
+        if isinstance(fw_object, Firmware):
+            self.update_queue.put(('add_firmware', fw_object.uid, list(fw_object.files_included)))
+        elif fw_object.files_included:
+            self.update_queue.put(('add_files', list(fw_object.files_included), list(fw_object.parent_firmware_uids)))
+
+    def remove_object(self, fw_object: FileObject):
+        if fw_object.parent_firmware_uids:
+            self.update_queue.put(('remove_file', fw_object.uid, list(fw_object.parent_firmware_uids)))
+
+    def get_current_analyses(self) -> Dict[str, int]:
+        '''
+        returns the number of remaining files for each firmware that is currently analyzed (may lag behind by one interval)
+        '''
+        return self.snapshot.current_analyses
+
+    def check_exceptions(self):
+        return check_worker_exceptions([self.worker_process], 'Analysis Status')
+
+# ---- internal functions ----
+
+    def _worker(self):
+        snapshot_is_outdated, last_snapshot = False, 0.0
+        while self.stop_condition.value == 0:
+            try:
+                action, *args = self.update_queue.get(timeout=self.block_delay)
+            except Empty:
+                pass
+            else:
+                getattr(self, '_{}'.format(action))(*args)
+                snapshot_is_outdated = True
+            if snapshot_is_outdated and time() - last_snapshot >= self.snapshot_interval:
+                self.snapshot.current_analyses = {uid: len(pending_files) for uid, pending_files in self.currently_running.items()}
+                snapshot_is_outdated, last_snapshot = False, time()
+
+    def _add_firmware(self, uid: str, included_files: Iterable[str]):
+        if included_files:
+            self.currently_running[uid] = set(included_files)
+
+    def _add_files(self, included_files: Iterable[str], parent_firmware_uids: Iterable[str]):
+        for parent in self._find_currently_analyzed_parents(parent_firmware_uids):
+            self.currently_running[parent].update(included_files)
+
+    def _remove_file(self, uid: str, parent_firmware_uids: Iterable[str]):
+        for parent in self._find_currently_analyzed_parents(parent_firmware_uids):
+            self.currently_running[parent].discard(uid)
+            if not self.currently_running[parent]:
+                self.currently_running.pop(parent)
+                logging.info('Analysis of firmware {} completed'.format(parent))
+
+    def _find_currently_analyzed_parents(self, parent_firmware_uids: Iterable[str]) -> Set[str]:
+        return set(parent_firmware_uids).intersection(self.currently_running)
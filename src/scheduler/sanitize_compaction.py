@@ -0,0 +1,39 @@
+import logging
+from multiprocessing import Value
+from time import sleep, time
+
+from helperFunctions.process import ExceptionSafeProcess
+from storage.db_interface_sanitize_compactor import SanitizeStorageCompactor
+
+
+class SanitizeCompactionDaemon:
+    '''
+    Runs the compaction of the sanitize file storage every sanitize_compaction_interval seconds (0 = never)
+    '''
+
+    def __init__(self, config=None):
+        self.config = config
+        self.interval = self.config.getint('ExpertSettings', 'sanitize_compaction_interval', fallback=0)
+        self.throttle_delay = self.config.getfloat('ExpertSettings', 'sanitize_compaction_throttle', fallback=0.5)
+        self.stop_condition = Value('i', 0)
+        self.compaction_process = None
+        if self.interval > 0:
+            self.compaction_process = ExceptionSafeProcess(target=self._compaction_main)
+            self.compaction_process.start()
+            logging.info('Sanitize compaction daemon online')
+
+    def shutdown(self):
+        self.stop_condition.value = 1
+        if self.compaction_process:
+            self.compaction_process.join()
+            logging.info('Sanitize compaction daemon offline')
+
+    def _compaction_main(self):
+        compactor = SanitizeStorageCompactor(config=self.config, throttle_delay=self.throttle_delay, stop_condition=self.stop_condition)
+        next_run = time() + self.interval
+        while self.stop_condition.value == 0:
+            if time() >= next_run:
+                compactor.compact()
+                next_run = time() + self.interval
+            sleep(float(self.config['ExpertSettings']['block_delay']))
+        compactor.shutdown()
@@ -29,6 +29,7 @@ from intercom.back_end_binding import InterComBackEndBinding
 from scheduler.Analysis import AnalysisScheduler
 from scheduler.analysis_tag import TaggingDaemon
 from scheduler.Compare import CompareScheduler
+from scheduler.sanitize_compaction import SanitizeCompactionDaemon
 from scheduler.Unpacking import UnpackingScheduler
 from statistic.work_load import WorkLoadStatistic
 
@@ -60,9 +61,12 @@ if __name__ == '__main__':
     compare_service = CompareScheduler(config=config)
     intercom = InterComBackEndBinding(config=config, analysis_service=analysis_service, compare_service=compare_service, unpacking_service=unpacking_service)
     work_load_stat = WorkLoadStatistic(config=config)
+    compaction_service = SanitizeCompactionDaemon(config=config)
+    analysis_service.resume_analyses_from_journal()
 
     run = True
     while run:
+        analysis_service.scale_workers()
         work_load_stat.update(unpacking_workload=unpacking_service.get_scheduled_workload(), analysis_workload=analysis_service.get_scheduled_workload())
         if any((unpacking_service.check_exceptions(), compare_service.check_exceptions(), analysis_service.check_exceptions())):
             break
@@ -72,6 +76,7 @@ if __name__ == '__main__':
 
     logging.info('Shutting down components')
     work_load_stat.shutdown()
+    compaction_service.shutdown()
     intercom.shutdown()
     compare_service.shutdown()
     unpacking_service.shutdown()
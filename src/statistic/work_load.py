@@ -5,6 +5,7 @@ import logging
 import os
 import sys
 from time import time
+from typing import List, Optional
 
 import distro
 import psutil
@@ -78,3 +79,18 @@ class WorkLoadStatistic(object):
             'python': python_version,
             'fact_version': fact_version
         }
+
+
+def get_plugin_runtime_ranking(analysis_workload: Optional[dict]) -> List[dict]:
+    '''
+    returns the execution metrics of the analysis plugins sorted by their share of the total analysis time
+    '''
+    if not analysis_workload:
+        return []
+    metrics = {name: plugin['metrics'] for name, plugin in analysis_workload['plugins'].items() if 'metrics' in plugin}
+    total_time = sum(plugin_metrics['wall_time'] for plugin_metrics in metrics.values())
+    ranking = [
+        dict(plugin_metrics, plugin=name, time_share=plugin_metrics['wall_time'] / total_time if total_time else 0.0)
+        for name, plugin_metrics in metrics.items()
+    ]
+    return sorted(ranking, key=lambda plugin_metrics: plugin_metrics['wall_time'], reverse=True)
@@ -6,8 +6,10 @@ from common_helper_process import execute_shell_command
 from pymongo import MongoClient, errors
 
 from helperFunctions.config import get_config_dir
+from helperFunctions.database import ConnectTo
 from helperFunctions.mongo_config_parser import get_mongo_path
 from helperFunctions.process import complete_shutdown
+from storage.db_interface_index import IndexProvisioner
 
 
 class MongoMgr:
@@ -27,6 +29,8 @@ class MongoMgr:
         create_dir_for_file(self.mongo_log_path)
         os.makedirs(self.mongo_db_file_path, exist_ok=True)
         self.start(_authenticate=auth)
+        if auth:
+            self.check_indexes()
 
     def auth_is_enabled(self):
         try:
@@ -48,6 +52,17 @@ class MongoMgr:
         else:
             logging.info('using external mongodb: {}:{}'.format(self.config['data_storage']['mongo_server'], self.config['data_storage']['mongo_port']))
 
+    def check_indexes(self):
+        '''
+        creates missing indexes (e.g. after an update of FACT) so that queries do not fall back to collection scans
+        (data of older versions is migrated by init_database.py so that the startup is not blocked)
+        '''
+        try:
+            with ConnectTo(IndexProvisioner, self.config) as provisioner:
+                provisioner.create_missing_indexes()
+        except errors.PyMongoError as error:
+            logging.error('Could not check database indexes: {} {}'.format(type(error), error))
+
     def check_file_and_directory_existence_and_permissions(self):
         if not os.path.isfile(self.config_path):
             complete_shutdown('Error: config file not found: {}'.format(self.config_path))
@@ -0,0 +1,60 @@
+import logging
+import pickle
+import zlib
+from typing import Any, Optional, Tuple
+
+try:
+    import msgpack
+    import zstandard
+except ImportError:
+    msgpack, zstandard = None, None
+
+# analysis results extracted to the sanitize file storage are serialized with one of these (name -> dump, load)
+# files without a serializer in their metadata are single pickled values of the legacy format
+SERIALIZERS = {
+    'pickle': (pickle.dumps, pickle.loads),
+    'pickle_zlib': (lambda data: zlib.compress(pickle.dumps(data)), lambda data: pickle.loads(zlib.decompress(data))),
+}
+FALLBACK_SERIALIZER = 'pickle_zlib'
+ZSTD_LEVEL = 3
+
+
+def _msgpack_default(data):
+    if isinstance(data, (set, frozenset)):
+        return list(data)
+    raise TypeError('can not serialize {}'.format(type(data)))
+
+
+def _dump_msgpack_zstd(data) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(msgpack.packb(data, use_bin_type=True, default=_msgpack_default))
+
+
+def _load_msgpack_zstd(data: bytes):
+    return msgpack.unpackb(zstandard.ZstdDecompressor().decompress(data), raw=False, strict_map_key=False)
+
+
+if msgpack is not None:
+    SERIALIZERS['msgpack_zstd'] = (_dump_msgpack_zstd, _load_msgpack_zstd)
+
+
+def get_serializer(name: str) -> str:
+    if name not in SERIALIZERS:
+        logging.warning('Analysis serializer {} not available. Using {} instead'.format(name, FALLBACK_SERIALIZER))
+        return FALLBACK_SERIALIZER
+    return name
+
+
+def serialize(data: Any, serializer: str) -> Tuple[bytes, str]:
+    '''
+    returns the serialized data and the name of the serializer that was used
+    (data that msgpack can not represent, e.g. custom objects, falls back to the pickle based serializer)
+    '''
+    try:
+        return SERIALIZERS[serializer][0](data), serializer
+    except (TypeError, ValueError, OverflowError) as error:
+        logging.debug('Could not serialize analysis with {}: {}'.format(serializer, error))
+        return SERIALIZERS[FALLBACK_SERIALIZER][0](data), FALLBACK_SERIALIZER
+
+
+def deserialize(data: bytes, serializer: Optional[str]) -> Any:
+    return SERIALIZERS[serializer or 'pickle'][1](data)
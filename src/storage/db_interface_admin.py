@@ -42,6 +42,8 @@ class AdminDbInterface(MongoInterfaceCommon):
                 self.intercom.delete_file(fw)
             self._delete_swapped_analysis_entries(fw)
             self.firmwares.delete_one({'_id': uid})
+            self.analysis_result_cache.delete_one({'_id': uid})
+            self.firmware_summaries.delete_many({'root_uid': uid})
         else:
             logging.error('Firmware not found in Database: {}'.format(uid))
         return removed_fp, deleted
@@ -50,11 +52,13 @@ class AdminDbInterface(MongoInterfaceCommon):
         for key in fo_entry['processed_analysis']:
             try:
                 if fo_entry['processed_analysis'][key]['file_system_flag']:
-                    for analysis_key in fo_entry['processed_analysis'][key].keys():
-                        if analysis_key != 'file_system_flag' and isinstance(fo_entry['processed_analysis'][key][analysis_key], str):
-                            sanitize_id = fo_entry['processed_analysis'][key][analysis_key]
-                            entry = self.sanitize_fs.find_one({'filename': sanitize_id})
-                            self.sanitize_fs.delete(entry._id)
+                    sanitized_files = {  # all extracted fields of a result share the same file
+                        value for analysis_key, value in fo_entry['processed_analysis'][key].items()
+                        if self._is_sanitized_file_name(key, analysis_key, value)
+                    }
+                    for sanitize_id in sanitized_files:
+                        entry = self.sanitize_fs.find_one({'filename': sanitize_id})
+                        self.sanitize_fs.delete(entry._id)
             except KeyError:
                 logging.warning('key error while deleting analysis for {}:{}'.format(fo_entry['_id'], key))
 
@@ -79,6 +83,7 @@ class AdminDbInterface(MongoInterfaceCommon):
                 self.remove_object_field(fo_uid, 'virtual_file_path.{}'.format(root_uid))
                 if 'parent_firmware_uids' in fo:
                     self.remove_from_object_array(fo_uid, 'parent_firmware_uids', root_uid)
+                self.remove_from_object_array(fo_uid, 'root_firmware_uids', root_uid)
                 removed_fp += 1
             else:
                 self._delete_swapped_analysis_entries(fo)
@@ -89,3 +94,4 @@ class AdminDbInterface(MongoInterfaceCommon):
     def _delete_file_object(self, fo_entry):
         self.intercom.delete_file(fo_entry)
         self.file_objects.delete_one({'_id': fo_entry['_id']})
+        self.analysis_result_cache.delete_one({'_id': fo_entry['_id']})
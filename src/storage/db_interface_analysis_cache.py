@@ -0,0 +1,58 @@
+from collections import OrderedDict
+from multiprocessing import Value
+from time import time
+from typing import Iterable, Optional, Set
+
+from storage.mongo_interface import MongoInterface
+
+
+class AnalysisResultCache(MongoInterface):
+    '''
+    Content-addressed cache of the analysis results in the database: for each file (uid) the keys
+    (plugin, plugin version, system version) of its completed analyses.
+    Lookups are answered from memory for MEMORY_TTL seconds unless the memory was invalidated in any process
+    (e.g. because analysis results were deleted)
+    '''
+
+    READ_ONLY = False
+    MEMORY_SIZE = 10000
+    MEMORY_TTL = 10.0
+
+    def __init__(self, config=None):
+        super().__init__(config=config)
+        self._memory = OrderedDict()  # uid -> (lookup time, generation, keys)
+        self._generation = Value('i', 0)
+
+    def _setup_database_mapping(self):
+        self.main = self.client[self.config['data_storage']['main_database']]
+        self.analysis_result_cache = self.main.analysis_result_cache
+
+    @staticmethod
+    def get_key(plugin: str, plugin_version: str, system_version: Optional[str]) -> str:
+        return '{}|{}|{}'.format(plugin, plugin_version, system_version or '')
+
+    def get_keys(self, uid: str) -> Set[str]:
+        entry = self._memory.get(uid)
+        if entry and time() - entry[0] < self.MEMORY_TTL and entry[1] == self._generation.value:
+            self._memory.move_to_end(uid)
+            return entry[2]
+        db_entry = self.analysis_result_cache.find_one({'_id': uid}, {'keys': 1})
+        keys = set(db_entry['keys']) if db_entry else set()
+        self._remember(uid, keys)
+        return keys
+
+    def add_keys(self, uid: str, keys: Iterable[str]):
+        keys = list(keys)
+        self.analysis_result_cache.update_one({'_id': uid}, {'$addToSet': {'keys': {'$each': keys}}}, upsert=True)
+        if uid in self._memory:
+            self._memory[uid][2].update(keys)
+
+    def invalidate_memory(self):
+        with self._generation.get_lock():
+            self._generation.value += 1
+
+    def _remember(self, uid: str, keys: Set[str]):
+        self._memory[uid] = (time(), self._generation.value, keys)
+        self._memory.move_to_end(uid)
+        if len(self._memory) > self.MEMORY_SIZE:
+            self._memory.popitem(last=False)
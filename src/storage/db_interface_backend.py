@@ -1,19 +1,37 @@
 import logging
 import sys
+from hashlib import sha256
 from time import time
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from pymongo.errors import PyMongoError
+from pymongo import UpdateMany, UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, PyMongoError
 
 from helperFunctions.dataConversion import convert_str_to_time
-from helperFunctions.object_storage import update_virtual_file_path, update_included_files, update_analysis_tags
 from helperFunctions.tag import update_tags
 from objects.file import FileObject
 from objects.firmware import Firmware
-from storage.db_interface_common import MongoInterfaceCommon
+from storage.db_interface_common import INLINE_ANALYSIS_KEYS, MongoInterfaceCommon
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _get_summary_entry_id(root_uid: str, plugin: str, item) -> str:
+    return '{}_{}_{}'.format(root_uid, plugin, sha256(str(item).encode()).hexdigest())
 
 
 class BackEndDbInterface(MongoInterfaceCommon):
 
+    ANALYSIS_BUFFER_SIZE = 100
+
+    def __init__(self, config=None):
+        super().__init__(config=config)
+        self.analysis_write_interval = config.getint('ExpertSettings', 'analysis_write_interval', fallback=200) / 1000
+        self._analysis_buffer = {}  # (collection name, uid) -> dotted $set update
+        self._summary_buffer = {}  # (collection name, uid) -> (root uids, plugin -> summary)
+        self._last_analysis_flush = time()
+
     def add_object(self, fo_fw):
         if isinstance(fo_fw, Firmware):
             self.add_firmware(fo_fw)
@@ -25,15 +43,22 @@ class BackEndDbInterface(MongoInterfaceCommon):
         self.release_unpacking_lock(fo_fw.uid)
 
     def update_object(self, new_object=None, old_object=None):
-        update_dictionary = {
-            'processed_analysis': self._update_processed_analysis(new_object, old_object),
-            'files_included': update_included_files(new_object, old_object),
-            'virtual_file_path': update_virtual_file_path(new_object, old_object),
-            'analysis_tags': update_analysis_tags(new_object, old_object),
-        }
+        '''
+        update an existing entry in place: only changed analysis results are (sanitized and) written, everything else is
+        merged with targeted operators so that unchanged sanitized results in the file storage are not touched
+        :param old_object: existing DB entry (at least the analysis metadata from _get_update_projection)
+        '''
+        changed_plugins = [
+            plugin for plugin in new_object.processed_analysis
+            if not self._analysis_is_unchanged(new_object.processed_analysis[plugin], old_object.get('processed_analysis', {}).get(plugin))
+        ]
+        collection, set_dictionary = self._get_analysis_update(new_object, changed_plugins)
+        set_dictionary.update({'analysis_tags.{}'.format(plugin): tags for plugin, tags in new_object.analysis_tags.items()})
+        set_dictionary.update({'virtual_file_path.{}'.format(uid): paths for uid, paths in new_object.virtual_file_path.items()})
+        add_to_set_dictionary = {'files_included': {'$each': list(new_object.files_included)}}
 
         if isinstance(new_object, Firmware):
-            update_dictionary.update({
+            set_dictionary.update({
                 'version': new_object.version,
                 'device_name': new_object.device_name,
                 'device_part': new_object.part,
@@ -42,23 +67,46 @@ class BackEndDbInterface(MongoInterfaceCommon):
                 'release_date': convert_str_to_time(new_object.release_date),
                 'tags': new_object.tags,
             })
-            collection = self.firmwares
         else:
-            update_dictionary.update({
-                'parent_firmware_uids': list(set.union(set(old_object['parent_firmware_uids']), new_object.parent_firmware_uids))
-            })
-            collection = self.file_objects
+            add_to_set_dictionary['parent_firmware_uids'] = {'$each': list(new_object.parent_firmware_uids)}
+            add_to_set_dictionary['root_firmware_uids'] = {'$each': list(new_object.virtual_file_path)}
+
+        update = {'$addToSet': add_to_set_dictionary}
+        if set_dictionary:
+            update['$set'] = set_dictionary
+        collection.update_one({'_id': new_object.uid}, update)
+        self._update_summaries_of_updated_object(collection, new_object, old_object, changed_plugins)
+
+    def _update_summaries_of_updated_object(self, collection: Collection, new_object: FileObject, old_object: dict, changed_plugins: List[str]):
+        '''
+        changed summaries are updated for all root firmware and all stored summaries are added to new root firmware
+        '''
+        stored_root_uids = {new_object.uid} if isinstance(new_object, Firmware) else set(old_object.get('root_firmware_uids', []))
+        new_root_uids = set(new_object.virtual_file_path) - stored_root_uids
+        summary_changes = [(new_object.uid, self._get_summaries(new_object, changed_plugins), stored_root_uids)]
+        if new_root_uids:
+            summary_changes.append((new_object.uid, self._get_stored_summaries(collection, new_object.uid), new_root_uids))
+        self._write_summary_updates(self._get_summary_updates(summary_changes))
 
-        collection.update_one({'_id': new_object.uid}, {'$set': update_dictionary})
+    @staticmethod
+    def _get_update_projection(new_object: FileObject) -> dict:
+        projection = {'_id': 1, 'root_firmware_uids': 1}
+        for plugin in new_object.processed_analysis:
+            for key in ['analysis_date', 'plugin_version']:
+                projection['processed_analysis.{}.{}'.format(plugin, key)] = 1
+        return projection
 
-    def _update_processed_analysis(self, new_object: FileObject, old_object: dict) -> dict:
-        old_pa = self.retrieve_analysis(old_object['processed_analysis'])
-        for key in new_object.processed_analysis.keys():
-            old_pa[key] = new_object.processed_analysis[key]
-        return self.sanitize_analysis(analysis_dict=old_pa, uid=new_object.uid)
+    @staticmethod
+    def _analysis_is_unchanged(new_result: dict, old_result: Optional[dict]) -> bool:
+        '''
+        results of the same analysis run (same analysis date and plugin version) do not have to be written again
+        '''
+        if not old_result or 'analysis_date' not in new_result:
+            return False
+        return all(old_result.get(key) == new_result.get(key) for key in ['analysis_date', 'plugin_version'])
 
     def add_firmware(self, firmware):
-        old_object = self.firmwares.find_one({'_id': firmware.uid})
+        old_object = self.firmwares.find_one({'_id': firmware.uid}, self._get_update_projection(firmware))
         if old_object:
             logging.debug('Update old firmware!')
             try:
@@ -71,6 +119,7 @@ class BackEndDbInterface(MongoInterfaceCommon):
             entry = self.build_firmware_dict(firmware)
             try:
                 self.firmwares.insert_one(entry)
+                self._write_summary_updates(self._get_summary_updates([(firmware.uid, self._get_summaries(firmware), firmware.virtual_file_path)]))
                 logging.debug('firmware added to db: {}'.format(firmware.uid))
             except Exception as e:
                 logging.error('Could not add firmware: {} - {}'.format(sys.exc_info()[0].__name__, e))
@@ -96,14 +145,15 @@ class BackEndDbInterface(MongoInterfaceCommon):
             'release_date': convert_str_to_time(firmware.release_date),
             'submission_date': time(),
             'analysis_tags': firmware.analysis_tags,
-            'tags': firmware.tags
+            'tags': firmware.tags,
+            'summaries_materialized': True
         }
         if hasattr(firmware, 'comments'):  # for backwards compatibility
             entry['comments'] = firmware.comments
         return entry
 
     def add_file_object(self, file_object):
-        old_object = self.file_objects.find_one({'_id': file_object.uid})
+        old_object = self.file_objects.find_one({'_id': file_object.uid}, self._get_update_projection(file_object))
         if old_object:
             logging.debug('Update old file_object!')
             try:
@@ -116,6 +166,7 @@ class BackEndDbInterface(MongoInterfaceCommon):
             entry = self.build_file_object_dict(file_object)
             try:
                 self.file_objects.insert_one(entry)
+                self._write_summary_updates(self._get_summary_updates([(file_object.uid, self._get_summaries(file_object), file_object.virtual_file_path)]))
                 logging.debug('file added to db: {}'.format(file_object.uid))
             except Exception as e:
                 logging.error('Could not update firmware: {} - {}'.format(sys.exc_info()[0].__name__, e))
@@ -135,7 +186,8 @@ class BackEndDbInterface(MongoInterfaceCommon):
             'files_included': list(file_object.files_included),
             'size': file_object.size,
             'analysis_tags': file_object.analysis_tags,
-            'parent_firmware_uids': list(file_object.parent_firmware_uids)
+            'parent_firmware_uids': list(file_object.parent_firmware_uids),
+            'root_firmware_uids': list(file_object.virtual_file_path)
         }
         for attribute in ['comments']:  # for backwards compatibility
             if hasattr(file_object, attribute):
@@ -171,27 +223,190 @@ class BackEndDbInterface(MongoInterfaceCommon):
         else:
             logging.warning('Propagating tag only allowed for firmware. Given: {}')
 
-    def add_analysis(self, file_object: FileObject):
-        if isinstance(file_object, (Firmware, FileObject)):
-            processed_analysis = self.sanitize_analysis(file_object.processed_analysis, file_object.uid)
-            for analysis_system in processed_analysis:
-                self._update_analysis(file_object, analysis_system, processed_analysis[analysis_system])
-        else:
-            raise RuntimeError('Trying to add from type \'{}\' to database. Only allowed for \'Firmware\' and \'FileObject\'')
-
-    def _update_analysis(self, file_object: FileObject, analysis_system: str, result: dict):
+    def add_analysis(self, file_object: FileObject, plugins: Optional[List[str]] = None):
+        '''
+        store the results and tags of plugins (default: all plugins in processed_analysis) with a single update
+        and update the materialized summaries of all root firmware of the object
+        '''
+        collection, update = self._get_analysis_update(file_object, plugins)
         try:
-            collection = self.firmwares if isinstance(file_object, Firmware) else self.file_objects
-
-            entry_with_tags = collection.find_one({'_id': file_object.uid}, {'analysis_tags': 1})
-
-            collection.update_one(
-                {'_id': file_object.uid},
-                {'$set': {
-                    'processed_analysis.{}'.format(analysis_system): result,
-                    'analysis_tags': update_analysis_tags(file_object, entry_with_tags)
-                }}
-            )
+            entry = collection.find_one_and_update({'_id': file_object.uid}, {'$set': update}, projection={'root_firmware_uids': 1})
         except Exception as exception:
             logging.error('Update of analysis failed badly ({})'.format(exception))
             raise exception
+        if entry is not None:
+            root_uids = set(file_object.virtual_file_path).union(entry.get('root_firmware_uids', []))
+            self._write_summary_updates(self._get_summary_updates([(file_object.uid, self._get_summaries(file_object, plugins), root_uids)]))
+
+    def buffer_analysis(self, file_object: FileObject, plugins: Optional[List[str]] = None):
+        '''
+        like add_analysis but the update is buffered until the next flush_analysis_buffer
+        (updates of the same object are merged, so later results overwrite earlier ones)
+        '''
+        collection, update = self._get_analysis_update(file_object, plugins)
+        self._analysis_buffer.setdefault((collection.name, file_object.uid), {}).update(update)
+        root_uids, summaries = self._summary_buffer.setdefault((collection.name, file_object.uid), (set(), {}))
+        root_uids.update(file_object.virtual_file_path)
+        summaries.update(self._get_summaries(file_object, plugins))
+
+    def flush_analysis_buffer(self, force: bool = False) -> bool:
+        '''
+        write the buffered analysis updates with one unordered bulk write per collection if the buffer is full
+        or the write interval has passed (or force is set)
+        returns True if the buffer was written
+        '''
+        if not self._analysis_buffer:
+            return False
+        if not force and len(self._analysis_buffer) < self.ANALYSIS_BUFFER_SIZE and time() - self._last_analysis_flush < self.analysis_write_interval:
+            return False
+        requests = {}
+        for (collection_name, uid), update in self._analysis_buffer.items():
+            requests.setdefault(collection_name, []).append(UpdateOne({'_id': uid}, {'$set': update}))
+        for collection_name, collection_requests in requests.items():
+            try:
+                self.main[collection_name].bulk_write(collection_requests, ordered=False)
+            except PyMongoError as error:
+                logging.error('Could not store buffered analysis results: {}'.format(error))
+        self._flush_summary_buffer()
+        self._analysis_buffer = {}
+        self._last_analysis_flush = time()
+        return True
+
+    def _flush_summary_buffer(self):
+        '''
+        the summary updates of all buffered objects are computed together and written with a single bulk write
+        '''
+        summary_changes = []
+        for collection_name in {collection_name for collection_name, _ in self._summary_buffer}:
+            uids = [uid for name, uid in self._summary_buffer if name == collection_name]
+            for entry in self.main[collection_name].find({'_id': {'$in': uids}}, {'root_firmware_uids': 1}):
+                root_uids, summaries = self._summary_buffer[(collection_name, entry['_id'])]
+                summary_changes.append((entry['_id'], summaries, root_uids.union(entry.get('root_firmware_uids', []))))
+        self._write_summary_updates(self._get_summary_updates(summary_changes))
+        self._summary_buffer = {}
+
+    @staticmethod
+    def _get_summaries(file_object: FileObject, plugins: Optional[List[str]] = None) -> Dict[str, list]:
+        if plugins is None:
+            plugins = list(file_object.processed_analysis)
+        return {
+            plugin: list(file_object.processed_analysis[plugin].get('summary') or [])
+            for plugin in plugins if plugin in file_object.processed_analysis
+        }
+
+    @staticmethod
+    def _get_stored_summaries(collection: Collection, uid: str) -> Dict[str, list]:
+        query_result = collection.aggregate([
+            {'$match': {'_id': uid}},
+            {'$project': {'analysis': {'$objectToArray': '$processed_analysis'}}},
+            {'$unwind': '$analysis'},
+            {'$project': {'plugin': '$analysis.k', 'summary': '$analysis.v.summary'}},
+        ])
+        return {entry['plugin']: entry['summary'] if isinstance(entry.get('summary'), list) else [] for entry in query_result}
+
+    def _get_summary_updates(self, summary_changes: List[Tuple[str, Dict[str, list], Iterable[str]]]) -> list:
+        '''
+        the materialized summary of a firmware consists of one entry per (root uid, plugin, summary item) with the uids
+        of all included files (and the firmware itself) whose summary contains the item. For each changed object
+        (uid, plugin -> summary, root uids) the uid is added to all its existing entries with a single update (files shared
+        by many firmware have many entries) and only missing entries are upserted. The existence of the entries of all
+        changed objects is checked with a single query
+        '''
+        summary_updates, entries_of_objects = [], {}
+        for uid, summaries, root_uids in summary_changes:
+            root_uids = list(root_uids)
+            if not root_uids:
+                continue
+            entries = entries_of_objects.setdefault(uid, {})
+            for plugin, summary in summaries.items():
+                summary_updates.append(UpdateMany(
+                    {'root_uid': {'$in': root_uids}, 'plugin': plugin, 'uids': uid, 'item': {'$nin': summary}},
+                    {'$pull': {'uids': uid}}
+                ))
+                entries.update({
+                    _get_summary_entry_id(root_uid, plugin, item): {'root_uid': root_uid, 'plugin': plugin, 'item': item}
+                    for root_uid in root_uids for item in summary
+                })
+        entry_ids = [entry_id for entries in entries_of_objects.values() for entry_id in entries]
+        existing_entries = {entry['_id'] for entry in self.firmware_summaries.find({'_id': {'$in': entry_ids}}, {'_id': 1})} if entry_ids else set()
+        for uid, entries in entries_of_objects.items():
+            existing_entries_of_object = [entry_id for entry_id in entries if entry_id in existing_entries]
+            if existing_entries_of_object:
+                summary_updates.append(UpdateMany({'_id': {'$in': existing_entries_of_object}, 'uids': {'$ne': uid}}, {'$addToSet': {'uids': uid}}))
+            summary_updates.extend(
+                UpdateOne({'_id': entry_id}, {'$setOnInsert': fields, '$addToSet': {'uids': uid}}, upsert=True)
+                for entry_id, fields in entries.items() if entry_id not in existing_entries
+            )
+        return summary_updates
+
+    def _write_summary_updates(self, summary_updates: list):
+        '''
+        the updates are independent of each other, so a failed update does not abort the others. Concurrent upserts of the
+        same entry fail with a duplicate key error on all but one writer: they are retried once (the entry exists then)
+        '''
+        if not summary_updates:
+            return
+        try:
+            self.firmware_summaries.bulk_write(summary_updates, ordered=False)
+        except BulkWriteError as error:
+            failed_updates = [summary_updates[write_error['index']] for write_error in error.details['writeErrors'] if write_error['code'] == DUPLICATE_KEY_ERROR]
+            if len(failed_updates) < len(error.details['writeErrors']):
+                logging.error('Could not update firmware summaries: {}'.format(error.details['writeErrors']))
+            if failed_updates:
+                self._retry_summary_updates(failed_updates)
+        except PyMongoError as error:
+            logging.error('Could not update firmware summaries: {}'.format(error))
+
+    def _retry_summary_updates(self, summary_updates: list):
+        try:
+            self.firmware_summaries.bulk_write(summary_updates, ordered=False)
+        except PyMongoError as error:
+            logging.error('Could not update firmware summaries: {}'.format(error))
+
+    def _get_analysis_update(self, file_object: FileObject, plugins: Optional[List[str]]) -> Tuple[Collection, dict]:
+        if not isinstance(file_object, (Firmware, FileObject)):
+            raise RuntimeError('Trying to add from type \'{}\' to database. Only allowed for \'Firmware\' and \'FileObject\''.format(type(file_object)))
+        if plugins is None:
+            plugins = list(file_object.processed_analysis)
+        results = {plugin: file_object.processed_analysis[plugin] for plugin in plugins if plugin in file_object.processed_analysis}
+        update = {
+            'processed_analysis.{}'.format(plugin): result
+            for plugin, result in self.sanitize_analysis(results, file_object.uid).items()
+        }
+        update.update({
+            'analysis_tags.{}'.format(plugin): file_object.analysis_tags[plugin]
+            for plugin in plugins if plugin in file_object.analysis_tags
+        })
+        collection = self.firmwares if isinstance(file_object, Firmware) else self.file_objects
+        return collection, update
+
+    def inline_sanitized_analysis_metadata(self) -> int:
+        '''
+        rewrite sanitized analysis entries of older versions so that small metadata fields are stored inline
+        returns the number of updated DB entries
+        '''
+        updated_entries = 0
+        for collection in [self.firmwares, self.file_objects]:
+            for entry in collection.find({}, {'processed_analysis': 1}):
+                update_dictionary, sanitized_files = self._get_inline_metadata_update(entry['processed_analysis'])
+                if update_dictionary:
+                    collection.update_one({'_id': entry['_id']}, {'$set': update_dictionary})
+                    self._delete_sanitized_files(sanitized_files)
+                    updated_entries += 1
+        return updated_entries
+
+    def _get_inline_metadata_update(self, processed_analysis: dict) -> Tuple[dict, List[str]]:
+        update_dictionary, sanitized_files = {}, []
+        for plugin, analysis in processed_analysis.items():
+            if not analysis.get('file_system_flag', False):
+                continue
+            for analysis_key in INLINE_ANALYSIS_KEYS:
+                if analysis_key in analysis and self._is_sanitized_file_name(plugin, analysis_key, analysis[analysis_key]):
+                    update_dictionary['processed_analysis.{}.{}'.format(plugin, analysis_key)] = self._load_sanitized_file(analysis[analysis_key], analysis_key)
+                    sanitized_files.append(analysis[analysis_key])
+        return update_dictionary, sanitized_files
+
+    def _delete_sanitized_files(self, file_names: List[str]):
+        for file_name in file_names:
+            for grid_out in self.sanitize_fs.find({'filename': file_name}):
+                self.sanitize_fs.delete(grid_out._id)
@@ -1,17 +1,23 @@
 import json
 import logging
-import pickle
-from typing import Set
+from hashlib import sha256
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import gridfs
 from common_helper_files import get_safe_name
 from common_helper_mongo.aggregate import get_all_value_combinations_of_fields, get_list_of_all_values
 
-from helperFunctions.dataConversion import convert_time_to_str, get_dict_size
+from helperFunctions.dataConversion import convert_time_to_str, exceeds_size_limit
 from objects.file import FileObject
 from objects.firmware import Firmware
+from storage.analysis_serializer import deserialize, get_serializer, serialize
+from storage.lazy_analysis import LazyAnalysisResult
 from storage.mongo_interface import MongoInterface
 
+# small metadata fields of analysis results that are never extracted to the sanitize file system
+INLINE_ANALYSIS_KEYS = ['analysis_date', 'plugin_version', 'summary', 'system_version', 'tags']
+SANITIZED_BLOB_PREFIX = 'blob_'
+
 
 class MongoInterfaceCommon(MongoInterface):  # pylint: disable=too-many-instance-attributes
 
@@ -21,12 +27,15 @@ class MongoInterfaceCommon(MongoInterface):  # pylint: disable=too-many-instance
         self.firmwares = self.main.firmwares
         self.file_objects = self.main.file_objects
         self.search_query_cache = self.main.search_query_cache
+        self.analysis_result_cache = self.main.analysis_result_cache
+        self.firmware_summaries = self.main.firmware_summaries
         self.locks = self.main.locks
         # sanitize stuff
         self.report_threshold = int(self.config['data_storage']['report_threshold'])
         sanitize_db = self.config['data_storage'].get('sanitize_database', 'faf_sanitize')
         self.sanitize_storage = self.client[sanitize_db]
         self.sanitize_fs = gridfs.GridFS(self.sanitize_storage)
+        self.analysis_serializer = get_serializer(self.config['data_storage'].get('analysis_serializer', 'msgpack_zstd'))
 
     def existence_quick_check(self, uid):
         if self.is_firmware(uid):
@@ -105,7 +114,7 @@ class MongoInterfaceCommon(MongoInterface):  # pylint: disable=too-many-instance
         firmware.set_release_date(convert_time_to_str(entry['release_date']))
         firmware.set_vendor(entry['vendor'])
         firmware.set_firmware_version(entry['version'])
-        firmware.processed_analysis = self.retrieve_analysis(entry['processed_analysis'], analysis_filter=analysis_filter)
+        firmware.processed_analysis = self._get_lazy_analysis(entry['processed_analysis'], analysis_filter=analysis_filter)
         firmware.files_included = set(entry['files_included'])
         firmware.virtual_file_path = entry['virtual_file_path']
         firmware.tags = entry['tags'] if 'tags' in entry else dict()
@@ -127,7 +136,7 @@ class MongoInterfaceCommon(MongoInterface):  # pylint: disable=too-many-instance
         file_object.set_name(entry['file_name'])
         file_object.virtual_file_path = entry['virtual_file_path']
         file_object.parents = entry['parents']
-        file_object.processed_analysis = self.retrieve_analysis(entry['processed_analysis'], analysis_filter=analysis_filter)
+        file_object.processed_analysis = self._get_lazy_analysis(entry['processed_analysis'], analysis_filter=analysis_filter)
         file_object.files_included = set(entry['files_included'])
         file_object.parent_firmware_uids = set(entry['parent_firmware_uids'])
         file_object.analysis_tags = entry['analysis_tags'] if 'analysis_tags' in entry else dict()
@@ -140,8 +149,8 @@ class MongoInterfaceCommon(MongoInterface):  # pylint: disable=too-many-instance
     def sanitize_analysis(self, analysis_dict, uid):
         sanitized_dict = {}
         for key in analysis_dict.keys():
-            if get_dict_size(analysis_dict[key]) > self.report_threshold:
-                logging.debug('Extracting analysis {} to file (Size: {})'.format(key, get_dict_size(analysis_dict[key])))
+            if exceeds_size_limit(analysis_dict[key], self.report_threshold):
+                logging.debug('Extracting analysis {} to file'.format(key))
                 sanitized_dict[key] = self._extract_binaries(analysis_dict, key, uid)
                 sanitized_dict[key]['file_system_flag'] = True
             else:
@@ -173,33 +182,115 @@ class MongoInterfaceCommon(MongoInterface):  # pylint: disable=too-many-instance
                 logging.debug('Could not retrieve information: {} {}'.format(type(err), err))
         return sanitized_dict
 
+    def _get_lazy_analysis(self, sanitized_dict, analysis_filter=None):
+        '''
+        like retrieve_analysis, but sanitized fields are only loaded when they are accessed
+        (all analysis results of an object share the loaded files)
+        '''
+        loaded_files = {}
+
+        def load_file(file_name):
+            if file_name not in loaded_files:
+                loaded_files[file_name] = self._read_sanitized_file(file_name)
+            return loaded_files[file_name]
+
+        for key in (sanitized_dict.keys() if analysis_filter is None else analysis_filter):
+            if key not in sanitized_dict:
+                continue
+            analysis = sanitized_dict[key]
+            if analysis.pop('file_system_flag', False):
+                sanitized_keys = [analysis_key for analysis_key, value in analysis.items() if self._is_sanitized_file_name(key, analysis_key, value)]
+                sanitized_dict[key] = LazyAnalysisResult(analysis, sanitized_keys, load_file)
+        return sanitized_dict
+
     def _extract_binaries(self, analysis_dict, key, uid):
-        tmp_dict = {}
+        '''
+        all fields except the inline metadata are stored in a single (chunked) file of the sanitize file storage
+        and reference its file name in the DB entry
+        '''
+        tmp_dict, extracted_dict = {}, {}
+        file_name = self._get_sanitized_file_name(key, uid)
         for analysis_key in analysis_dict[key].keys():
-            if analysis_key != 'summary':
-                file_name = '{}_{}_{}'.format(get_safe_name(key), get_safe_name(analysis_key), uid)
-                self.sanitize_fs.put(pickle.dumps(analysis_dict[key][analysis_key]), filename=file_name)
+            if analysis_key not in INLINE_ANALYSIS_KEYS:
+                extracted_dict[analysis_key] = analysis_dict[key][analysis_key]
                 tmp_dict[analysis_key] = file_name
             else:
                 tmp_dict[analysis_key] = analysis_dict[key][analysis_key]
+        if extracted_dict:
+            data, serializer = serialize(extracted_dict, self.analysis_serializer)
+            self.sanitize_fs.put(data, filename=file_name, metadata={'serializer': serializer, 'sha256': sha256(data).hexdigest()})
         return tmp_dict
 
+    @staticmethod
+    def _get_sanitized_file_name(key, uid):
+        return '{}_{}'.format(get_safe_name(key), uid)
+
+    @staticmethod
+    def _get_blob_file_name(content_hash):
+        '''
+        content of deduplicated sanitized files (which only reference it in their metadata)
+        '''
+        return '{}{}'.format(SANITIZED_BLOB_PREFIX, content_hash)
+
+    @staticmethod
+    def _is_sanitized_file_name(key, analysis_key, value):
+        '''
+        inline metadata fields of older entries may still reference sanitized files
+        '''
+        if not isinstance(value, str):
+            return False
+        if analysis_key not in INLINE_ANALYSIS_KEYS:
+            return True
+        return value.startswith('{}_{}_'.format(get_safe_name(key), get_safe_name(analysis_key)))
+
+    def _get_sanitized_file_names(self, processed_analysis: dict) -> Set[str]:
+        return {
+            value
+            for plugin, analysis in processed_analysis.items() if analysis.get('file_system_flag', False)
+            for analysis_key, value in analysis.items() if self._is_sanitized_file_name(plugin, analysis_key, value)
+        }
+
     def _retrieve_binaries(self, sanitized_dict, key):
-        tmp_dict = {}
+        tmp_dict, loaded_files = {}, {}
         for analysis_key in sanitized_dict[key].keys():
-            if analysis_key == 'summary' and not isinstance(sanitized_dict[key][analysis_key], str):
-                tmp_dict[analysis_key] = sanitized_dict[key][analysis_key]
+            file_name = sanitized_dict[key][analysis_key]
+            if not self._is_sanitized_file_name(key, analysis_key, file_name):
+                tmp_dict[analysis_key] = file_name
             else:
                 logging.debug('Retrieving {}'.format(analysis_key))
-                tmp = self.sanitize_fs.get_last_version(sanitized_dict[key][analysis_key])
-                if tmp is not None:
-                    report = pickle.loads(tmp.read())
-                else:
-                    logging.error('sanitized file not found: {}'.format(sanitized_dict[key][analysis_key]))
-                    report = {}
-                tmp_dict[analysis_key] = report
+                if file_name not in loaded_files:
+                    loaded_files[file_name] = self._read_sanitized_file(file_name)
+                content, contains_all_fields = loaded_files[file_name]
+                tmp_dict[analysis_key] = content.get(analysis_key, {}) if contains_all_fields else content
         return tmp_dict
 
+    def _load_sanitized_file(self, file_name, analysis_key=None):
+        content, contains_all_fields = self._read_sanitized_file(file_name)
+        return content.get(analysis_key, {}) if contains_all_fields else content
+
+    def _read_sanitized_file(self, file_name) -> Tuple[Any, bool]:
+        '''
+        returns the content of a sanitized file and if it contains all extracted fields of the analysis result
+        (files of the legacy format contain a single pickled field)
+        '''
+        tmp = self._get_last_sanitized_version(file_name)
+        if tmp is not None:
+            metadata = tmp.metadata or {}
+            if 'blob' in metadata:
+                tmp = self._get_last_sanitized_version(self._get_blob_file_name(metadata['blob']))
+            if tmp is not None:
+                return deserialize(tmp.read(), metadata.get('serializer')), 'serializer' in metadata
+            logging.error('blob of sanitized file not found: {} ({})'.format(file_name, metadata['blob']))
+        else:
+            logging.error('sanitized file not found: {}'.format(file_name))
+        return {}, False
+
+    def _get_last_sanitized_version(self, file_name) -> Optional[gridfs.GridOut]:
+        try:
+            return self.sanitize_fs.get_last_version(file_name)
+        except gridfs.NoFile:
+            return None
+
     def get_specific_fields_of_db_entry(self, uid, field_dict):
         return self.file_objects.find_one(uid, field_dict) or self.firmwares.find_one(uid, field_dict)
 
@@ -208,25 +299,56 @@ class MongoInterfaceCommon(MongoInterface):  # pylint: disable=too-many-instance
     def get_list_of_all_included_files(self, fo):
         if isinstance(fo, Firmware):
             fo.list_of_all_included_files = get_list_of_all_values(
-                self.file_objects, '$_id', match={'virtual_file_path.{}'.format(fo.uid): {'$exists': 'true'}})
+                self.file_objects, '$_id', match={'root_firmware_uids': fo.uid})
         if fo.list_of_all_included_files is None:
             fo.list_of_all_included_files = list(self.get_set_of_all_included_files(fo))
         fo.list_of_all_included_files.sort()
         return fo.list_of_all_included_files
 
-    def get_set_of_all_included_files(self, fo):
+    def get_set_of_all_included_files(self, fo) -> Set[str]:
         '''
         return a set of all included files uids
         the set includes fo uid as well
+        (the tree is traversed breadth-first with one query per level that only fetches the included files)
         '''
-        if fo is not None:
-            files = set()
-            files.add(fo.uid)
-            included_files = self.get_objects_by_uid_list(fo.files_included, analysis_filter=[])
-            for item in included_files:
-                files.update(self.get_set_of_all_included_files(item))
-            return files
-        return set()
+        if fo is None:
+            return set()
+        files = {fo.uid}
+        current_level = set(fo.files_included) - files
+        while current_level:
+            next_level = set()
+            for entry in self._get_included_files_of_level(current_level):
+                files.add(entry['_id'])
+                next_level.update(entry['files_included'])
+            current_level = next_level - files
+        return files
+
+    def _get_included_files_of_level(self, uids: Set[str]) -> Iterable[dict]:
+        found_uids = set()
+        for entry in self.file_objects.find({'_id': {'$in': list(uids)}}, {'files_included': 1}):
+            found_uids.add(entry['_id'])
+            yield entry
+        if found_uids != uids:  # firmware images can be included in other firmware images
+            yield from self.firmwares.find({'_id': {'$in': list(uids - found_uids)}}, {'files_included': 1})
+
+    def get_set_of_all_included_files_by_graph_lookup(self, fo) -> Set[str]:
+        '''
+        variant of get_set_of_all_included_files that traverses the tree on the database server in a single query
+        (only file objects are traversed and $graphLookup is limited to 100 MB of memory, so it suits moderately sized trees)
+        '''
+        if fo is None:
+            return set()
+        collection = self.firmwares if isinstance(fo, Firmware) else self.file_objects
+        query_result = collection.aggregate([
+            {'$match': {'_id': fo.uid}},
+            {'$graphLookup': {
+                'from': self.file_objects.name, 'startWith': '$files_included', 'connectFromField': 'files_included',
+                'connectToField': '_id', 'as': 'included_files'
+            }},
+            {'$unwind': '$included_files'},
+            {'$project': {'_id': '$included_files._id'}},
+        ])
+        return {fo.uid}.union(entry['_id'] for entry in query_result)
 
     def get_uids_of_all_included_files(self, uid: str) -> Set[str]:
         return {
@@ -242,13 +364,28 @@ class MongoInterfaceCommon(MongoInterface):  # pylint: disable=too-many-instance
             return None
         if not isinstance(fo, Firmware):
             return self._collect_summary(fo.list_of_all_included_files, selected_analysis)
+        if self._summaries_are_materialized(fo.uid):
+            return self.get_materialized_summary(fo.uid, selected_analysis)
         summary = get_all_value_combinations_of_fields(
             self.file_objects, '$processed_analysis.{}.summary'.format(selected_analysis), '$_id',
-            unwind=True, match={'virtual_file_path.{}'.format(fo.uid): {'$exists': 'true'}})
+            unwind=True, match={'root_firmware_uids': fo.uid})
         fo_summary = self._get_summary_of_one(fo, selected_analysis)
         self._update_summary(summary, fo_summary)
         return summary
 
+    def _summaries_are_materialized(self, firmware_uid: str) -> bool:
+        '''
+        firmware stored by older versions have no materialized summaries
+        '''
+        return self.firmwares.count_documents({'_id': firmware_uid, 'summaries_materialized': True}) > 0
+
+    def get_materialized_summary(self, root_uid: str, selected_analysis: str) -> Dict[str, List[str]]:
+        return {
+            entry['item']: entry['uids']
+            for entry in self.firmware_summaries.find({'root_uid': root_uid, 'plugin': selected_analysis}, {'item': 1, 'uids': 1})
+            if entry['uids']
+        }
+
     @staticmethod
     def _get_summary_of_one(file_object, selected_analysis):
         summary = {}
@@ -262,9 +399,11 @@ class MongoInterfaceCommon(MongoInterface):  # pylint: disable=too-many-instance
 
     def _collect_summary(self, uid_list, selected_analysis):
         summary = {}
-        file_objects = self.get_objects_by_uid_list(uid_list, analysis_filter=[selected_analysis])
-        for fo in file_objects:
-            summary = self._update_summary(summary, self._get_summary_of_one(fo, selected_analysis))
+        summary_field = 'processed_analysis.{}.summary'.format(selected_analysis)
+        for collection in [self.file_objects, self.firmwares]:
+            for entry in collection.find({'_id': {'$in': list(uid_list)}, summary_field: {'$exists': True}}, {summary_field: 1}):
+                for item in entry['processed_analysis'][selected_analysis]['summary'] or []:
+                    summary.setdefault(item, []).append(entry['_id'])
         return summary
 
     @staticmethod
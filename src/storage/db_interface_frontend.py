@@ -2,8 +2,9 @@ import json
 import logging
 import sys
 from copy import deepcopy
+from functools import partial
+from typing import List, Optional, Tuple
 
-from helperFunctions.compare_sets import remove_duplicates_from_list
 from helperFunctions.database_structure import visualize_complete_tree
 from helperFunctions.dataConversion import get_value_of_first_key
 from helperFunctions.file_tree import FileTreeNode, VirtualPathFileTree
@@ -14,6 +15,23 @@ from objects.firmware import Firmware
 from storage.db_interface_common import MongoInterfaceCommon
 
 
+def _get_keyset_query(sort_field, last_value, last_uid):
+    '''
+    entries after (last_value, last_uid) in the order of (sort_field, _id) (missing values are sorted first)
+    '''
+    if last_value is None:
+        return {'$or': [{sort_field: None, '_id': {'$gt': last_uid}}, {sort_field: {'$ne': None}}]}
+    return {'$or': [{sort_field: {'$gt': last_value}}, {sort_field: last_value, '_id': {'$gt': last_uid}}]}
+
+
+def _get_sort_key(entry, sort_field):
+    '''
+    the order of $sort {sort_field: 1, _id: 1} for missing and string values (UTF-8 byte order is code point order)
+    '''
+    value = entry.get(sort_field)
+    return value is not None, value or '', entry['_id']
+
+
 class FrontEndDbInterface(MongoInterfaceCommon):
 
     READ_ONLY = True
@@ -131,34 +149,128 @@ class FrontEndDbInterface(MongoInterfaceCommon):
 
     def generic_search(self, search_dict, skip=0, limit=0, only_fo_parent_firmware=False, inverted=False):
         try:
-            if isinstance(search_dict, str):
-                search_dict = json.loads(search_dict)
-
-            if not (inverted and only_fo_parent_firmware):
-                query = self.firmwares.find(search_dict, {'_id': 1}, skip=skip, limit=limit, sort=[('vendor', 1)])
-                result = [match['_id'] for match in query]
-            else:
-                result = []
-
-            if len(result) < limit or limit == 0:
-                max_firmware_results = self.get_firmware_number(query=search_dict)
-                skip = skip - max_firmware_results if skip > max_firmware_results else 0
-                limit = limit - len(result) if limit > 0 else 0
-                if not only_fo_parent_firmware:
-                    query = self.file_objects.find(search_dict, {'_id': 1}, skip=skip, limit=limit, sort=[('file_name', 1)])
-                    result.extend([match['_id'] for match in query])
-                else:  # only searching for parents of matching file objects
-                    parent_uids = self.file_objects.distinct('parent_firmware_uids', search_dict)
-                    query_filter = {'$nor': [{'_id': {('$in' if inverted else '$nin'): parent_uids}}, search_dict]}
-                    query = self.firmwares.find(query_filter, {'_id': 1}, skip=skip, limit=limit, sort=[('file_name', 1)])
-                    parents = [match['_id'] for match in query]
-                    result = remove_duplicates_from_list(result + parents)
-
+            return self.search_page(search_dict, skip=skip, limit=limit, only_fo_parent_firmware=only_fo_parent_firmware, inverted=inverted)[0]
         except Exception as exception:
             error_message = 'could not process search request: {} {}'.format(sys.exc_info()[0].__name__, exception)
             logging.warning(error_message)
             return error_message
-        return result
+
+    def search_page(self, search_dict, skip=0, limit=0, only_fo_parent_firmware=False, inverted=False, after=None) -> Tuple[List[str], int, Optional[list]]:
+        '''
+        returns one page of matching uids, the total number of matches and the cursor of the last match of the page
+        matching firmware (sorted by vendor) come before matching file objects (sorted by file name) or the parent firmware
+        of matching file objects (only_fo_parent_firmware). The empty query only matches firmware. The page and the count
+        of a collection are computed by a single aggregation (MongoDB 3.6 has no $unionWith to combine the collections)
+        :param after: cursor of the previous page (keyset pagination), skip is ignored if it is set
+        '''
+        if isinstance(search_dict, str):
+            search_dict = json.loads(search_dict)
+        phases = [] if only_fo_parent_firmware and inverted else [self._get_phase('firmwares', self.firmwares, [{'$match': search_dict}], 'vendor')]
+        if search_dict != {}:  # the empty query lists only the firmware (which all match directly)
+            if not only_fo_parent_firmware:
+                phases.append(self._get_phase('file_objects', self.file_objects, [{'$match': search_dict}], 'file_name'))
+            elif inverted:
+                phases.append(('parents', 'file_name', partial(self._get_page_of_non_parents, search_dict), partial(self._get_number_of_non_parents, search_dict)))
+            else:
+                phases.append(self._get_phase('parents', self.file_objects, self._get_parent_firmware_pipeline(search_dict), 'file_name'))
+        return self._get_page_of_phases(phases, skip, limit, after)
+
+    def _get_phase(self, name, collection, pipeline, sort_field):
+        '''
+        a phase consists of its name, the sort field and the functions returning a page (and the count) and only the count
+        '''
+        return name, sort_field, partial(self._get_page_and_count, collection, pipeline, sort_field), partial(self._get_count, collection, pipeline)
+
+    @staticmethod
+    def _get_page_of_phases(phases, skip, limit, after) -> Tuple[List[str], int, Optional[list]]:
+        phase_names = [name for name, *_ in phases]
+        after_phase_index = phase_names.index(after[0]) if after and after[0] in phase_names else None
+        result, total, cursor = [], 0, None
+        for index, (name, sort_field, get_page_and_count, get_count) in enumerate(phases):
+            page_is_full = 0 < limit <= len(result)
+            if page_is_full or (after_phase_index is not None and index < after_phase_index):
+                total += get_count()
+                continue
+            keyset = after[1:] if after_phase_index == index else None
+            page, count = get_page_and_count(0 if after_phase_index is not None else skip, limit - len(result) if limit else 0, keyset)
+            skip = max(skip - count, 0)
+            total += count
+            result.extend(match['_id'] for match in page)
+            if page:
+                cursor = [name, page[-1].get(sort_field), page[-1]['_id']]
+        return result, total, cursor
+
+    @staticmethod
+    def _get_count(collection, pipeline) -> int:
+        query_result = list(collection.aggregate(pipeline + [{'$count': 'count'}], allowDiskUse=True))
+        return query_result[0]['count'] if query_result else 0
+
+    def _get_page_and_count(self, collection, pipeline, sort_field, skip, limit, keyset=None) -> Tuple[List[dict], int]:
+        '''
+        without limit the matches are returned by a cursor as the whole result would not fit into one $facet document
+        '''
+        page_pipeline = self._get_sorted_pipeline(sort_field, keyset)
+        if skip:
+            page_pipeline.append({'$skip': skip})
+        if not limit:
+            page = list(collection.aggregate(pipeline + [{'$project': {sort_field: 1}}] + page_pipeline, allowDiskUse=True))
+            return page, self._get_count(collection, pipeline)
+        page_pipeline.append({'$limit': limit})
+        query_result = next(collection.aggregate(pipeline + [
+            {'$project': {sort_field: 1}},
+            {'$facet': {'page': page_pipeline, 'total': [{'$count': 'count'}]}},
+        ], allowDiskUse=True))
+        return query_result['page'], query_result['total'][0]['count'] if query_result['total'] else 0
+
+    @staticmethod
+    def _get_sorted_pipeline(sort_field, keyset=None) -> List[dict]:
+        pipeline = []
+        if keyset:
+            pipeline.append({'$match': _get_keyset_query(sort_field, *keyset)})
+        pipeline.append({'$sort': {sort_field: 1, '_id': 1}})
+        return pipeline
+
+    @staticmethod
+    def _get_parent_firmware_pipeline(search_dict) -> List[dict]:
+        '''
+        pipeline on the file objects returning the firmware that do not match themselves but are the parent of a matching
+        file object. The membership is checked on the server so no uid list is sent back and forth
+        '''
+        return [
+            {'$match': search_dict},
+            {'$project': {'parent_firmware_uids': 1}},
+            {'$unwind': '$parent_firmware_uids'},
+            {'$group': {'_id': '$parent_firmware_uids'}},
+            {'$lookup': {'from': 'firmwares', 'localField': '_id', 'foreignField': '_id', 'as': 'firmware'}},
+            {'$unwind': '$firmware'},
+            {'$replaceRoot': {'newRoot': '$firmware'}},
+            {'$match': {'$nor': [search_dict]}},
+        ]
+
+    def _get_page_of_non_parents(self, search_dict, skip, limit, keyset=None) -> Tuple[List[dict], int]:
+        '''
+        firmware that neither match nor are the parent of a matching file object: the parents are computed once and
+        removed from the non-matching firmware by merging both (equally sorted) cursors
+        '''
+        pipeline = [{'$project': {'file_name': 1}}] + self._get_sorted_pipeline('file_name', keyset)
+        candidates = self.firmwares.aggregate([{'$match': {'$nor': [search_dict]}}] + pipeline, allowDiskUse=True)
+        parents = self.file_objects.aggregate(self._get_parent_firmware_pipeline(search_dict) + pipeline, allowDiskUse=True)
+        page, parent = [], next(parents, None)
+        for candidate in candidates:
+            while parent is not None and _get_sort_key(parent, 'file_name') < _get_sort_key(candidate, 'file_name'):
+                parent = next(parents, None)
+            if parent is not None and parent['_id'] == candidate['_id']:
+                continue
+            if skip:
+                skip -= 1
+                continue
+            page.append(candidate)
+            if len(page) == limit:
+                break
+        return page, self._get_number_of_non_parents(search_dict)
+
+    def _get_number_of_non_parents(self, search_dict) -> int:
+        return self._get_count(self.firmwares, [{'$match': {'$nor': [search_dict]}}]) - self._get_count(self.file_objects, self._get_parent_firmware_pipeline(search_dict))
 
     def get_other_versions_of_firmware(self, firmware_object: Firmware):
         if not isinstance(firmware_object, Firmware):
@@ -219,20 +331,7 @@ class FrontEndDbInterface(MongoInterfaceCommon):
             yield FileTreeNode(uid, root_uid, not_analyzed=True, name='{uid} (not analyzed yet)'.format(uid=uid))
 
     def get_number_of_total_matches(self, query, only_parent_firmwares, inverted):
-        if not only_parent_firmwares:
-            return self.get_firmware_number(query=query) + self.get_file_object_number(query=query)
-        if isinstance(query, str):
-            query = json.loads(query)
-        direct_matches = {match['_id'] for match in self.firmwares.find(query, {'_id': 1})} if not inverted else set()
-        if query == {}:
-            return len(direct_matches)
-        parent_matches = {
-            parent for match in self.file_objects.find(query, {'parent_firmware_uids': 1})
-            for parent in match['parent_firmware_uids']
-        }
-        if inverted:
-            parent_matches = {match['_id'] for match in self.firmwares.find({'_id': {'$nin': list(parent_matches)}}, {'_id': 1})}
-        return len(direct_matches.union(parent_matches))
+        return self.search_page(query, limit=1, only_fo_parent_firmware=only_parent_firmwares, inverted=inverted)[1]
 
     def create_analysis_structure(self):
         if self.client.varietyResults.file_objectsKeys.count_documents({}) == 0:
@@ -284,7 +383,7 @@ class FrontEndDbInterface(MongoInterfaceCommon):
         for result in query_result:
             firmware_uid, analysis_list = result['_id'], result['analyses']
             query = {"$and": [
-                {"virtual_file_path.{}".format(firmware_uid): {"$exists": True}},
+                {'root_firmware_uids': firmware_uid},
                 {"$or": [{"processed_analysis.{}".format(plugin): {"$exists": False}} for plugin in analysis_list]}
             ]}
             for entry in self.file_objects.find(query, {'_id': 1}):
@@ -0,0 +1,79 @@
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+
+from storage.db_interface_common import MongoInterfaceCommon
+
+# plugins whose summaries are queried by the statistics and the summary recreation (MongoDB 3.6 has no wildcard indexes)
+SUMMARY_INDEX_PLUGINS = ['cpu_architecture', 'crypto_material', 'exploit_mitigations', 'known_vulnerabilities', 'unpacker']
+
+
+def _index(field: str, direction=ASCENDING, sparse=False) -> IndexModel:
+    return IndexModel([(field, direction)], sparse=sparse, background=True)
+
+
+def _get_summary_indexes() -> List[IndexModel]:
+    return [_index('processed_analysis.{}.summary'.format(plugin), sparse=True) for plugin in SUMMARY_INDEX_PLUGINS]
+
+
+# collection -> indexes for the hot queries
+INDEXES = {
+    'file_objects': [
+        _index('root_firmware_uids'),
+        _index('parent_firmware_uids'),
+        _index('processed_analysis.file_hashes.tlsh', sparse=True),
+    ] + _get_summary_indexes(),
+    'firmwares': [
+        _index('submission_date', direction=DESCENDING),
+        _index('processed_analysis.file_hashes.tlsh', sparse=True),
+    ] + _get_summary_indexes(),
+    'firmware_summaries': [
+        IndexModel([('root_uid', ASCENDING), ('plugin', ASCENDING)], background=True),
+    ],
+}
+
+
+class IndexProvisioner(MongoInterfaceCommon):
+    '''
+    Creates the indexes of the main database and adds root_firmware_uids (the root uids of the virtual file paths) to
+    file objects stored before the field existed. The migration runs in init_database.py and not on every start of
+    the database, as it has to scan all file objects of a database stored by an older version
+    '''
+
+    READ_ONLY = False
+    BATCH_SIZE = 1000
+
+    def get_missing_indexes(self) -> Dict[str, List[str]]:
+        missing_indexes = {}
+        for collection_name, indexes in INDEXES.items():
+            existing_indexes = self.main[collection_name].index_information()
+            missing = [index.document['name'] for index in indexes if index.document['name'] not in existing_indexes]
+            if missing:
+                missing_indexes[collection_name] = missing
+        return missing_indexes
+
+    def create_missing_indexes(self) -> int:
+        missing_indexes = self.get_missing_indexes()
+        created = 0
+        for collection_name, index_names in missing_indexes.items():
+            indexes = [index for index in INDEXES[collection_name] if index.document['name'] in index_names]
+            self.main[collection_name].create_indexes(indexes)
+            logging.info('Created indexes on {}: {}'.format(collection_name, ', '.join(index_names)))
+            created += len(indexes)
+        return created
+
+    def add_missing_root_firmware_uids(self) -> int:
+        '''
+        only file objects without the field are updated, so the migration can be run repeatedly
+        '''
+        updates = []
+        updated = 0
+        for entry in self.file_objects.find({'root_firmware_uids': {'$exists': False}}, {'virtual_file_path': 1}):
+            updates.append(UpdateOne({'_id': entry['_id']}, {'$set': {'root_firmware_uids': list(entry.get('virtual_file_path', {}))}}))
+            if len(updates) == self.BATCH_SIZE:
+                updated += self.file_objects.bulk_write(updates, ordered=False).modified_count
+                updates = []
+        if updates:
+            updated += self.file_objects.bulk_write(updates, ordered=False).modified_count
+        return updated
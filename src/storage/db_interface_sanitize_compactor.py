@@ -0,0 +1,169 @@
+import logging
+import re
+from datetime import datetime, timedelta
+from hashlib import sha256
+from time import sleep
+from typing import Dict, Iterable, List, Optional, Set
+
+from storage.db_interface_common import SANITIZED_BLOB_PREFIX, MongoInterfaceCommon
+
+UID_REGEX = re.compile(r'_([0-9a-f]{64}_[0-9]+)$')
+
+
+class SanitizeStorageCompactor(MongoInterfaceCommon):
+    '''
+    Garbage collection and deduplication of the sanitize file storage (GridFS):
+    - superseded versions of a file (only the last version is ever read) are removed
+    - files that are not referenced by the DB entry of their uid (e.g. because the object was deleted) are removed
+    - files with identical content are replaced by references to a single blob file (unreferenced blobs are removed)
+    Files younger than GRACE_PERIOD are only deduplicated but never removed as orphans, because sanitized files are
+    written before the DB entry referencing them. Work is done in batches of BATCH_SIZE files with a pause of
+    throttle_delay seconds between the batches so that the compaction can run alongside the analysis.
+    '''
+
+    READ_ONLY = False
+    BATCH_SIZE = 100
+    GRACE_PERIOD = timedelta(hours=1)
+
+    def __init__(self, config=None, throttle_delay: float = 0.0, stop_condition=None):
+        super().__init__(config=config)
+        self.throttle_delay = throttle_delay
+        self.stop_condition = stop_condition
+
+    def _setup_database_mapping(self):
+        super()._setup_database_mapping()
+        self.sanitize_files = self.sanitize_storage.fs.files
+
+    def compact(self) -> Dict[str, int]:
+        statistics = {
+            'superseded_versions': self.remove_superseded_versions(),
+            'orphaned_files': self.remove_orphaned_files(),
+            'deduplicated_files': self.deduplicate_files(),
+        }
+        statistics['unreferenced_blobs'] = self.remove_unreferenced_blobs()
+        logging.info('Compacted sanitize storage: {}'.format(statistics))
+        return statistics
+
+    def remove_superseded_versions(self) -> int:
+        duplicate_file_names = (
+            entry['_id'] for entry in self.sanitize_files.aggregate([
+                {'$group': {'_id': '$filename', 'count': {'$sum': 1}}},
+                {'$match': {'count': {'$gt': 1}}},
+            ], allowDiskUse=True)
+        )
+        removed = 0
+        for batch in self._get_batches(duplicate_file_names):
+            for file_name in batch:
+                versions = self.sanitize_files.find({'filename': file_name}, {'_id': 1}).sort([('uploadDate', -1), ('_id', -1)])
+                removed += self._delete_files(version['_id'] for version in list(versions)[1:])
+        return removed
+
+    def remove_orphaned_files(self) -> int:
+        candidates = (
+            entry['filename'] for entry in self.sanitize_files.find(
+                {'filename': {'$not': re.compile('^{}'.format(SANITIZED_BLOB_PREFIX))}, 'uploadDate': {'$lt': datetime.utcnow() - self.GRACE_PERIOD}},
+                {'filename': 1}
+            )
+        )
+        removed = 0
+        for batch in self._get_batches(candidates):
+            referenced_files = self._get_referenced_file_names({self._get_uid(file_name) for file_name in batch} - {None})
+            orphaned_files = {file_name for file_name in batch if self._get_uid(file_name) and file_name not in referenced_files}
+            removed += self._delete_files(entry['_id'] for entry in self.sanitize_files.find({'filename': {'$in': list(orphaned_files)}}, {'_id': 1}))
+        return removed
+
+    def deduplicate_files(self) -> int:
+        self._add_missing_content_hashes()
+        duplicate_hashes = (
+            entry['_id'] for entry in self.sanitize_files.aggregate([
+                {'$match': {'metadata.sha256': {'$exists': True}, 'metadata.blob': {'$exists': False}}},
+                {'$group': {'_id': '$metadata.sha256', 'count': {'$sum': 1}}},
+                {'$match': {'count': {'$gt': 1}}},
+            ], allowDiskUse=True)
+        )
+        deduplicated = 0
+        for batch in self._get_batches(duplicate_hashes):
+            for content_hash in batch:
+                deduplicated += self._replace_with_blob_reference(content_hash)
+        return deduplicated
+
+    def remove_unreferenced_blobs(self) -> int:
+        blobs = (
+            entry for entry in self.sanitize_files.find({'filename': re.compile('^{}'.format(SANITIZED_BLOB_PREFIX))}, {'filename': 1})
+        )
+        removed = 0
+        for batch in self._get_batches(blobs):
+            content_hashes = [blob['filename'][len(SANITIZED_BLOB_PREFIX):] for blob in batch]
+            referenced_hashes = set(self.sanitize_files.distinct('metadata.blob', {'metadata.blob': {'$in': content_hashes}}))
+            removed += self._delete_files(
+                blob['_id'] for blob, content_hash in zip(batch, content_hashes) if content_hash not in referenced_hashes
+            )
+        return removed
+
+    def _add_missing_content_hashes(self):
+        '''
+        files of older versions were stored without the hash of their content
+        '''
+        files_without_hash = self.sanitize_files.find(
+            {'metadata.sha256': {'$exists': False}, 'metadata.blob': {'$exists': False}, 'filename': {'$not': re.compile('^{}'.format(SANITIZED_BLOB_PREFIX))}},
+            {'_id': 1}
+        )
+        for batch in self._get_batches(files_without_hash):
+            for entry in batch:
+                content_hash = sha256(self.sanitize_fs.get(entry['_id']).read()).hexdigest()
+                self.sanitize_files.update_one({'_id': entry['_id']}, {'$set': {'metadata.sha256': content_hash}})
+
+    def _replace_with_blob_reference(self, content_hash: str) -> int:
+        '''
+        the reference gets the upload date of the replaced file so that a newer version written in the meantime
+        still takes precedence
+        '''
+        duplicates = list(self.sanitize_files.find({'metadata.sha256': content_hash, 'metadata.blob': {'$exists': False}}))
+        blob_name = self._get_blob_file_name(content_hash)
+        if not self.sanitize_fs.exists(filename=blob_name):
+            self.sanitize_fs.put(self.sanitize_fs.get(duplicates[0]['_id']).read(), filename=blob_name, metadata={'sha256': content_hash})
+        for entry in duplicates:
+            metadata = {key: value for key, value in (entry.get('metadata') or {}).items() if key != 'sha256'}
+            metadata['blob'] = content_hash
+            reference_id = self.sanitize_fs.put(b'', filename=entry['filename'], metadata=metadata)
+            self.sanitize_files.update_one({'_id': reference_id}, {'$set': {'uploadDate': entry['uploadDate']}})
+            self.sanitize_fs.delete(entry['_id'])
+        return len(duplicates)
+
+    def _get_referenced_file_names(self, uids: Set[str]) -> Set[str]:
+        referenced_files = set()
+        for collection in [self.firmwares, self.file_objects]:
+            for entry in collection.find({'_id': {'$in': list(uids)}}, {'processed_analysis': 1}):
+                referenced_files.update(self._get_sanitized_file_names(entry.get('processed_analysis', {})))
+        return referenced_files
+
+    @staticmethod
+    def _get_uid(file_name: str) -> Optional[str]:
+        match = UID_REGEX.search(file_name)
+        return match.group(1) if match else None
+
+    def _delete_files(self, file_ids: Iterable) -> int:
+        removed = 0
+        for file_id in file_ids:
+            self.sanitize_fs.delete(file_id)
+            removed += 1
+        return removed
+
+    def _get_batches(self, items: Iterable) -> Iterable[List]:
+        '''
+        yields the items in batches of BATCH_SIZE and pauses between the batches (stops early if stop_condition is set)
+        '''
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == self.BATCH_SIZE:
+                yield batch
+                batch = []
+                if self._should_stop():
+                    return
+                sleep(self.throttle_delay)
+        if batch:
+            yield batch
+
+    def _should_stop(self) -> bool:
+        return self.stop_condition is not None and self.stop_condition.value != 0
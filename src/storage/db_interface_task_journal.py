@@ -0,0 +1,65 @@
+import logging
+from time import time
+from typing import List
+
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import PyMongoError
+
+from objects.file import FileObject
+from storage.mongo_interface import MongoInterface
+
+
+class TaskJournal(MongoInterface):
+    '''
+    Persistent journal of the pending analysis tasks (one entry per uid with the plugins that did not finish yet)
+    Changes are buffered and written with a single bulk write per batch
+    '''
+
+    READ_ONLY = False
+    BATCH_SIZE = 100
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, config=None):
+        super().__init__(config=config)
+        self._buffer = []
+        self._last_flush = time()
+
+    def _setup_database_mapping(self):
+        self.main = self.client[self.config['data_storage']['main_database']]
+        self.task_journal = self.main.analysis_task_journal
+
+    def add_tasks(self, file_object: FileObject, plugins: List[str]):
+        self._buffer.append(UpdateOne(
+            {'_id': file_object.uid},
+            {
+                '$addToSet': {'pending_plugins': {'$each': plugins}},
+                '$min': {'priority': file_object.priority},
+                '$set': {'root_uid': file_object.root_uid},
+            },
+            upsert=True
+        ))
+
+    def finish_task(self, uid: str, plugin: str):
+        self._buffer.append(UpdateOne({'_id': uid}, {'$pull': {'pending_plugins': plugin}}))
+
+    def finish_object(self, uid: str):
+        self._buffer.append(DeleteOne({'_id': uid}))
+
+    def flush(self, force: bool = False):
+        '''
+        write the buffered changes if the batch is full or the flush interval has passed (or force is set)
+        '''
+        if not self._buffer or not (force or self.flush_is_due()):
+            return
+        try:
+            self.task_journal.bulk_write(self._buffer, ordered=True)
+        except PyMongoError as error:
+            logging.error('Could not update analysis task journal: {}'.format(error))
+        self._buffer = []
+        self._last_flush = time()
+
+    def flush_is_due(self) -> bool:
+        return len(self._buffer) >= self.BATCH_SIZE or time() - self._last_flush >= self.FLUSH_INTERVAL
+
+    def get_pending_tasks(self) -> List[dict]:
+        return list(self.task_journal.find())
@@ -0,0 +1,93 @@
+import logging
+from typing import Any, Callable, Iterable, Tuple
+
+
+class LazyAnalysisResult(dict):
+    '''
+    Analysis result of a DB entry whose sanitized fields are only loaded from the sanitize storage when they are
+    accessed for the first time (the inline fields like the summary are available immediately).
+    It behaves like a dict (pickling, copies and comparisons load all remaining fields first and result in plain dicts)
+    :param load_file: returns the content of a sanitized file and if it contains all fields (or a single one)
+    '''
+
+    def __init__(self, entry: dict, sanitized_keys: Iterable[str], load_file: Callable[[str], Tuple[Any, bool]]):
+        super().__init__(entry)
+        self._unresolved_keys = set(sanitized_keys)
+        self._load_file = load_file
+
+    def _resolve(self, key):
+        if key not in self._unresolved_keys:
+            return
+        file_name = super().__getitem__(key)
+        try:
+            content, contains_all_fields = self._load_file(file_name)
+            super().__setitem__(key, content.get(key, {}) if contains_all_fields else content)
+        except Exception as error:  # pylint: disable=broad-except
+            logging.warning('Could not load sanitized analysis field {} from {}: {} {}'.format(key, file_name, type(error), error))
+        self._unresolved_keys.discard(key)
+
+    def _resolve_all(self):
+        for key in list(self._unresolved_keys):
+            self._resolve(key)
+
+    def __getitem__(self, key):
+        self._resolve(key)
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        self._unresolved_keys.discard(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._unresolved_keys.discard(key)
+        super().__delitem__(key)
+
+    def __iter__(self):  # overwritten so that dict(self) uses __getitem__
+        return super().__iter__()
+
+    def __eq__(self, other):
+        self._resolve_all()
+        return super().__eq__(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._resolve_all()
+        return super().__repr__()
+
+    def __reduce__(self):
+        return dict, (self.copy(),)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def items(self):
+        self._resolve_all()
+        return super().items()
+
+    def values(self):
+        self._resolve_all()
+        return super().values()
+
+    def copy(self):
+        return dict(self.items())
+
+    def pop(self, key, *default):
+        self._resolve(key)
+        self._unresolved_keys.discard(key)
+        return super().pop(key, *default)
+
+    def popitem(self):
+        self._resolve_all()
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self._resolve(key)
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
@@ -1,4 +1,7 @@
+import atexit
+import os
 import warnings
+from threading import Lock
 
 from pymongo import MongoClient, errors
 
@@ -7,36 +10,87 @@ from helperFunctions.process import complete_shutdown
 
 warnings.filterwarnings('ignore', module='pymongo.topology')
 
+# pooled clients of this process: (server, port, user) -> authenticated MongoClient
+_CLIENTS = {}
+_CLIENTS_LOCK = Lock()
+_CLIENTS_PID = os.getpid()
+
+
+def _reset_client_registry():
+    '''
+    clients must not be shared across forks: a child process creates its own clients on first use
+    (the inherited ones are not closed as their sockets still belong to the parent process)
+    '''
+    global _CLIENTS_LOCK, _CLIENTS_PID  # pylint: disable=global-statement
+    _CLIENTS.clear()
+    _CLIENTS_LOCK = Lock()
+    _CLIENTS_PID = os.getpid()
+
+
+if hasattr(os, 'register_at_fork'):  # python >= 3.7 (else the pid check in get_mongo_client resets the registry)
+    os.register_at_fork(after_in_child=_reset_client_registry)
+
+
+def close_mongo_clients():
+    '''
+    closes the pooled clients of this process (registered to run on interpreter exit)
+    '''
+    with _CLIENTS_LOCK:
+        if _CLIENTS_PID == os.getpid():
+            for client in _CLIENTS.values():
+                client.close()
+        _CLIENTS.clear()
+
+
+atexit.register(close_mongo_clients)
+
+
+def get_mongo_client(config, read_only: bool) -> MongoClient:
+    '''
+    returns the authenticated client of this process for the read-only or admin role (it is created on first use)
+    '''
+    if _CLIENTS_PID != os.getpid():  # forked without the python fork hooks (e.g. by uwsgi)
+        _reset_client_registry()
+    mongo_server, mongo_port = config['data_storage']['mongo_server'], config['data_storage']['mongo_port']
+    user, pw = _get_credentials(config, read_only)
+    key = (mongo_server, mongo_port, user)
+    with _CLIENTS_LOCK:
+        if key not in _CLIENTS:
+            client = MongoClient('mongodb://{}:{}'.format(mongo_server, mongo_port), connect=False)
+            _authenticate(client, user, pw)
+            _CLIENTS[key] = client
+        return _CLIENTS[key]
+
+
+def _get_credentials(config, read_only: bool):
+    if read_only:
+        return config['data_storage']['db_readonly_user'], config['data_storage']['db_readonly_pw']
+    return config['data_storage']['db_admin_user'], config['data_storage']['db_admin_pw']
+
+
+def _authenticate(client: MongoClient, user: str, pw: str):
+    try:
+        client.admin.authenticate(user, pw, mechanism='SCRAM-SHA-1')
+    except errors.OperationFailure as e:  # Authentication not successful
+        complete_shutdown('Error: Authentication not successful: {}'.format(e))
+
 
 class MongoInterface(object):
     '''
     This is the mongo interface base class handling:
     - load config
-    - setup connection including authentication
+    - setup connection including authentication (the pooled client of the process is shared by all interfaces with the same role)
     '''
 
     READ_ONLY = False
 
     def __init__(self, config=None):
         self.config = config
-        mongo_server = self.config['data_storage']['mongo_server']
-        mongo_port = self.config['data_storage']['mongo_port']
-        self.client = MongoClient('mongodb://{}:{}'.format(mongo_server, mongo_port), connect=False)
-        self._authenticate()
+        self.client = get_mongo_client(self.config, self.READ_ONLY)
         self._setup_database_mapping()
 
     def shutdown(self):
-        self.client.close()
+        pass  # the pooled client stays open for the next interface of this process (see close_mongo_clients)
 
     def _setup_database_mapping(self):
         pass
-
-    def _authenticate(self):
-        if self.READ_ONLY:
-            user, pw = self.config['data_storage']['db_readonly_user'], self.config['data_storage']['db_readonly_pw']
-        else:
-            user, pw = self.config['data_storage']['db_admin_user'], self.config['data_storage']['db_admin_pw']
-        try:
-            self.client.admin.authenticate(user, pw, mechanism='SCRAM-SHA-1')
-        except errors.OperationFailure as e:  # Authentication not successful
-            complete_shutdown('Error: Authentication not successful: {}'.format(e))
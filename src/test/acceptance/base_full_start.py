@@ -26,7 +26,7 @@ class TestAcceptanceBaseFullStart(TestAcceptanceBase):
         self.db_backend_service.shutdown()
         super().tearDown()
 
-    def _analysis_callback(self, fo):
+    def _analysis_callback(self, fo, *_):
         self.db_backend_service.add_object(fo)
         self.elements_finished_analyzing.value += 1
         if self.elements_finished_analyzing.value == self.NUMBER_OF_FILES_TO_ANALYZE * self.NUMBER_OF_PLUGINS:
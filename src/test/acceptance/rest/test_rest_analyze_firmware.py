@@ -25,7 +25,7 @@ class TestRestFirmware(TestAcceptanceBase):
         self.db_backend_service.shutdown()
         super().tearDown()
 
-    def _analysis_callback(self, fo):
+    def _analysis_callback(self, fo, *_):
         self.db_backend_service.add_analysis(fo)
         self.elements_finished_analyzing.value += 1
         if self.elements_finished_analyzing.value == 4 * 3:  # container including 3 files times 3 plugins
@@ -34,7 +34,7 @@ class TestRestCompareFirmware(TestAcceptanceBase):
         cls.db_backend_service.shutdown()
         super().tearDownClass()
 
-    def _analysis_callback(self, fo):
+    def _analysis_callback(self, fo, *_):
         self.db_backend_service.add_object(fo)
         self.elements_finished_analyzing.value += 1
         if self.elements_finished_analyzing.value == 4 * 2 * 3:  # two firmware container with 3 included files each times three plugins
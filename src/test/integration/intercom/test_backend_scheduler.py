@@ -56,6 +56,9 @@ class AnalysisServiceMock:
     def update_analysis_of_single_object(self, fw):
         pass
 
+    def invalidate_result_cache(self, *_):
+        pass
+
 
 class TestInterComBackEndScheduler(unittest.TestCase):
 
@@ -29,7 +29,7 @@ class TestTagPropagation(unittest.TestCase):
         self._tagging_scheduler = TaggingDaemon(analysis_scheduler=self._analysis_scheduler)
         self._unpack_scheduler = UnpackingScheduler(config=self._config, post_unpack=self._analysis_scheduler.start_analysis_of_object)
 
-    def count_analysis_finished_event(self, fw_object):
+    def count_analysis_finished_event(self, fw_object, *_):
         self.backend_interface.add_analysis(fw_object)
         if fw_object.uid == self.uid_of_key_file and 'crypto_material' in fw_object.processed_analysis:
             sleep(1)
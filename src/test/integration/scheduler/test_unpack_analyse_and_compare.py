@@ -33,7 +33,7 @@ class TestFileAddition(TestCase):
         self._unpack_scheduler = UnpackingScheduler(config=self._config, post_unpack=self._analysis_scheduler.start_analysis_of_object)
         self._compare_scheduler = CompareScheduler(config=self._config, callback=self.trigger_compare_finished_event)
 
-    def count_analysis_finished_event(self, fw_object):
+    def count_analysis_finished_event(self, fw_object, *_):
         self.backend_interface.add_analysis(fw_object)
         self.elements_finished_analyzing.value += 1
         if self.elements_finished_analyzing.value == 4 * 2 * 2:  # 2 container with 3 files each and 2 plugins
@@ -2,7 +2,8 @@ import gc
 import unittest
 from time import time
 
-from statistic.work_load import WorkLoadStatistic
+from analysis.plugin_metrics import PluginMetrics
+from statistic.work_load import WorkLoadStatistic, get_plugin_runtime_ranking
 from storage.db_interface_statistic import StatisticDbViewer
 from storage.MongoMgr import MongoMgr
 from test.common_helper import clean_test_database, get_config_for_testing, get_database_names
@@ -30,3 +31,23 @@ class TestWorkloadStatistic(unittest.TestCase):
         self.assertAlmostEqual(time(), result['last_update'], msg='timestamp not valid', delta=100)
         self.assertIsInstance(result['platform'], dict, 'platfom is not a dict')
         self.assertIsInstance(result['system'], dict, 'system is not a dict')
+
+    def test_update_with_plugin_metrics(self):
+        metrics = PluginMetrics()
+        metrics.add_job(wall_time=0.5, cpu_time=0.25, peak_rss=1000, input_size=2 ** 20)
+        self.workload_stat.update(analysis_workload={'plugins': {'foo': {'queue': 0, 'active': 0, 'metrics': metrics.get_summary()}}})
+        result = self.frontend_db_interface.get_statistic('test')
+        assert result['analysis']['plugins']['foo']['metrics']['jobs'] == 1
+        assert get_plugin_runtime_ranking(result['analysis'])[0]['plugin'] == 'foo'
+
+
+def test_get_plugin_runtime_ranking():
+    analysis_workload = {'plugins': {
+        'fast': {'metrics': {'wall_time': 1.0}},
+        'slow': {'metrics': {'wall_time': 3.0}},
+        'no_metrics': {'queue': 0},
+    }}
+    ranking = get_plugin_runtime_ranking(analysis_workload)
+    assert [plugin['plugin'] for plugin in ranking] == ['slow', 'fast']
+    assert ranking[0]['time_share'] == 0.75
+    assert get_plugin_runtime_ranking(None) == []
@@ -2,6 +2,7 @@ import gc
 import json
 import pickle
 import unittest
+from unittest import mock
 from os import path
 from tempfile import TemporaryDirectory
 from typing import Set
@@ -118,12 +119,33 @@ class TestMongoInterface(unittest.TestCase):
 
         self.test_firmware.processed_analysis = long_dict
         sanitized_dict = self.db_interface.sanitize_analysis(self.test_firmware.processed_analysis, self.test_firmware.uid)
-        self.assertIn('stub_plugin_result_{}'.format(self.test_firmware.uid), self.db_interface.sanitize_fs.list(), 'sanitized file not stored')
-        self.assertNotIn('summary_result_{}'.format(self.test_firmware.uid), self.db_interface.sanitize_fs.list(), 'summary is erroneously stored')
+        self.assertEqual(self.db_interface.sanitize_fs.list(), ['stub_plugin_{}'.format(self.test_firmware.uid)], 'sanitized file not stored')
         self.assertIn('file_system_flag', sanitized_dict['stub_plugin'].keys())
         self.assertTrue(sanitized_dict['stub_plugin']['file_system_flag'])
         self.assertEqual(type(sanitized_dict['stub_plugin']['summary']), list)
 
+    def test_sanitize_analysis_keeps_metadata_inline(self):
+        long_dict = {'stub_plugin': {
+            'result': 10000000000, 'misc': 'Bananarama', 'summary': [], 'tags': {},
+            'plugin_version': '1.0', 'system_version': '0.1', 'analysis_date': 1.0
+        }}
+        sanitized_dict = self.db_interface.sanitize_analysis(long_dict, self.test_firmware.uid)
+        assert sanitized_dict['stub_plugin']['file_system_flag'] is True
+        assert sanitized_dict['stub_plugin']['plugin_version'] == '1.0'
+        assert sanitized_dict['stub_plugin']['system_version'] == '0.1'
+        assert sanitized_dict['stub_plugin']['analysis_date'] == 1.0
+        assert 'stub_plugin_plugin_version_{}'.format(self.test_firmware.uid) not in self.db_interface.sanitize_fs.list()
+
+        retrieved_dict = self.db_interface.retrieve_analysis(sanitized_dict)
+        assert retrieved_dict['stub_plugin']['plugin_version'] == '1.0'
+        assert retrieved_dict['stub_plugin']['misc'] == 'Bananarama'
+
+    def test_retrieve_analysis_with_sanitized_metadata(self):
+        self.db_interface.sanitize_fs.put(pickle.dumps('0.1'), filename='stub_plugin_plugin_version_uid')
+        sanitized_dict = {'stub_plugin': {'plugin_version': 'stub_plugin_plugin_version_uid', 'file_system_flag': True}}
+        retrieved_dict = self.db_interface.retrieve_analysis(sanitized_dict)
+        assert retrieved_dict['stub_plugin']['plugin_version'] == '0.1'
+
     def test_retrieve_analysis(self):
         self.db_interface.sanitize_fs.put(pickle.dumps('This is a test!'), filename='test_file_path')
 
@@ -145,6 +167,19 @@ class TestMongoInterface(unittest.TestCase):
         self.assertEqual(retrieved_dict['selected_plugin']['result'], 'This is a test!')
         self.assertIn('file_system_flag', retrieved_dict['other_plugin'])
 
+    def test_sanitized_analysis_is_loaded_lazily(self):
+        self.test_firmware.processed_analysis['stub_plugin'] = {'result': 'x' * 100, 'misc': 'Bananarama', 'summary': ['sum']}
+        self.db_interface_backend.add_firmware(self.test_firmware)
+        with mock.patch.object(self.db_interface, '_read_sanitized_file', wraps=self.db_interface._read_sanitized_file) as read_spy:
+            firmware = self.db_interface.get_object(self.test_firmware.uid)
+            assert firmware.processed_analysis['stub_plugin']['summary'] == ['sum']
+            assert read_spy.call_count == 0
+
+            assert firmware.processed_analysis['stub_plugin']['result'] == 'x' * 100
+            assert firmware.processed_analysis['stub_plugin']['misc'] == 'Bananarama'
+            assert read_spy.call_count == 1
+            assert 'file_system_flag' not in firmware.processed_analysis['stub_plugin']
+
     def test_get_objects_by_uid_list(self):
         self.db_interface_backend.add_firmware(self.test_firmware)
         fo_list = self.db_interface.get_objects_by_uid_list([self.test_firmware.uid])
@@ -158,11 +193,23 @@ class TestMongoInterface(unittest.TestCase):
     def test_sanitize_extract_and_retrieve_binary(self):
         test_data = {'dummy': {'test_key': 'test_value'}}
         test_data['dummy'] = self.db_interface._extract_binaries(test_data, 'dummy', 'uid')
-        self.assertEqual(self.db_interface.sanitize_fs.list(), ['dummy_test_key_uid'], 'file not written')
-        self.assertEqual(test_data['dummy']['test_key'], 'dummy_test_key_uid', 'new file path not set')
+        self.assertEqual(self.db_interface.sanitize_fs.list(), ['dummy_uid'], 'file not written')
+        self.assertEqual(test_data['dummy']['test_key'], 'dummy_uid', 'new file path not set')
         test_data['dummy'] = self.db_interface._retrieve_binaries(test_data, 'dummy')
         self.assertEqual(test_data['dummy']['test_key'], 'test_value', 'value not recoverd')
 
+    def test_sanitize_extract_and_retrieve_multiple_fields(self):
+        test_data = {'dummy': {'strings': ['a', 'b'] * 100, 'offsets': [(0, 'a'), (5, 'b')], 'bytes': b'\x00\x01', 'summary': []}}
+        test_data['dummy'] = self.db_interface._extract_binaries(test_data, 'dummy', 'uid')
+        assert self.db_interface.sanitize_fs.list() == ['dummy_uid']
+        assert self.db_interface.sanitize_fs.get_last_version('dummy_uid').metadata['serializer'] == self.db_interface.analysis_serializer
+        assert test_data['dummy']['summary'] == []
+
+        test_data['dummy'] = self.db_interface._retrieve_binaries(test_data, 'dummy')
+        assert test_data['dummy']['strings'] == ['a', 'b'] * 100
+        assert [list(offset) for offset in test_data['dummy']['offsets']] == [[0, 'a'], [5, 'b']]
+        assert test_data['dummy']['bytes'] == b'\x00\x01'
+
     def test_get_firmware_number(self):
         result = self.db_interface.get_firmware_number()
         self.assertEqual(result, 0)
@@ -272,6 +319,21 @@ class TestSummary(unittest.TestCase):
         self.assertIn(self.test_fo.uid, result_set_fw, 'test file not in result set firmware')
         self.assertIn(self.test_fw.uid, result_set_fw, 'fw not in result set firmware')
 
+    def test_get_set_of_all_included_files_of_nested_files(self):
+        self.test_fw = create_test_firmware()
+        parent_fo, child_fo = create_test_file_object(), create_test_file_object(bin_path='get_files_test/testfile2')
+        self.test_fw.add_included_file(parent_fo)
+        parent_fo.add_included_file(child_fo)
+        child_fo.files_included.add(self.test_fw.uid)  # cycles must not cause an infinite loop
+        parent_fo.files_included.add('missing_uid')
+        for item in [self.test_fw, parent_fo, child_fo]:
+            self.db_interface_backend.add_object(item)
+
+        expected_result = {self.test_fw.uid, parent_fo.uid, child_fo.uid}
+        assert self.db_interface.get_set_of_all_included_files(self.test_fw) == expected_result
+        assert self.db_interface.get_set_of_all_included_files(child_fo) == expected_result
+        assert self.db_interface.get_set_of_all_included_files_by_graph_lookup(self.test_fw) == expected_result
+
     def test_get_uids_of_all_included_files(self):
         def add_test_file_to_db_with_parent_uids(uid, parent_uids: Set[str]):
             test_fo = create_test_file_object()
@@ -0,0 +1,43 @@
+import gc
+
+import pytest
+
+from storage.db_interface_analysis_cache import AnalysisResultCache
+from storage.MongoMgr import MongoMgr
+from test.common_helper import get_config_for_testing
+
+CONFIG = get_config_for_testing()
+
+
+@pytest.fixture(scope='module')
+def mongo_server():
+    server = MongoMgr(config=CONFIG)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(scope='function')
+def result_cache(mongo_server):
+    cache = AnalysisResultCache(config=CONFIG)
+    yield cache
+    cache.analysis_result_cache.drop()
+    cache.shutdown()
+    gc.collect()
+
+
+def test_add_and_get_keys(result_cache):
+    assert result_cache.get_keys('uid') == set()
+    result_cache.add_keys('uid', [AnalysisResultCache.get_key('foo', '1.0', None)])
+    result_cache.add_keys('uid', [AnalysisResultCache.get_key('bar', '0.1', '2020-01-01')])
+    assert result_cache.get_keys('uid') == {'foo|1.0|', 'bar|0.1|2020-01-01'}
+
+
+def test_memory_is_invalidated(result_cache):
+    result_cache.add_keys('uid', ['foo|1.0|'])
+    assert result_cache.get_keys('uid') == {'foo|1.0|'}
+
+    result_cache.analysis_result_cache.delete_one({'_id': 'uid'})
+    assert result_cache.get_keys('uid') == {'foo|1.0|'}, 'should be answered from memory'
+
+    result_cache.invalidate_memory()
+    assert result_cache.get_keys('uid') == set()
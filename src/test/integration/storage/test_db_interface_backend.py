@@ -1,8 +1,11 @@
 import gc
+import pickle
 import unittest
 from tempfile import TemporaryDirectory
 from time import time
 
+from pymongo.errors import BulkWriteError
+
 from storage.db_interface_backend import BackEndDbInterface
 from storage.db_interface_common import MongoInterfaceCommon
 from storage.MongoMgr import MongoMgr
@@ -12,6 +15,40 @@ TESTS_DIR = get_test_data_dir()
 TMP_DIR = TemporaryDirectory(prefix='fact_test_')
 
 
+class ConcurrentUpsertCollection:
+    '''
+    another writer inserts the upserted entry of the root firmware during the first write which then fails with a duplicate key error
+    '''
+    def __init__(self, collection, root_uid):
+        self.collection = collection
+        self.root_uid = root_uid
+        self.writes = 0
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def bulk_write(self, updates, ordered=True):
+        self.writes += 1
+        if self.writes > 1:
+            return self.collection.bulk_write(updates, ordered=ordered)
+        index = next(  # pylint: disable=protected-access
+            index for index, update in enumerate(updates) if update._upsert and update._filter['_id'].startswith(self.root_uid)
+        )
+        self.collection.insert_one({'_id': updates[index]._filter['_id'], 'root_uid': self.root_uid, 'plugin': 'dummy', 'item': 'new sum c', 'uids': ['other_uid']})
+        self.collection.bulk_write(updates[:index] + updates[index + 1:], ordered=ordered)
+        raise BulkWriteError({'writeErrors': [{'index': index, 'code': 11000, 'errmsg': 'duplicate key'}]})
+
+
+class CountingCollection:
+    def __init__(self, collection):
+        self.collection = collection
+        self.calls = []
+
+    def __getattr__(self, name):
+        self.calls.append(name)
+        return getattr(self.collection, name)
+
+
 class TestStorageDbInterfaceBackend(unittest.TestCase):
 
     @classmethod
@@ -109,6 +146,26 @@ class TestStorageDbInterfaceBackend(unittest.TestCase):
         self.assertEqual(1, received_object.processed_analysis['stub_plugin']['result'])
         self.assertEqual(3, len(received_object.files_included))
 
+    def test_update_does_not_rewrite_unchanged_sanitized_analysis(self):
+        large_result = {'analysis_date': 1.0, 'plugin_version': '0.1', 'data': 'x' * 4096}
+        self.test_fo.processed_analysis = {'large_plugin': dict(large_result)}
+        self.test_fo.parent_firmware_uids = {'old_parent'}
+        self.db_interface_backend.add_file_object(self.test_fo)
+        file_name = 'large_plugin_{}'.format(self.test_fo.uid)
+        assert len(list(self.db_interface_backend.sanitize_fs.find({'filename': file_name}))) == 1
+
+        self.test_fo.processed_analysis = {'large_plugin': dict(large_result), 'other_plugin': {'result': 1}}
+        self.test_fo.parent_firmware_uids = {'new_parent'}
+        self.test_fo.virtual_file_path = {'new_parent': ['new_parent|/some/path']}
+        self.db_interface_backend.add_file_object(self.test_fo)
+        assert len(list(self.db_interface_backend.sanitize_fs.find({'filename': file_name}))) == 1
+
+        received_object = self.db_interface.get_object(self.test_fo.uid)
+        assert received_object.processed_analysis['large_plugin']['data'] == 'x' * 4096
+        assert received_object.processed_analysis['other_plugin']['result'] == 1
+        assert set(received_object.parent_firmware_uids) == {'old_parent', 'new_parent'}
+        assert received_object.virtual_file_path == {self.test_fo.uid: [self.test_fo.uid], 'new_parent': ['new_parent|/some/path']}
+
     def test_add_and_get_object_including_comment(self):
         comment, author, date, uid = 'this is a test comment!', 'author', '1473431685', self.test_fo.uid
         self.test_fo.comments.append(
@@ -179,5 +236,110 @@ class TestStorageDbInterfaceBackend(unittest.TestCase):
         with self.assertRaises(RuntimeError):
             self.db_interface_backend.add_analysis(dict())
 
-        with self.assertRaises(AttributeError):
-            self.db_interface_backend._update_analysis(dict(), 'dummy', dict())  # pylint: disable=protected-access
+        with self.assertRaises(RuntimeError):
+            self.db_interface_backend.buffer_analysis(dict(), ['dummy'])
+
+    def test_add_analysis_of_single_plugin(self):
+        self.db_interface_backend.add_object(self.test_fo)
+        self.db_interface_backend.file_objects.update_one({'_id': self.test_fo.uid}, {'$set': {'analysis_tags.other': {'tag': 'other'}}})
+
+        self.test_fo.processed_analysis['foo'] = {'bar': 5}
+        self.test_fo.processed_analysis['not_stored'] = {'bar': 6}
+        self.test_fo.analysis_tags['foo'] = {'some_tag': 'value'}
+        self.db_interface_backend.add_analysis(self.test_fo, ['foo'])
+        entry = self.db_interface_backend.file_objects.find_one({'_id': self.test_fo.uid})
+
+        assert entry['processed_analysis']['foo']['bar'] == 5
+        assert 'not_stored' not in entry['processed_analysis']
+        assert entry['analysis_tags'] == {'other': {'tag': 'other'}, 'foo': {'some_tag': 'value'}}
+
+    def test_buffer_analysis(self):
+        self.db_interface_backend.add_object(self.test_firmware)
+        self.db_interface_backend.add_object(self.test_fo)
+
+        self.test_firmware.processed_analysis['foo'] = {'bar': 1}
+        self.db_interface_backend.buffer_analysis(self.test_firmware, ['foo'])
+        self.test_fo.processed_analysis['foo'] = {'bar': 2}
+        self.db_interface_backend.buffer_analysis(self.test_fo, ['foo'])
+        self.test_fo.processed_analysis['foo'] = {'bar': 3}
+        self.db_interface_backend.buffer_analysis(self.test_fo, ['foo'])
+        assert 'foo' not in self.db_interface_backend.get_object(self.test_fo.uid).processed_analysis
+
+        assert self.db_interface_backend.flush_analysis_buffer(force=True)
+        assert self.db_interface_backend.get_object(self.test_firmware.uid).processed_analysis['foo'] == {'bar': 1}
+        assert self.db_interface_backend.get_object(self.test_fo.uid).processed_analysis['foo'] == {'bar': 3}
+        assert not self.db_interface_backend.flush_analysis_buffer(force=True)
+
+    def test_inline_sanitized_analysis_metadata(self):
+        self.db_interface_backend.add_object(self.test_fo)
+        file_name = 'dummy_plugin_version_{}'.format(self.test_fo.uid)
+        self.db_interface_backend.sanitize_fs.put(pickle.dumps('0.1'), filename=file_name)
+        self.db_interface_backend.file_objects.update_one(
+            {'_id': self.test_fo.uid},
+            {'$set': {'processed_analysis.dummy': {'plugin_version': file_name, 'content': 'dummy_content_uid', 'file_system_flag': True}}}
+        )
+
+        assert self.db_interface_backend.inline_sanitized_analysis_metadata() == 1
+        entry = self.db_interface_backend.file_objects.find_one(self.test_fo.uid)
+        assert entry['processed_analysis']['dummy']['plugin_version'] == '0.1'
+        assert entry['processed_analysis']['dummy']['content'] == 'dummy_content_uid'
+        assert self.db_interface_backend.sanitize_fs.find_one({'filename': file_name}) is None
+        assert self.db_interface_backend.inline_sanitized_analysis_metadata() == 0
+
+    def _get_summary(self, root_uid, plugin='dummy'):
+        return {item: set(uids) for item, uids in self.db_interface.get_materialized_summary(root_uid, plugin).items()}
+
+    def _add_firmware_with_included_file(self):
+        self.test_firmware.add_included_file(self.test_fo)
+        self.db_interface_backend.add_object(self.test_firmware)
+        self.db_interface_backend.add_object(self.test_fo)
+
+    def test_materialized_summary(self):
+        self._add_firmware_with_included_file()
+        fw_uid, fo_uid = self.test_firmware.uid, self.test_fo.uid
+        assert self._get_summary(fw_uid) == {'sum a': {fw_uid, fo_uid}, 'fw exclusive sum a': {fw_uid}, 'file exclusive sum b': {fo_uid}}
+
+        self.test_fo.processed_analysis['dummy']['summary'] = ['sum a', 'new sum c']
+        self.db_interface_backend.add_analysis(self.test_fo, ['dummy'])
+        assert self._get_summary(fw_uid) == {'sum a': {fw_uid, fo_uid}, 'fw exclusive sum a': {fw_uid}, 'new sum c': {fo_uid}}
+
+        self.test_fo.processed_analysis['dummy']['summary'] = []
+        self.db_interface_backend.buffer_analysis(self.test_fo, ['dummy'])
+        assert self.db_interface_backend.flush_analysis_buffer(force=True)
+        assert self._get_summary(fw_uid) == {'sum a': {fw_uid}, 'fw exclusive sum a': {fw_uid}}
+
+    def test_flush_writes_summaries_of_all_objects_at_once(self):
+        self._add_firmware_with_included_file()
+        fw_uid, fo_uid = self.test_firmware.uid, self.test_fo.uid
+        summaries = self.db_interface_backend.firmware_summaries
+        self.db_interface_backend.firmware_summaries = CountingCollection(summaries)
+        self.test_firmware.processed_analysis['dummy']['summary'] = ['sum a', 'new sum c']
+        self.db_interface_backend.buffer_analysis(self.test_firmware, ['dummy'])
+        self.test_fo.processed_analysis['dummy']['summary'] = ['new sum c', 'new sum d']
+        self.db_interface_backend.buffer_analysis(self.test_fo, ['dummy'])
+        assert self.db_interface_backend.flush_analysis_buffer(force=True)
+        calls = self.db_interface_backend.firmware_summaries.calls
+        self.db_interface_backend.firmware_summaries = summaries
+
+        assert calls == ['find', 'bulk_write']
+        assert self._get_summary(fw_uid) == {'sum a': {fw_uid}, 'new sum c': {fw_uid, fo_uid}, 'new sum d': {fo_uid}}
+
+    def test_materialized_summary_of_new_root_firmware(self):
+        self._add_firmware_with_included_file()
+        same_file = create_test_file_object()
+        same_file.processed_analysis = {}
+        same_file.virtual_file_path = {'other_root_uid': ['other_root_uid|/some/path']}
+        self.db_interface_backend.add_object(same_file)
+
+        assert self._get_summary('other_root_uid') == {'sum a': {self.test_fo.uid}, 'file exclusive sum b': {self.test_fo.uid}}
+        assert self._get_summary(self.test_firmware.uid)['file exclusive sum b'] == {self.test_fo.uid}
+
+    def test_summary_upsert_is_retried_after_duplicate_key_error(self):
+        self._add_firmware_with_included_file()
+        fw_uid, fo_uid = self.test_firmware.uid, self.test_fo.uid
+        summaries = self.db_interface_backend.firmware_summaries
+        self.db_interface_backend.firmware_summaries = ConcurrentUpsertCollection(summaries, fw_uid)
+        self.test_fo.processed_analysis['dummy']['summary'] = ['sum a', 'new sum c']
+        self.db_interface_backend.add_analysis(self.test_fo, ['dummy'])
+        self.db_interface_backend.firmware_summaries = summaries
+        assert self._get_summary(fw_uid)['new sum c'] == {fo_uid, 'other_uid'}
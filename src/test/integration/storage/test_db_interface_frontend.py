@@ -106,6 +106,59 @@ class TestStorageDbInterfaceFrontend(unittest.TestCase):
         result = self.db_frontend_interface.generic_search({'file_name': 'test.zip'})
         self.assertEqual(result, [self.test_firmware.uid], 'Firmware not successfully received')
 
+    def _add_test_objects_for_search(self):
+        self.db_backend_interface.client.drop_database(self._config.get('data_storage', 'main_database'))
+        test_fw_one = create_test_firmware(vendor='vendor_a')
+        test_fw_two = create_test_firmware(vendor='vendor_b', bin_path='container/test.7z')
+        test_fo_one = create_test_file_object()
+        test_fo_one.parent_firmware_uids = {test_fw_one.uid}
+        test_fo_two = create_test_file_object(bin_path='get_files_test/testfile2')
+        test_fo_two.parent_firmware_uids = {test_fw_two.uid}
+        for item in [test_fw_one, test_fw_two, test_fo_one, test_fo_two]:
+            self.db_backend_interface.add_object(item)
+        return test_fw_one, test_fw_two, test_fo_one, test_fo_two
+
+    def test_search_page(self):
+        test_fw_one, test_fw_two, test_fo_one, test_fo_two = self._add_test_objects_for_search()
+        query = {'size': {'$gt': 0}}
+
+        result, total, cursor = self.db_frontend_interface.search_page(query, limit=3)
+        assert result == [test_fw_one.uid, test_fw_two.uid, test_fo_one.uid]
+        assert total == 4
+        assert cursor == ['file_objects', 'testfile1', test_fo_one.uid]
+        assert self.db_frontend_interface.search_page(query, skip=3, limit=3)[:2] == ([test_fo_two.uid], 4)
+        assert self.db_frontend_interface.search_page(query, limit=3, after=cursor)[:2] == ([test_fo_two.uid], 4)
+
+        result, total, cursor = self.db_frontend_interface.search_page(query, limit=1)
+        assert self.db_frontend_interface.search_page(query, limit=2, after=cursor)[:2] == ([test_fw_two.uid, test_fo_one.uid], 4)
+
+    def test_search_page_of_empty_query(self):
+        test_fw_one, test_fw_two, _, _ = self._add_test_objects_for_search()
+        assert self.db_frontend_interface.search_page({}, limit=3)[:2] == ([test_fw_one.uid, test_fw_two.uid], 2)
+        assert self.db_frontend_interface.search_page({}, skip=2, limit=3)[:2] == ([], 2)
+        assert self.db_frontend_interface.get_number_of_total_matches({}, only_parent_firmwares=False, inverted=False) == 2
+
+    def test_search_page_of_parent_firmware(self):
+        test_fw_one, test_fw_two, test_fo_one, _ = self._add_test_objects_for_search()
+        query = {'file_name': test_fo_one.file_name}
+        assert self.db_frontend_interface.search_page(query, only_fo_parent_firmware=True)[:2] == ([test_fw_one.uid], 1)
+        assert self.db_frontend_interface.search_page(query, only_fo_parent_firmware=True, inverted=True)[:2] == ([test_fw_two.uid], 1)
+        assert self.db_frontend_interface.search_page({}, only_fo_parent_firmware=True)[1] == 2
+
+    def test_search_page_of_non_parent_firmware(self):
+        test_fw_one, test_fw_two, test_fo_one, _ = self._add_test_objects_for_search()
+        test_fw_three = create_test_firmware(vendor='vendor_c', bin_path='container/test.cab')
+        self.db_backend_interface.add_object(test_fw_three)
+        query = {'file_name': test_fo_one.file_name}
+        non_parents = sorted([test_fw_two, test_fw_three], key=lambda fw: (fw.file_name, fw.uid))
+
+        result, total, cursor = self.db_frontend_interface.search_page(query, limit=1, only_fo_parent_firmware=True, inverted=True)
+        assert (result, total) == ([non_parents[0].uid], 2)
+        assert self.db_frontend_interface.search_page(query, limit=1, only_fo_parent_firmware=True, inverted=True, after=cursor)[:2] == ([non_parents[1].uid], 2)
+        assert self.db_frontend_interface.search_page(query, skip=1, limit=1, only_fo_parent_firmware=True, inverted=True)[:2] == ([non_parents[1].uid], 2)
+        assert self.db_frontend_interface.generic_search(query, only_fo_parent_firmware=True, inverted=True) == [fw.uid for fw in non_parents]
+        assert test_fw_one.uid not in self.db_frontend_interface.generic_search({'vendor': {'$ne': 'x'}}, skip=1)
+
     def test_all_uids_found_in_database(self):
         self.db_backend_interface.client.drop_database(self._config.get('data_storage', 'main_database'))
         uid_list = [self.test_firmware.uid]
@@ -0,0 +1,69 @@
+# pylint: disable=redefined-outer-name
+import gc
+
+import pytest
+
+from storage.db_interface_backend import BackEndDbInterface
+from storage.db_interface_index import INDEXES, IndexProvisioner
+from storage.MongoMgr import MongoMgr
+from test.common_helper import create_test_file_object, create_test_firmware, get_config_for_testing
+
+CONFIG = get_config_for_testing()
+
+
+@pytest.fixture(scope='module')
+def mongo_server():
+    server = MongoMgr(config=CONFIG)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(scope='function')
+def provisioner(mongo_server):
+    provisioner = IndexProvisioner(config=CONFIG)
+    provisioner.client.drop_database(CONFIG.get('data_storage', 'main_database'))
+    yield provisioner
+    provisioner.client.drop_database(CONFIG.get('data_storage', 'main_database'))
+    provisioner.shutdown()
+    gc.collect()
+
+
+@pytest.fixture(scope='function')
+def backend_db(mongo_server):
+    db_interface = BackEndDbInterface(config=CONFIG)
+    yield db_interface
+    db_interface.shutdown()
+
+
+def test_create_missing_indexes(provisioner):
+    assert set(provisioner.get_missing_indexes()) == set(INDEXES)
+    assert provisioner.create_missing_indexes() == sum(len(indexes) for indexes in INDEXES.values())
+    assert provisioner.get_missing_indexes() == {}
+    assert provisioner.create_missing_indexes() == 0
+
+
+def test_add_missing_root_firmware_uids(provisioner, backend_db):
+    fo = create_test_file_object()
+    fo.virtual_file_path = {'root_uid_1': ['root_uid_1|some/path'], 'root_uid_2': ['root_uid_2|other/path']}
+    backend_db.add_file_object(fo)
+    provisioner.file_objects.update_one({'_id': fo.uid}, {'$unset': {'root_firmware_uids': ''}})
+
+    provisioner.create_missing_indexes()
+    assert 'root_firmware_uids' not in provisioner.file_objects.find_one(fo.uid)
+
+    assert provisioner.add_missing_root_firmware_uids() == 1
+    assert sorted(provisioner.file_objects.find_one(fo.uid)['root_firmware_uids']) == ['root_uid_1', 'root_uid_2']
+    assert provisioner.add_missing_root_firmware_uids() == 0
+
+
+def test_root_firmware_uids_are_stored(provisioner, backend_db):
+    fw = create_test_firmware()
+    fo = create_test_file_object()
+    fo.virtual_file_path = {fw.uid: ['{}|some/path'.format(fw.uid)]}
+    backend_db.add_firmware(fw)
+    backend_db.add_file_object(fo)
+    assert provisioner.file_objects.find_one(fo.uid)['root_firmware_uids'] == [fw.uid]
+
+    fo.virtual_file_path = {'other_root_uid': ['other_root_uid|some/path']}
+    backend_db.add_file_object(fo)
+    assert sorted(provisioner.file_objects.find_one(fo.uid)['root_firmware_uids']) == sorted([fw.uid, 'other_root_uid'])
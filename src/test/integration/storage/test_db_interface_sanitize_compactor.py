@@ -0,0 +1,110 @@
+# pylint: disable=redefined-outer-name,protected-access
+import gc
+import pickle
+from datetime import datetime
+
+import pytest
+
+from storage.db_interface_backend import BackEndDbInterface
+from storage.db_interface_sanitize_compactor import SanitizeStorageCompactor
+from storage.MongoMgr import MongoMgr
+from test.common_helper import create_test_file_object, get_config_for_testing
+
+CONFIG = get_config_for_testing()
+CONFIG.set('data_storage', 'report_threshold', '32')
+OLD_DATE = datetime.utcnow() - 2 * SanitizeStorageCompactor.GRACE_PERIOD
+
+
+@pytest.fixture(scope='module')
+def mongo_server():
+    server = MongoMgr(config=CONFIG)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(scope='function')
+def compactor(mongo_server):
+    compactor = SanitizeStorageCompactor(config=CONFIG)
+    yield compactor
+    compactor.client.drop_database(CONFIG.get('data_storage', 'main_database'))
+    compactor.client.drop_database(CONFIG.get('data_storage', 'sanitize_database', fallback='faf_sanitize'))
+    compactor.shutdown()
+    gc.collect()
+
+
+@pytest.fixture(scope='function')
+def backend_db(mongo_server):
+    db_interface = BackEndDbInterface(config=CONFIG)
+    yield db_interface
+    db_interface.shutdown()
+
+
+def _age_all_files(compactor):
+    compactor.sanitize_files.update_many({}, {'$set': {'uploadDate': OLD_DATE}})
+
+
+def test_remove_superseded_versions(compactor):
+    for version in range(3):
+        compactor.sanitize_fs.put(pickle.dumps(version), filename='foo')
+    assert compactor.remove_superseded_versions() == 2
+    assert compactor._load_sanitized_file('foo') == 2
+
+
+def test_remove_orphaned_files(compactor, backend_db):
+    test_fo = create_test_file_object()
+    test_fo.processed_analysis['large_plugin'] = {'data': 'x' * 100}
+    backend_db.add_file_object(test_fo)
+    deleted_uid = '{}_42'.format('0' * 64)
+    compactor.sanitize_fs.put(b'orphan', filename='large_plugin_{}'.format(deleted_uid))
+    compactor.sanitize_fs.put(b'unknown owner', filename='no_uid')
+    assert compactor.remove_orphaned_files() == 0, 'young files must not be removed'
+
+    _age_all_files(compactor)
+    assert compactor.remove_orphaned_files() == 1
+    assert 'large_plugin_{}'.format(deleted_uid) not in compactor.sanitize_fs.list()
+    assert 'large_plugin_{}'.format(test_fo.uid) in compactor.sanitize_fs.list()
+    assert 'no_uid' in compactor.sanitize_fs.list()
+
+
+def test_deduplicate_files(compactor, backend_db):
+    test_fo = create_test_file_object()
+    test_fo.processed_analysis['large_plugin'] = {'data': 'x' * 100}
+    backend_db.add_file_object(test_fo)
+    compactor.sanitize_fs.put(pickle.dumps('legacy'), filename='legacy_a')
+    compactor.sanitize_fs.put(pickle.dumps('legacy'), filename='legacy_b')
+    compactor.sanitize_fs.put(pickle.dumps('unique'), filename='legacy_c')
+    file_name = 'large_plugin_{}'.format(test_fo.uid)
+    content_hash = compactor.sanitize_fs.get_last_version(file_name).metadata['sha256']
+    compactor.sanitize_fs.put(compactor.sanitize_fs.get_last_version(file_name).read(), filename='copy', metadata={'serializer': compactor.analysis_serializer, 'sha256': content_hash})
+
+    assert compactor.deduplicate_files() == 4
+    assert compactor.sanitize_fs.get_last_version(file_name).length == 0
+    assert compactor.sanitize_fs.get_last_version(file_name).metadata['blob'] == content_hash
+    assert compactor._load_sanitized_file('legacy_a') == 'legacy'
+    assert compactor._load_sanitized_file('legacy_b') == 'legacy'
+    assert compactor._load_sanitized_file('legacy_c') == 'unique'
+    assert backend_db.get_object(test_fo.uid).processed_analysis['large_plugin']['data'] == 'x' * 100
+
+    compactor.sanitize_fs.delete(compactor.sanitize_fs.get_last_version('copy')._id)
+    compactor.sanitize_fs.delete(compactor.sanitize_fs.get_last_version(file_name)._id)
+    assert compactor.remove_unreferenced_blobs() == 1
+    assert compactor._load_sanitized_file('legacy_a') == 'legacy'
+
+
+def test_missing_blob(compactor):
+    compactor.sanitize_fs.put(b'', filename='reference', metadata={'serializer': compactor.analysis_serializer, 'blob': 'missing_hash'})
+    assert compactor._read_sanitized_file('reference') == ({}, False)
+    assert compactor._read_sanitized_file('missing_file') == ({}, False)
+
+
+def test_compact_is_throttled_and_stoppable(compactor):
+    class StopCondition:
+        value = 0
+
+    compactor.BATCH_SIZE = 2
+    compactor.stop_condition = StopCondition()
+    batches = []
+    for batch in compactor._get_batches(range(5)):
+        batches.append(batch)
+        StopCondition.value = 1
+    assert batches == [[0, 1]]
@@ -0,0 +1,54 @@
+import gc
+
+import pytest
+
+from helperFunctions.priority import AnalysisPriority
+from storage.db_interface_task_journal import TaskJournal
+from storage.MongoMgr import MongoMgr
+from test.common_helper import create_test_file_object, get_config_for_testing
+
+CONFIG = get_config_for_testing()
+
+
+@pytest.fixture(scope='module')
+def mongo_server():
+    server = MongoMgr(config=CONFIG)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(scope='function')
+def journal(mongo_server):
+    task_journal = TaskJournal(config=CONFIG)
+    yield task_journal
+    task_journal.task_journal.drop()
+    task_journal.shutdown()
+    gc.collect()
+
+
+def test_journal_is_written_in_batches(journal):
+    fo = create_test_file_object()
+    journal.add_tasks(fo, ['foo', 'bar'])
+    journal.flush()
+    assert journal.get_pending_tasks() == []
+
+    journal.flush(force=True)
+    assert journal.get_pending_tasks() == [{'_id': fo.uid, 'pending_plugins': ['foo', 'bar'], 'priority': AnalysisPriority.UPLOAD, 'root_uid': None}]
+
+
+def test_finish_tasks(journal):
+    fo = create_test_file_object()
+    fo.priority = AnalysisPriority.BULK
+    journal.add_tasks(fo, ['foo', 'bar'])
+    fo.priority = AnalysisPriority.INTERACTIVE
+    journal.add_tasks(fo, ['bar', 'other'])
+    journal.finish_task(fo.uid, 'foo')
+    journal.flush(force=True)
+
+    entry = journal.get_pending_tasks()[0]
+    assert entry['pending_plugins'] == ['bar', 'other']
+    assert entry['priority'] == AnalysisPriority.INTERACTIVE
+
+    journal.finish_object(fo.uid)
+    journal.flush(force=True)
+    assert journal.get_pending_tasks() == []
@@ -3,7 +3,7 @@ import gc
 import os
 import unittest
 from configparser import ConfigParser
-from time import sleep
+from time import sleep, time
 
 from analysis.PluginBase import AnalysisBasePlugin
 from helperFunctions.fileSystem import get_src_dir
@@ -63,6 +63,150 @@ class TestPluginBaseCore(TestPluginBase):
         self.assertTrue(child_object.uid in root_object.files_included, 'child object not in processed file')
 
 
+class PidPlugin(AnalysisBasePlugin):
+    NAME = 'base'
+
+    def process_object(self, file_object):
+        if file_object.binary == b'raise exception':
+            raise RuntimeError('analysis failed')
+        file_object.processed_analysis[self.NAME]['pid'] = os.getpid()
+        return file_object
+
+
+class IsolatedPidPlugin(PidPlugin):
+    FULL_ISOLATION = True
+
+
+class BatchPidPlugin(PidPlugin):
+    BATCH_SIZE = 3
+    BATCH_TIMEOUT = 2
+
+    def process_batch(self, file_objects):
+        for file_object in file_objects:
+            file_object.processed_analysis[self.NAME]['batch_size'] = len(file_objects)
+        return super().process_batch(file_objects)
+
+
+class WorkerExceptionPlugin(PidPlugin):
+    def worker_processing_in_job_process(self, worker_id, next_task):
+        if next_task.binary == b'raise worker exception':
+            raise RuntimeError('worker failed')
+        super().worker_processing_in_job_process(worker_id, next_task)
+
+
+class TestPluginBaseJobProcess(TestPluginBase):
+
+    def setUp(self):
+        self.base_plugin = PidPlugin(self, self.set_up_base_config(), no_multithread=True)
+
+    def _analyze(self, binary):
+        self.base_plugin.in_queue.put(FileObject(binary=binary))
+        return self.base_plugin.out_queue.get(timeout=10)
+
+    def test_job_process_is_reused(self):
+        first_result, second_result = self._analyze(b'first'), self._analyze(b'second')
+        assert first_result.processed_analysis['base']['pid'] == second_result.processed_analysis['base']['pid']
+        assert second_result.binary == b'second'
+        assert 'analysis_date' in second_result.processed_analysis['base']
+        metrics = self.base_plugin.metrics.get_summary()
+        assert metrics['jobs'] == 2
+        assert metrics['input_size'] == len(b'first') + len(b'second')
+        assert metrics['peak_rss'] > 0
+
+    def test_job_process_is_respawned_after_exception(self):
+        first_result = self._analyze(b'first')
+        failed_result = self._analyze(b'raise exception')
+        assert failed_result.analysis_exception == ('base', 'Exception occurred during analysis')
+        assert self.base_plugin.metrics.get_summary()['exceptions'] == 1
+        last_result = self._analyze(b'last')
+        assert last_result.analysis_exception is None
+        assert first_result.processed_analysis['base']['pid'] != last_result.processed_analysis['base']['pid']
+
+    def test_task_is_returned_after_worker_exception(self):
+        self.base_plugin.shutdown()
+        config = self.set_up_base_config()
+        config.set('ExpertSettings', 'throw_exceptions', 'false')
+        self.base_plugin = WorkerExceptionPlugin(self, config, no_multithread=True)
+        failed_result = self._analyze(b'raise worker exception')
+        assert failed_result.analysis_exception == ('base', 'Worker exception occurred during analysis')
+        self.base_plugin.workers[0].join(timeout=5)
+        assert not self.base_plugin.check_exceptions()
+        assert self._analyze(b'next').analysis_exception is None
+
+    def test_full_isolation(self):
+        self.base_plugin.shutdown()
+        self.base_plugin = IsolatedPidPlugin(self, self.set_up_base_config(), no_multithread=True)
+        first_result, second_result = self._analyze(b'first'), self._analyze(b'second')
+        assert first_result.processed_analysis['base']['pid'] != second_result.processed_analysis['base']['pid']
+        assert self.base_plugin.metrics.get_summary()['jobs'] == 2
+
+    def _analyze_batch(self, binaries):
+        self.base_plugin.shutdown()
+        self.base_plugin = BatchPidPlugin(self, self.set_up_base_config(), no_multithread=True)
+        for binary in binaries:
+            self.base_plugin.in_queue.put(FileObject(binary=binary))
+        return {result.binary: result for result in [self.base_plugin.out_queue.get(timeout=10) for _ in binaries]}
+
+    def test_batch_processing(self):
+        results = self._analyze_batch([b'first', b'second', b'third'])
+        assert all(result.processed_analysis['base']['batch_size'] == 3 for result in results.values())
+        assert len({result.processed_analysis['base']['pid'] for result in results.values()}) == 1
+        assert all('analysis_date' in result.processed_analysis['base'] for result in results.values())
+
+    def test_batch_processing_exception(self):
+        results = self._analyze_batch([b'first', b'raise exception', b'third'])
+        assert results[b'raise exception'].analysis_exception == ('base', 'Exception occurred during analysis')
+        assert results[b'first'].analysis_exception is None
+        assert 'pid' in results[b'third'].processed_analysis['base']
+        metrics = self.base_plugin.metrics.get_summary()
+        assert metrics['failed_batches'] == 1
+        assert metrics['jobs'] == 3
+        assert metrics['exceptions'] == 1
+
+
+class TestPluginBaseScaling(TestPluginBase):
+
+    def setUp(self):
+        config = self.set_up_base_config()
+        config.set('base', 'max_threads', '3')
+        self.base_plugin = PidPlugin(self, config)
+
+    def _wait_for_worker_count(self, worker_count, timeout=5):
+        start = time()
+        while len([process for process in self.base_plugin.workers if process.is_alive()]) != worker_count and time() - start < timeout:
+            sleep(0.1)
+        return len([process for process in self.base_plugin.workers if process.is_alive()])
+
+    def test_scale_workers(self):
+        assert self.base_plugin.thread_count == 2
+        assert len(self.base_plugin.active) == 3
+
+        assert self.base_plugin.scale_workers(5) == 3
+        assert self._wait_for_worker_count(3) == 3
+
+        assert self.base_plugin.scale_workers(1) == 2
+        assert self._wait_for_worker_count(2) == 2
+        self.base_plugin.scale_workers(2)
+        assert len(self.base_plugin.workers) == 2
+        assert {process.name for process in self.base_plugin.workers} == {'Analysis-Worker-0', 'Analysis-Worker-1'}
+
+        self.base_plugin.in_queue.put(FileObject(binary=b'foo'))
+        assert 'pid' in self.base_plugin.out_queue.get(timeout=10).processed_analysis['base']
+
+    def test_queued_jobs_are_processed_after_scaling_down(self):
+        self.base_plugin.shutdown()
+        config = self.set_up_base_config()
+        config.set('base', 'min_threads', '0')
+        self.base_plugin = PidPlugin(self, config)
+        assert self.base_plugin.scale_workers(0) == 1
+        binaries = [str(index).encode() for index in range(5)]
+        for binary in binaries:
+            self.base_plugin.in_queue.put(FileObject(binary=binary))
+        results = [self.base_plugin.out_queue.get(timeout=10) for _ in binaries]
+        assert sorted(result.binary for result in results) == binaries
+        assert all(result.analysis_exception is None for result in results)
+
+
 class TestPluginBaseAddJob(TestPluginBase):
 
     def test_analysis_depth_not_reached_yet(self):
@@ -140,6 +284,12 @@ class TestPluginNotRunning(TestPluginBase):
         self.p_base.shutdown()
 
 
+class SlowDummyPlugin(DummyPlugin):
+    def process_object(self, file_object):
+        sleep(1)  # the persistent job process would otherwise be able to answer right away
+        return super().process_object(file_object)
+
+
 class TestPluginTimeout(TestPluginBase):
 
     def setUp(self):
@@ -150,7 +300,7 @@ class TestPluginTimeout(TestPluginBase):
         pass
 
     def test_timeout(self):
-        self.p_base = DummyPlugin(self, self.config, timeout=0)
+        self.p_base = SlowDummyPlugin(self, self.config, timeout=0)
         fo_in = FileObject(binary='test', scheduled_analysis=[])
         self.p_base.add_job(fo_in)
         fo_out = self.p_base.out_queue.get(timeout=5)
@@ -0,0 +1,50 @@
+from analysis.plugin_metrics import PluginMetrics, get_resource_usage
+
+
+def test_add_job():
+    metrics = PluginMetrics()
+    metrics.add_job(wall_time=0.5, cpu_time=0.25, peak_rss=1000, input_size=2 ** 20)
+    metrics.add_job(wall_time=0.005, cpu_time=0.0, peak_rss=500, input_size=None, error='Exception')
+    metrics.add_job(wall_time=1000, cpu_time=0.0, peak_rss=2000, input_size=2 ** 20, error='Timeout')
+    summary = metrics.get_summary()
+
+    assert summary['jobs'] == 3
+    assert summary['wall_time'] == 1000.505
+    assert summary['cpu_time'] == 0.25
+    assert summary['input_size'] == 2 ** 21
+    assert summary['peak_rss'] == 2000
+    assert summary['timeouts'] == 1
+    assert summary['exceptions'] == 1
+    assert summary['time_per_mb'] == 1000.505 / 2
+
+
+def test_add_failed_batch():
+    metrics = PluginMetrics()
+    metrics.add_failed_batch(wall_time=2.5)
+    summary = metrics.get_summary()
+
+    assert summary['failed_batches'] == 1
+    assert summary['wall_time'] == 2.5
+    assert summary['jobs'] == 0
+
+
+def test_histogram():
+    metrics = PluginMetrics()
+    for wall_time in [0.001, 0.05, 0.07, 5, 500]:
+        metrics.add_job(wall_time=wall_time, cpu_time=0.0, peak_rss=0, input_size=0)
+    histogram = metrics.get_summary()['histogram']
+
+    assert histogram == [['<10ms', 1], ['<100ms', 2], ['<1s', 0], ['<10s', 1], ['<1min', 0], ['<5min', 0], ['>5min', 1]]
+    assert not any('.' in bucket for bucket, _ in histogram), 'buckets are stored in the database'
+
+
+def test_get_resource_usage():
+    cpu_time, peak_rss = get_resource_usage()
+    assert cpu_time > 0
+    assert peak_rss > 2 ** 20
+
+
+def test_get_resource_usage_of_children_only():
+    own_cpu_time, _ = get_resource_usage()
+    children_cpu_time, _ = get_resource_usage(children_only=True)
+    assert 0 <= children_cpu_time < own_cpu_time
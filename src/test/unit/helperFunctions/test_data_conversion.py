@@ -3,7 +3,7 @@ from datetime import datetime
 import pytest
 
 from helperFunctions.dataConversion import (
-    _fill_in_time_gaps, build_time_dict, convert_compare_id_to_list, convert_time_to_str, get_value_of_first_key,
+    _fill_in_time_gaps, build_time_dict, convert_compare_id_to_list, convert_time_to_str, exceeds_size_limit, get_value_of_first_key,
     list_of_sets_to_list_of_lists, make_bytes, make_list_from_dict, make_unicode_string, none_to_none,
     normalize_compare_id, remove_subsets_from_list_of_sets
 )
@@ -119,3 +119,14 @@ def test_none_to_none(input_data, expected):
 ])
 def test_convert_time_to_str(input_data, expected):
     assert convert_time_to_str(input_data) == expected
+
+
+@pytest.mark.parametrize('input_data, limit, expected', [
+    ({'result': 0}, 32, False),
+    ({'result': 10000000000, 'misc': 'Bananarama', 'summary': []}, 32, True),
+    ({'strings': ['a' * 10] * 10}, 99, True),
+    ({'strings': ['a' * 10] * 10}, 107, False),
+    ([b'\x00' * 100, (1, 2)], 100, True),
+])
+def test_exceeds_size_limit(input_data, limit, expected):
+    assert exceeds_size_limit(input_data, limit) is expected
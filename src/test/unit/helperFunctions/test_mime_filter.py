@@ -0,0 +1,29 @@
+import pytest
+
+from helperFunctions.mime_filter import MimeFilter
+
+
+@pytest.mark.parametrize('blacklist, whitelist, mime, expected_result', [
+    ([], [], 'application/x-executable', False),
+    (['audio/', 'image/'], [], 'image/png', True),
+    (['audio/', 'image/'], [], 'application/x-executable', False),
+    ([], ['application/x-executable'], 'application/x-executable', False),
+    ([], ['application/x-executable'], 'text/plain', True),
+    (['text/plain'], ['text/plain'], 'text/plain', False),  # whitelist precedes blacklist
+    (['application/x-7z-compressed'], [], 'application/x-7z-compressed', True),
+    (['a.b'], [], 'axb', False),  # no regex semantics
+])
+def test_is_blacklisted(blacklist, whitelist, mime, expected_result):
+    assert MimeFilter(blacklist, whitelist).is_blacklisted(mime) is expected_result
+
+
+def test_decisions_are_memoized():
+    mime_filter = MimeFilter(['image/'], [])
+    assert mime_filter.is_blacklisted('image/png') is True
+    mime_filter._pattern = None  # pylint: disable=protected-access
+    assert mime_filter.is_blacklisted('image/png') is True
+
+
+def test_empty_filter():
+    assert MimeFilter([], []).empty is True
+    assert MimeFilter(['foo'], []).empty is False
@@ -0,0 +1,48 @@
+from queue import Empty
+
+import pytest
+
+from helperFunctions.priority import FairQueue
+
+
+def test_fair_queue_fifo_within_flow():
+    queue = FairQueue()
+    for item in range(3):
+        queue.put(item, 'flow')
+    assert len(queue) == 3
+    assert [queue.get() for _ in range(3)] == [0, 1, 2]
+    assert len(queue) == 0
+
+
+def test_fair_queue_empty():
+    with pytest.raises(Empty):
+        FairQueue().get()
+
+
+def test_fair_queue_round_robin():
+    queue = FairQueue()
+    for item in range(4):
+        queue.put('a{}'.format(item), 'flow_a')
+    queue.put('b0', 'flow_b')
+    queue.put('b1', 'flow_b')
+    assert [queue.get() for _ in range(6)] == ['a0', 'b0', 'a1', 'b1', 'a2', 'a3']
+
+
+def test_fair_queue_weights():
+    queue = FairQueue()
+    for item in range(20):
+        queue.put('bulk', 'bulk_flow', weight=1)
+        queue.put('upload', 'upload_flow', weight=4)
+    first_items = [queue.get() for _ in range(10)]
+    assert first_items.count('upload') == 8
+    assert first_items.count('bulk') == 2
+
+
+def test_fair_queue_new_flow_is_not_starved():
+    queue = FairQueue()
+    for _ in range(100):
+        queue.put('big', 'big_flow')
+    for _ in range(50):
+        queue.get()
+    queue.put('small', 'small_flow')
+    assert 'small' in [queue.get(), queue.get()]
@@ -1,10 +1,13 @@
 import logging
+from multiprocessing import Queue
 from multiprocessing import TimeoutError as MultiprocessingTimeoutError
 from time import sleep
 
 import pytest
 
-from helperFunctions.process import ExceptionSafeProcess, check_worker_exceptions, new_worker_was_started, timeout
+from helperFunctions.process import (
+    ExceptionSafeProcess, check_worker_exceptions, get_ready_queues, new_worker_was_started, timeout
+)
 from test.common_helper import get_config_for_testing
 
 
@@ -79,3 +82,16 @@ def test_new_worker_was_started():
 
     assert new_worker_was_started(old, new)
     assert not new_worker_was_started(old, old)
+
+
+def test_get_ready_queues():
+    empty_queue, filled_queue = Queue(), Queue()
+    assert get_ready_queues([empty_queue, filled_queue], timeout=0.1) == []
+
+    filled_queue.put('foo')
+    ready_queues = get_ready_queues([empty_queue, filled_queue], timeout=5)
+    assert ready_queues == [filled_queue]
+    assert ready_queues[0].get_nowait() == 'foo'
+
+    empty_queue.close()
+    filled_queue.close()
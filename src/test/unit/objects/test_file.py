@@ -1,4 +1,5 @@
 import logging
+import pickle
 
 from common_helper_files import get_binary_from_file
 
@@ -100,3 +101,23 @@ class TestObjectsFile:  # pylint: disable=no-self-use
         with caplog.at_level(logging.INFO):
             fo.get_uid()
             assert 'Deprecation warning' in caplog.messages[0]
+
+    def test_binary_is_loaded_lazily(self):
+        file_path = '{}/test_data_file.bin'.format(get_test_data_dir())
+        test_object = FileObject()
+        test_object.uid = 'known_uid'
+        test_object.set_file_path(file_path)
+        assert test_object._binary is None  # pylint: disable=protected-access
+        assert test_object.binary == b'test string in file'
+
+    def test_binary_is_not_pickled_if_file_exists(self):
+        test_object = FileObject(file_path='{}/test_data_file.bin'.format(get_test_data_dir()))
+        assert 'test string in file' not in str(pickle.dumps(test_object))
+        unpickled_object = pickle.loads(pickle.dumps(test_object))
+        assert unpickled_object._binary is None  # pylint: disable=protected-access
+        assert unpickled_object.binary == b'test string in file'
+        assert unpickled_object.uid == test_object.uid
+
+    def test_binary_is_pickled_without_file(self):
+        test_object = FileObject(binary=b'no file')
+        assert pickle.loads(pickle.dumps(test_object)).binary == b'no file'
@@ -83,3 +83,12 @@ def test_repr_and_str():
     assert 'None None v. None' in test_fw.__str__()
     assert 'test' in test_fw.__str__()
     assert test_fw.__str__() == test_fw.__repr__()
+
+
+def test_set_file_path_of_known_firmware():
+    test_object = Firmware()
+    test_object.uid = 'known_uid'
+    test_object.set_file_path('{}/test_data_file.bin'.format(get_test_data_dir()))
+    assert test_object.root_uid == 'known_uid'
+    assert test_object.virtual_file_path == {'known_uid': ['known_uid']}
+    assert test_object.binary == b'test string in file'
@@ -6,13 +6,35 @@ from unittest import TestCase, mock
 
 import pytest
 
+from helperFunctions.priority import AnalysisPriority
 from objects.file import FileObject
 from objects.firmware import Firmware
-from scheduler.Analysis import MANDATORY_PLUGINS, AnalysisScheduler
+from scheduler.Analysis import MANDATORY_PLUGINS, QUEUED_JOBS_PER_WORKER, AnalysisScheduler
 from test.common_helper import DatabaseMock, MockFileObject, fake_exit, get_config_for_testing, get_test_data_dir
 from test.mock import mock_patch, mock_spy
 
 
+class StatusMock:
+    @staticmethod
+    def add_object(fw_object):
+        pass
+
+    @staticmethod
+    def remove_object(fw_object):
+        pass
+
+
+class ResultCacheMock:
+    def __init__(self, keys):
+        self.keys = keys
+
+    def get_keys(self, uid):
+        return self.keys.get(uid, set())
+
+    def add_keys(self, uid, keys):
+        self.keys.setdefault(uid, set()).update(keys)
+
+
 class AnalysisSchedulerTest(TestCase):
 
     def setUp(self):
@@ -38,7 +60,7 @@ class AnalysisSchedulerTest(TestCase):
         self.mocked_interface.shutdown()
         gc.collect()
 
-    def dummy_callback(self, fw):
+    def dummy_callback(self, fw, *_):
         self.tmp_queue.put(fw)
 
 
@@ -105,6 +127,7 @@ class TestScheduleInitialAnalysis(AnalysisSchedulerTest):
 
     def test_skip_analysis_because_whitelist(self):
         self.sched.config.set('dummy_plugin_for_testing_only', 'mime_whitelist', 'foo, bar')
+        self.sched.mime_filters['dummy_plugin_for_testing_only'] = self.sched._create_mime_filter('dummy_plugin_for_testing_only')
         test_fw = Firmware(file_path=os.path.join(get_test_data_dir(), 'get_files_test/testfile1'))
         test_fw.scheduled_analysis = ['file_hashes']
         test_fw.processed_analysis['file_type'] = {'mime': 'text/plain'}
@@ -138,8 +161,9 @@ class TestAnalysisSchedulerBlacklist:
         cls.plugin_list = ['no_deps', 'foo', 'bar']
         cls.init_patch.stop()
 
-    def setup(self):
+    def setup_method(self):
         self.sched.config = get_config_for_testing()
+        self.sched.mime_filters = {}
 
     def test_get_blacklist_and_whitelist_from_plugin(self):
         self.sched.analysis_plugins['test_plugin'] = self.PluginMock(['foo'], ['bar'])
@@ -201,19 +225,35 @@ class TestAnalysisSchedulerBlacklist:
         assert blacklisted is False
 
         self.sched.analysis_plugins[self.test_plugin] = self.PluginMock(blacklist=[], whitelist=['some_other_type'])
+        self.sched.mime_filters.pop(self.test_plugin)
         self.file_object.processed_analysis['file_type']['mime'] = 'test_type'
         blacklisted = self.sched._next_analysis_is_blacklisted(self.test_plugin, self.file_object)
         assert blacklisted is True
 
-    def test_get_blacklist_file_type_from_database(self):
-        def add_file_type_mock(_, fo):
-            fo.processed_analysis['file_type'] = {'mime': 'foo_type'}
+    def test_mime_filter_is_created_once(self):
+        self.sched.analysis_plugins[self.test_plugin] = self.PluginMock(blacklist=['blacklisted_type'])
+        self.file_object.processed_analysis['file_type']['mime'] = 'blacklisted_type'
+        created_filters = []
+        create_mime_filter = self.sched._create_mime_filter
+
+        def create_mime_filter_spy(plugin):
+            created_filters.append(plugin)
+            return create_mime_filter(plugin)
 
-        file_object = MockFileObject()
-        file_object.processed_analysis.pop('file_type')
-        with mock_patch(self.sched, '_add_completed_analysis_results_to_file_object', add_file_type_mock):
-            result = self.sched._get_file_type_from_object_or_db(file_object)
-            assert result == 'foo_type'
+        with mock_patch(self.sched, '_create_mime_filter', create_mime_filter_spy):
+            assert self.sched._next_analysis_is_blacklisted(self.test_plugin, self.file_object) is True
+            assert self.sched._next_analysis_is_blacklisted(self.test_plugin, self.file_object) is True
+        assert created_filters == [self.test_plugin]
+
+    def test_get_file_type_from_analysis_version_entry(self):
+        file_object = FileObject(binary=b'foo')
+        self.sched.analysis_version_cache = {file_object.uid: {'file_type': {'plugin_version': '1.0', 'mime': 'Foo_Type'}}}
+        assert self.sched._get_file_type(file_object) == 'foo_type'
+
+    def test_get_file_type_unknown(self):
+        file_object = FileObject(binary=b'foo')
+        self.sched.analysis_version_cache = {file_object.uid: {'file_type': None}}
+        assert self.sched._get_file_type(file_object) == ''
 
     def _add_test_plugin_to_config(self):
         self.sched.config.add_section('test_plugin')
@@ -223,6 +263,8 @@ class TestAnalysisSchedulerBlacklist:
 class TestUtilityFunctions:
 
     class PluginMock:
+        VERSION = '1.0'
+
         def __init__(self, dependencies):
             self.DEPENDENCIES = dependencies
 
@@ -273,23 +315,73 @@ class TestUtilityFunctions:
         result = self.scheduler._add_dependencies_recursively(input_data)
         assert set(result) == expected_output
 
-    @pytest.mark.parametrize('remaining, scheduled, expected_output', [
-        ({}, [], []),
-        ({'no_deps', 'foo', 'bar'}, [], ['no_deps']),
-        ({'foo', 'bar'}, ['no_deps'], ['foo']),
-        ({'bar'}, ['no_deps', 'foo'], ['bar']),
+    @pytest.mark.parametrize('remaining, running, expected_output', [
+        ([], set(), []),
+        (['no_deps', 'foo', 'bar'], set(), ['no_deps']),
+        (['foo', 'bar'], set(), ['foo']),
+        (['foo', 'bar'], {'no_deps'}, []),
+        (['bar'], set(), ['bar']),
+        (['bar'], {'foo'}, []),
     ])
-    def test_get_plugins_with_met_dependencies(self, remaining, scheduled, expected_output):
+    def test_get_plugins_with_met_dependencies(self, remaining, running, expected_output):
         self._add_plugins()
-        assert self.scheduler._get_plugins_with_met_dependencies(remaining, scheduled) == expected_output
+        assert self.scheduler._get_plugins_with_met_dependencies(remaining, running) == expected_output
 
-    @pytest.mark.parametrize('remaining, scheduled, expected_output', [
-        ({'bar'}, ['no_deps', 'foo'], {'bar'}),
-        ({'foo', 'bar'}, ['no_deps', 'foo'], {'foo', 'bar'}),
-    ])
-    def test_get_plugins_with_met_dependencies__completed_analyses(self, remaining, scheduled, expected_output):
+    def test_get_plugins_with_met_dependencies__independent_plugins(self):
+        self._add_plugins()
+        self.scheduler.analysis_plugins['other'] = self.PluginMock(dependencies=[])
+        assert self.scheduler._get_plugins_with_met_dependencies(['other', 'no_deps', 'foo'], set()) == ['other', 'no_deps']
+
+    def test_get_plugins_with_met_dependencies__file_type_first(self):
+        self._add_plugins()
+        self.scheduler.analysis_plugins['file_type'] = self.PluginMock(dependencies=[])
+        assert self.scheduler._get_plugins_with_met_dependencies(['no_deps', 'file_type'], set()) == ['file_type']
+        assert self.scheduler._get_plugins_with_met_dependencies(['no_deps'], {'file_type'}) == []
+
+    def test_create_analysis_task(self):
+        self._add_plugins()
+        fo = FileObject(binary=b'foo')
+        fo.scheduled_analysis = ['foo']
+        fo.processed_analysis['no_deps'] = {}
+        fo.analysis_tags['no_deps'] = {'tag': {}}
+        task = self.scheduler._create_analysis_task(fo, 'bar')
+        task.processed_analysis['foo'] = {}
+        assert task.uid == fo.uid
+        assert task.scheduled_analysis == []
+        assert task.analysis_tags == {}
+        assert 'foo' not in fo.processed_analysis
+
+    def test_create_analysis_task_only_contains_required_analyses(self):
         self._add_plugins()
-        assert set(self.scheduler._get_plugins_with_met_dependencies(remaining, scheduled)) == expected_output
+        self.scheduler.analysis_plugins['foo'].REQUIRED_ANALYSES = ['other']
+        fo = FileObject(binary=b'foo')
+        fo.processed_analysis = {'file_type': {'mime': 'foo'}, 'no_deps': {}, 'bar': {}, 'other': {}, 'unrelated': {}}
+        assert set(self.scheduler._create_analysis_task(fo, 'foo').processed_analysis) == {'file_type', 'no_deps', 'other'}
+        assert set(self.scheduler._create_analysis_task(fo, 'no_deps').processed_analysis) == {'file_type'}
+
+    def test_skipped_analysis_is_loaded_for_required_analyses(self):
+        self._add_plugins()
+        self.scheduler.analysis_plugins['foo'].REQUIRED_ANALYSES = ['other']
+        self.scheduler.result_cache = None
+        self.scheduler._analysis_is_already_in_db_and_up_to_date = lambda *_: True
+        loaded = []
+        self.scheduler._add_completed_analysis_results_to_file_object = lambda plugin, _: loaded.append(plugin)
+        fo = FileObject(binary=b'foo')
+        fo.scheduled_analysis = ['foo']
+        assert self.scheduler._start_or_skip_analysis('other', fo) is False
+        assert self.scheduler._start_or_skip_analysis('unrelated', fo) is False
+        assert loaded == ['other']
+
+    def test_payload_size_is_sampled_on_dispatch(self):
+        self._prepare_dispatch(started_plugins=[])
+        self.scheduler.analysis_plugins['no_deps'].thread_count = 1
+        self.scheduler.analysis_plugins['no_deps'].add_job = lambda task: None
+        fo = FileObject(binary=b'foo')
+        fo.processed_analysis['file_type'] = {'mime': 'x' * 1000}
+        self.scheduler._add_job_to_queue('no_deps', self.scheduler._create_analysis_task(fo, 'no_deps'))
+        self.scheduler._dispatch_queued_jobs('no_deps')
+        assert self.scheduler.dispatched_jobs['no_deps'] == 1
+        assert self.scheduler.payload_sizes['no_deps'].value > 1000
 
     def test_reschedule_failed_analysis_task(self):
         task = Firmware(binary='foo')
@@ -307,57 +399,273 @@ class TestUtilityFunctions:
         assert task.processed_analysis['bar'] == {'failed': 'Analysis of dependency foo failed'}
         assert 'no_deps' in task.scheduled_analysis
 
-    def test_smart_shuffle(self):
+    def _prepare_dispatch(self, started_plugins):
         self._add_plugins()
-        result = self.scheduler._smart_shuffle(self.plugin_list)
-        assert result == ['bar', 'foo', 'no_deps']
+        self.scheduler.analyses_in_progress, self.scheduler.running_analyses, self.scheduler.analysis_version_cache = {}, {}, {}
+        self.scheduler.job_queues, self.scheduler.jobs_in_flight, self.scheduler.pending_jobs = {}, {}, {}
+        self.scheduler.dispatched_jobs, self.scheduler.payload_sizes = {}, {}
+        self.scheduler._setup_job_queues()
+        self.scheduler.task_journal = None
+        self.scheduler.result_cache = None
+        self.scheduler.buffer_analysis_results, self.scheduler.unflushed_cache_keys = False, []
+        self.scheduler.status = StatusMock()
+        self.scheduler.pre_analysis = lambda _: None
+        self.scheduler.post_analysis = lambda *_: None
+        self.scheduler._get_analysis_versions_from_db = lambda _, plugin_list: {}
+
+        def start_or_skip_mock(plugin, _):
+            started_plugins.append(plugin)
+            return True
+
+        return mock_patch(self.scheduler, '_start_or_skip_analysis', start_or_skip_mock)
+
+    def test_start_ready_analyses(self):
+        started_plugins = []
+        fo = FileObject(binary=b'foo')
+        fo.scheduled_analysis = ['bar', 'foo', 'no_deps']
+        with self._prepare_dispatch(started_plugins):
+            self.scheduler.process_next_analysis(fo)
+            assert started_plugins == ['no_deps']
+            assert self.scheduler.running_analyses[fo.uid] == {'no_deps'}
+
+            self.scheduler._merge_analysis_result('no_deps', self._get_result(fo, 'no_deps'))
+            assert started_plugins == ['no_deps', 'foo']
+            assert 'no_deps' in self.scheduler.analyses_in_progress[fo.uid].processed_analysis
+
+            self.scheduler._merge_analysis_result('foo', self._get_result(fo, 'foo'))
+            self.scheduler._merge_analysis_result('bar', self._get_result(fo, 'bar'))
+        assert started_plugins == ['no_deps', 'foo', 'bar']
+        assert fo.uid not in self.scheduler.analyses_in_progress
+        assert set(fo.processed_analysis) == {'no_deps', 'foo', 'bar'}
+
+    def test_start_ready_analyses__impossible_dependency(self):
+        started_plugins = []
+        fo = FileObject(binary=b'foo')
+        fo.scheduled_analysis = ['impossible', 'no_deps']
+        with self._prepare_dispatch(started_plugins):
+            self.scheduler.analysis_plugins['impossible'] = self.PluginMock(dependencies=['impossible'])
+            self.scheduler.process_next_analysis(fo)
+            self.scheduler._merge_analysis_result('no_deps', self._get_result(fo, 'no_deps'))
+        assert started_plugins == ['no_deps']
+        assert fo.uid not in self.scheduler.analyses_in_progress
+
+    def test_shared_file_completes_every_firmware(self):
+        completed = []
+        first, second = FileObject(binary=b'foo'), FileObject(binary=b'foo')
+        for fo, root_uid in [(first, 'fw_1'), (second, 'fw_2')]:
+            fo.scheduled_analysis = ['no_deps']
+            fo.parent_firmware_uids = {root_uid}
+            fo.virtual_file_path = {root_uid: ['{}|/bin/busybox'.format(root_uid)]}
+        with self._prepare_dispatch([]):
+            self.scheduler.status.remove_object = lambda fo: completed.append(sorted(fo.parent_firmware_uids))
+            self.scheduler.process_next_analysis(first)
+            self.scheduler.process_next_analysis(second)
+            self.scheduler._merge_analysis_result('no_deps', self._get_result(first, 'no_deps'))
+        assert completed == [['fw_1', 'fw_2']]
+        assert set(first.virtual_file_path) == {'fw_1', 'fw_2'}
+
+    def test_task_journal_updates(self):
+        class JournalMock:
+            def __init__(self):
+                self.log = []
+
+            def add_tasks(self, file_object, plugins):
+                self.log.append(('add', file_object.uid, sorted(plugins)))
+
+            def finish_task(self, uid, plugin):
+                self.log.append(('finish', uid, plugin))
+
+            def finish_object(self, uid):
+                self.log.append(('done', uid))
 
-    def test_smart_shuffle__impossible_dependency(self):
-        self._add_plugins()
-        self.scheduler.analysis_plugins['impossible'] = self.PluginMock(dependencies=['impossible to meet'])
-        result = self.scheduler._smart_shuffle(self.plugin_list + ['impossible'])
-        assert 'impossible' not in result
-        assert result == ['bar', 'foo', 'no_deps']
+        fo = FileObject(binary=b'foo')
+        fo.scheduled_analysis = ['foo', 'no_deps']
+        with self._prepare_dispatch([]):
+            self.scheduler.task_journal = JournalMock()
+            self.scheduler.process_next_analysis(fo)
+            self.scheduler._merge_analysis_result('no_deps', self._get_result(fo, 'no_deps'))
+            self.scheduler._merge_analysis_result('foo', self._get_result(fo, 'foo'))
+            assert self.scheduler.task_journal.log == [
+                ('add', fo.uid, ['foo', 'no_deps']), ('finish', fo.uid, 'no_deps'), ('finish', fo.uid, 'foo'), ('done', fo.uid)
+            ]
+
+    def test_queued_tasks_are_journaled(self):
+        class JournalMock:
+            def __init__(self):
+                self.log = []
+
+            def add_tasks(self, file_object, plugins):
+                self.log.append(('add', file_object.uid, sorted(plugins)))
+
+            def flush(self, force=False):
+                self.log.append(('flush', force))
+
+        class QueueMock:
+            def __init__(self):
+                self.queued = []
+
+            def put(self, item):
+                self.queued.append(item)
 
-    def test_smart_shuffle__circle_dependency(self):
-        self.scheduler.analysis_plugins = {
-            'p1': self.PluginMock(['p2']),
-            'p2': self.PluginMock(['p3']),
-            'p3': self.PluginMock(['p1']),
-        }
-        result = self.scheduler._smart_shuffle(['p1', 'p2', 'p3'])
-        assert result == []
-
-    def test_add_firmware_to_current_analyses(self):
-        self.scheduler.currently_running = {}
-        fw = Firmware(binary=b'foo')
-        fw.files_included = ['foo', 'bar']
-        self.scheduler._add_to_current_analyses(fw)
-        assert self.scheduler.currently_running == {fw.uid: ['foo', 'bar']}
-
-    def test_add_file_to_current_analyses(self):
-        self.scheduler.currently_running = {'parent_uid': ['foo', 'bar']}
         fo = FileObject(binary=b'foo')
-        fo.parent_firmware_uids = {'parent_uid'}
-        fo.files_included = ['bar', 'new']
-        self.scheduler._add_to_current_analyses(fo)
-        assert sorted(self.scheduler.currently_running['parent_uid']) == ['bar', 'foo', 'new']
+        fo.scheduled_analysis = ['foo', 'no_deps']
+        self.scheduler.task_journal, self.scheduler.process_queue = JournalMock(), QueueMock()
+        self.scheduler.check_further_process_or_complete(fo)
+        assert self.scheduler.process_queue.queued == [fo]
+        assert self.scheduler.task_journal.log == [('add', fo.uid, ['foo', 'no_deps']), ('flush', True)]
 
-    def test_remove_partial_from_current_analyses(self):
-        self.scheduler.currently_running = {'parent_uid': ['foo', 'bar']}
+    def test_analysis_results_are_cached(self):
+        self._add_plugins()
+        self.scheduler.result_cache = ResultCacheMock({'uid': {'no_deps|1.0|', 'foo|1.0|'}})
+        assert self.scheduler._analysis_results_are_cached('uid', ['foo'])
+        assert not self.scheduler._analysis_results_are_cached('uid', ['bar'])
+        assert not self.scheduler._analysis_results_are_cached('uid', ['foo'], mandatory=True)
+        assert not self.scheduler._analysis_results_are_cached('uid', ['unknown_plugin'])
+        assert not self.scheduler._analysis_results_are_cached('other_uid', ['foo'])
+        self.scheduler.analysis_plugins['foo'].VERSION = '1.1'
+        assert not self.scheduler._analysis_results_are_cached('uid', ['foo'])
+
+    def test_cached_object_is_not_scheduled(self):
+        fo = FileObject(binary=b'foo')
+        fo.scheduled_analysis = ['foo']
+        with self._prepare_dispatch([]):
+            stored_objects = []
+            self.scheduler.pre_analysis = stored_objects.append
+            self.scheduler.process_queue = Queue()
+            for plugin in MANDATORY_PLUGINS:
+                self.scheduler.analysis_plugins[plugin] = self.PluginMock(dependencies=[])
+            self.scheduler.result_cache = ResultCacheMock({fo.uid: {'no_deps|1.0|', 'foo|1.0|', 'file_type|1.0|', 'file_hashes|1.0|'}})
+            self.scheduler.start_analysis_of_object(fo)
+            assert stored_objects == [fo]
+            assert self.scheduler.process_queue.empty()
+
+    def test_results_are_added_to_cache(self):
         fo = FileObject(binary=b'foo')
-        fo.parent_firmware_uids = {'parent_uid'}
-        fo.uid = 'foo'
-        self.scheduler._remove_from_current_analyses(fo)
-        assert self.scheduler.currently_running == {'parent_uid': ['bar']}
+        fo.scheduled_analysis = ['foo', 'no_deps']
+        with self._prepare_dispatch([]):
+            self.scheduler.result_cache = ResultCacheMock({})
+            self.scheduler.process_next_analysis(fo)
+            self.scheduler._merge_analysis_result('no_deps', self._get_result(fo, 'no_deps'))
+            failed_result = self._get_result(fo, 'foo')
+            failed_result.analysis_exception = ('foo', 'Exception occurred during analysis')
+            self.scheduler._merge_analysis_result('foo', failed_result)
+            assert self.scheduler.result_cache.keys == {fo.uid: {'no_deps|1.0|'}}
+
+    def test_only_finished_plugins_are_stored(self):
+        stored_plugins = []
+        fo = FileObject(binary=b'foo')
+        fo.scheduled_analysis = ['bar', 'foo', 'no_deps']
+        with self._prepare_dispatch([]):
+            self.scheduler.post_analysis = lambda _, plugins: stored_plugins.append(plugins)
+            self.scheduler.process_next_analysis(fo)
+            self.scheduler._merge_analysis_result('no_deps', self._get_result(fo, 'no_deps'))
+            failed_result = self._get_result(fo, 'foo')
+            failed_result.analysis_exception = ('foo', 'Exception occurred during analysis')
+            self.scheduler._merge_analysis_result('foo', failed_result)
+        assert stored_plugins == [['no_deps'], ['foo', 'bar']]
+
+    def test_buffered_results_are_cached_after_flush(self):
+        class BufferingDbMock:
+            def __init__(self):
+                self.buffer, self.stored = [], []
+
+            def buffer_analysis(self, file_object, plugins):
+                self.buffer.append((file_object.uid, plugins))
+
+            def flush_analysis_buffer(self, force=False):
+                self.stored.extend(self.buffer)
+                self.buffer = []
+                return force
 
-    def test_remove_fully_from_current_analyses(self):
-        self.scheduler.currently_running = {'parent_uid': ['foo']}
         fo = FileObject(binary=b'foo')
-        fo.parent_firmware_uids = {'parent_uid'}
-        fo.uid = 'foo'
-        self.scheduler._remove_from_current_analyses(fo)
-        assert self.scheduler.currently_running == {}
+        fo.scheduled_analysis = ['no_deps']
+        with self._prepare_dispatch([]):
+            self.scheduler.db_backend_service = BufferingDbMock()
+            self.scheduler.post_analysis = self.scheduler._store_analysis_results
+            self.scheduler.buffer_analysis_results = True
+            self.scheduler.result_cache = ResultCacheMock({})
+            self.scheduler.process_next_analysis(fo)
+            self.scheduler._merge_analysis_result('no_deps', self._get_result(fo, 'no_deps'))
+            assert self.scheduler.db_backend_service.buffer == [(fo.uid, ['no_deps'])]
+            assert self.scheduler.result_cache.keys == {}
+
+            self.scheduler._flush_buffers(force=True)
+            assert self.scheduler.db_backend_service.stored == [(fo.uid, ['no_deps'])]
+            assert self.scheduler.result_cache.keys == {fo.uid: {'no_deps|1.0|'}}
+
+    def test_resume_analyses_from_journal(self):
+        class JournalMock:
+            def __init__(self):
+                self.finished = []
+
+            @staticmethod
+            def get_pending_tasks():
+                return [
+                    {'_id': 'existing', 'pending_plugins': ['foo', 'unknown'], 'priority': AnalysisPriority.BULK, 'root_uid': 'root'},
+                    {'_id': 'deleted', 'pending_plugins': ['foo'], 'priority': AnalysisPriority.UPLOAD, 'root_uid': None},
+                ]
+
+            def finish_object(self, uid):
+                self.finished.append(uid)
+
+            def flush(self, force=False):
+                pass
+
+        class DbMock:
+            @staticmethod
+            def get_object(uid):
+                return FileObject(binary=b'existing') if uid == 'existing' else None
+
+        scheduled = []
+        self._add_plugins()
+        self.scheduler.task_journal = JournalMock()
+        self.scheduler.db_backend_service = DbMock()
+        with mock_patch(self.scheduler, 'check_further_process_or_complete', scheduled.append):
+            self.scheduler.resume_analyses_from_journal()
+        assert len(scheduled) == 1
+        assert sorted(scheduled[0].scheduled_analysis) == ['foo', 'no_deps']
+        assert scheduled[0].priority == AnalysisPriority.BULK
+        assert scheduled[0].root_uid == 'root'
+        assert self.scheduler.task_journal.finished == ['deleted']
+
+    def test_fair_share_job_dispatch(self):
+        class JobCollector:
+            thread_count = 1
+
+            def __init__(self):
+                self.jobs = []
+
+            def add_job(self, task):
+                self.jobs.append(task)
+
+        plugin = JobCollector()
+        self.scheduler.analysis_plugins = {'plugin': plugin}
+        self.scheduler.job_queues, self.scheduler.jobs_in_flight, self.scheduler.pending_jobs = {}, {}, {}
+        self.scheduler.dispatched_jobs, self.scheduler.payload_sizes = {}, {}
+        self.scheduler._setup_job_queues()
+        self.scheduler.jobs_in_flight['plugin'] = QUEUED_JOBS_PER_WORKER
+
+        big_firmware_files = [FileObject(binary='big {}'.format(i).encode()) for i in range(5)]
+        for fo in big_firmware_files:
+            fo.root_uid = 'big_firmware'
+            self.scheduler._add_job_to_queue('plugin', fo)
+        single_file = FileObject(binary=b'single file')
+        single_file.priority = AnalysisPriority.INTERACTIVE
+        self.scheduler._add_job_to_queue('plugin', single_file)
+
+        assert plugin.jobs == []
+        assert self.scheduler.pending_jobs['plugin'][AnalysisPriority.UPLOAD].value == 5
+        assert self.scheduler.pending_jobs['plugin'][AnalysisPriority.INTERACTIVE].value == 1
+
+        self.scheduler.jobs_in_flight['plugin'] -= 2
+        self.scheduler._dispatch_queued_jobs('plugin')
+        assert plugin.jobs == [big_firmware_files[0], single_file]
+        assert self.scheduler.pending_jobs['plugin'][AnalysisPriority.INTERACTIVE].value == 0
+
+    def _get_result(self, fo, plugin):
+        result = self.scheduler._create_analysis_task(fo, plugin)
+        result.processed_analysis[plugin] = {'result': plugin}
+        return result
 
 
 class TestAnalysisSkipping:
@@ -372,8 +680,10 @@ class TestAnalysisSkipping:
     class BackendMock:
         def __init__(self, analysis_entry=None):
             self.analysis_entry = analysis_entry if analysis_entry else {}
+            self.query_count = 0
 
         def get_specific_fields_of_db_entry(self, *_):
+            self.query_count += 1
             return self.analysis_entry
 
         def retrieve_analysis(self, sanitized_dict, **_):  # pylint: disable=no-self-use
@@ -389,6 +699,9 @@ class TestAnalysisSkipping:
 
         cls.init_patch.stop()
 
+    def setup_method(self):
+        self.scheduler.analysis_version_cache = {}
+
     @pytest.mark.parametrize(
         'plugin_version, plugin_system_version, analysis_plugin_version, '
         'analysis_system_version, expected_output', [
@@ -422,3 +735,19 @@ class TestAnalysisSkipping:
         self.scheduler.db_backend_service = self.BackendMock(analysis_entry)
         self.scheduler.analysis_plugins['plugin'] = self.PluginMock(version='1.0', system_version='1.0')
         assert self.scheduler._analysis_is_already_in_db_and_up_to_date('plugin', '') is False
+
+    def test_analysis_versions_are_fetched_in_one_query(self):
+        analysis_entry = {'processed_analysis': {
+            'foo': {'plugin_version': '1.0', 'file_system_flag': False},
+            'bar': {'plugin_version': '0.1', 'file_system_flag': False},
+        }}
+        backend = self.BackendMock(analysis_entry)
+        self.scheduler.db_backend_service = backend
+        self.scheduler.analysis_plugins['foo'] = self.PluginMock(version='1.0', system_version=None)
+        self.scheduler.analysis_plugins['bar'] = self.PluginMock(version='1.0', system_version=None)
+        self.scheduler.analysis_version_cache['uid'] = self.scheduler._get_analysis_versions_from_db('uid', ['foo', 'bar', 'missing'])
+
+        assert self.scheduler._analysis_is_already_in_db_and_up_to_date('foo', 'uid') is True
+        assert self.scheduler._analysis_is_already_in_db_and_up_to_date('bar', 'uid') is False
+        assert self.scheduler._analysis_is_already_in_db_and_up_to_date('missing', 'uid') is False
+        assert backend.query_count == 1
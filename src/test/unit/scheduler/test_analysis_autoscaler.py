@@ -0,0 +1,83 @@
+# pylint: disable=protected-access,redefined-outer-name
+from collections import namedtuple
+from configparser import ConfigParser
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from helperFunctions.fileSystem import get_src_dir
+from scheduler.analysis_autoscaler import WorkerAutoscaler
+
+Counter = namedtuple('Counter', ['value'])
+MemoryUsage = namedtuple('MemoryUsage', ['percent'])
+
+
+class PluginMock:
+    def __init__(self, thread_count, active, min_threads=1, max_threads=4, configured_threads=None):
+        self.thread_count = thread_count
+        self.configured_threads = thread_count if configured_threads is None else configured_threads
+        self.active = [Counter(1)] * active + [Counter(0)] * (max_threads - active)
+        self.min_threads = min_threads
+        self.max_threads = max_threads
+
+    def scale_workers(self, worker_count):
+        self.thread_count = min(max(worker_count, self.min_threads), self.max_threads)
+        return self.thread_count
+
+
+@pytest.fixture
+def autoscaler():
+    with mock.patch('psutil.virtual_memory', lambda: MemoryUsage(50.0)):
+        yield WorkerAutoscaler(worker_limit=6, memory_limit=90.0)
+
+
+def test_scale_up_busy_plugin(autoscaler):
+    autoscaler.worker_limit = 10
+    plugins = {'busy': PluginMock(2, 2), 'idle_with_queue': PluginMock(2, 1), 'max_reached': PluginMock(4, 4)}
+    autoscaler.scale(plugins, {'busy': 100, 'idle_with_queue': 100, 'max_reached': 100})
+    assert [plugin.thread_count for plugin in plugins.values()] == [3, 2, 4]
+    assert autoscaler.get_decisions()[0]['plugin'] == 'busy'
+    assert autoscaler.get_decisions()[0]['workers'] == 3
+
+
+def test_scale_down_idle_plugin(autoscaler):
+    plugins = {'idle': PluginMock(3, 0), 'at_minimum': PluginMock(1, 0), 'busy': PluginMock(2, 2)}
+    autoscaler.scale(plugins, {'idle': 0, 'at_minimum': 0, 'busy': 0})
+    assert [plugin.thread_count for plugin in plugins.values()] == [2, 1, 2]
+
+
+def test_worker_limit(autoscaler):
+    plugins = {
+        'small_queue': PluginMock(4, 4, max_threads=8, configured_threads=1),
+        'big_queue': PluginMock(4, 4, max_threads=8, configured_threads=2),
+        'other': PluginMock(1, 1),
+    }
+    autoscaler.scale(plugins, {'small_queue': 10, 'big_queue': 1000, 'other': 0})
+    assert plugins['big_queue'].thread_count == 5
+    assert plugins['small_queue'].thread_count == 4
+    assert len(autoscaler.get_decisions()) == 1
+
+
+def test_worker_limit_with_shipped_config():
+    config = ConfigParser()
+    config.read(str(Path(get_src_dir()) / 'config' / 'main.cfg'))
+    plugins = {
+        name: PluginMock(section.getint('threads'), section.getint('threads'), min_threads=section.getint('threads'), max_threads=section.getint('max_threads', section.getint('threads')))
+        for name, section in config.items() if 'threads' in section
+    }
+    scalable_plugins = {name for name, plugin in plugins.items() if plugin.max_threads > plugin.thread_count}
+    assert scalable_plugins
+    with mock.patch('psutil.cpu_count', lambda: 4), mock.patch('psutil.virtual_memory', lambda: MemoryUsage(50.0)):
+        autoscaler = WorkerAutoscaler(worker_limit=config.getint('ExpertSettings', 'autoscaling_worker_limit'))
+        autoscaler.scale(plugins, {name: 1000 for name in plugins})
+    assert {decision['plugin'] for decision in autoscaler.get_decisions()} == scalable_plugins
+
+
+def test_memory_limit():
+    autoscaler = WorkerAutoscaler(worker_limit=10, memory_limit=90.0)
+    plugins = {'busy': PluginMock(2, 2)}
+    with mock.patch('psutil.virtual_memory', lambda: MemoryUsage(95.0)):
+        autoscaler.scale(plugins, {'busy': 100})
+    assert plugins['busy'].thread_count == 2
+    assert autoscaler.get_decisions() == []
@@ -0,0 +1,77 @@
+# pylint: disable=protected-access,redefined-outer-name
+from time import sleep, time
+from unittest import mock
+
+import pytest
+
+from objects.file import FileObject
+from objects.firmware import Firmware
+from scheduler.analysis_status import AnalysisStatus
+
+
+@pytest.fixture
+def status():
+    with mock.patch(target='scheduler.analysis_status.AnalysisStatus.__init__', new=lambda *_: None):
+        analysis_status = AnalysisStatus()
+    analysis_status.currently_running = {}
+    yield analysis_status
+
+
+def test_add_firmware(status):
+    status._add_firmware('fw_uid', ['foo', 'bar'])
+    assert status.currently_running == {'fw_uid': {'foo', 'bar'}}
+
+
+def test_add_firmware_without_files(status):
+    status._add_firmware('fw_uid', [])
+    assert status.currently_running == {}
+
+
+def test_add_files(status):
+    status.currently_running = {'parent_uid': {'foo', 'bar'}}
+    status._add_files(['bar', 'new'], ['parent_uid', 'other_uid'])
+    assert status.currently_running == {'parent_uid': {'bar', 'foo', 'new'}}
+
+
+def test_remove_partial(status):
+    status.currently_running = {'parent_uid': {'foo', 'bar'}}
+    status._remove_file('foo', ['parent_uid'])
+    assert status.currently_running == {'parent_uid': {'bar'}}
+
+
+def test_remove_fully(status):
+    status.currently_running = {'parent_uid': {'foo'}}
+    status._remove_file('foo', ['parent_uid'])
+    assert status.currently_running == {}
+
+
+def _wait_for_snapshot(status, expected, timeout=5):
+    start = time()
+    while status.get_current_analyses() != expected and time() - start < timeout:
+        sleep(0.05)
+    return status.get_current_analyses()
+
+
+def test_status_worker():
+    status = AnalysisStatus(block_delay=0.05, snapshot_interval=0.05)
+    try:
+        fw = Firmware(binary=b'firmware')
+        fw.files_included = ['foo', 'bar']
+        status.add_object(fw)
+        assert _wait_for_snapshot(status, {fw.uid: 2}) == {fw.uid: 2}
+
+        fo = FileObject(binary=b'foo')
+        fo.uid = 'foo'
+        fo.parent_firmware_uids = {fw.uid}
+        fo.files_included = ['child']
+        status.add_object(fo)
+        status.remove_object(fo)
+        assert _wait_for_snapshot(status, {fw.uid: 2}) == {fw.uid: 2}
+
+        for uid in ['bar', 'child']:
+            fo.uid = uid
+            status.remove_object(fo)
+        assert _wait_for_snapshot(status, {}) == {}
+        assert not status.check_exceptions()
+    finally:
+        status.shutdown()
@@ -0,0 +1,47 @@
+import pytest
+
+from storage.analysis_serializer import FALLBACK_SERIALIZER, SERIALIZERS, deserialize, get_serializer, serialize
+
+ANALYSIS_RESULT = {'strings': ['foo', 'bar'] * 1000, 'offsets': {'0': 1, '4': 2}, 'raw': b'\x00\xff', 'number': 42}
+
+
+class Unserializable:
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+@pytest.mark.parametrize('serializer', list(SERIALIZERS))
+def test_serialize_round_trip(serializer):
+    data, used_serializer = serialize(ANALYSIS_RESULT, serializer)
+    assert used_serializer == serializer
+    assert deserialize(data, used_serializer) == ANALYSIS_RESULT
+
+
+def test_compression():
+    assert len(serialize(ANALYSIS_RESULT, FALLBACK_SERIALIZER)[0]) < len(serialize(ANALYSIS_RESULT, 'pickle')[0]) / 10
+
+
+def test_legacy_format():
+    data, _ = serialize('single value', 'pickle')
+    assert deserialize(data, None) == 'single value'
+
+
+def test_fallback_for_unsupported_data():
+    pytest.importorskip('msgpack')
+    data, used_serializer = serialize({'object': Unserializable(1)}, 'msgpack_zstd')
+    assert used_serializer == FALLBACK_SERIALIZER
+    assert deserialize(data, used_serializer) == {'object': Unserializable(1)}
+
+
+def test_msgpack_converts_sets():
+    pytest.importorskip('msgpack')
+    data, used_serializer = serialize({'set': {1}}, 'msgpack_zstd')
+    assert deserialize(data, used_serializer) == {'set': [1]}
+
+
+def test_get_serializer():
+    assert get_serializer('pickle') == 'pickle'
+    assert get_serializer('unknown') == FALLBACK_SERIALIZER
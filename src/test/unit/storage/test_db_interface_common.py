@@ -43,3 +43,16 @@ def test_convert_to_firmware(input_data, expected):
     test_interface = CommonDbInterfaceMock()
     result = test_interface._convert_to_firmware(input_data, analysis_filter=None)
     assert result.part == expected
+
+
+@pytest.mark.parametrize('analysis_key, value, expected', [
+    ('result', 'plugin_result_uid', True),
+    ('result', {'some': 'dict'}, False),
+    ('summary', ['a', 'b'], False),
+    ('summary', 'plugin_summary_uid', True),
+    ('plugin_version', '1.0', False),
+    ('plugin_version', 'plugin_plugin_version_uid', True),
+    ('system_version', None, False),
+])
+def test_is_sanitized_file_name(analysis_key, value, expected):
+    assert CommonDbInterfaceMock._is_sanitized_file_name('plugin', analysis_key, value) == expected  # pylint: disable=protected-access
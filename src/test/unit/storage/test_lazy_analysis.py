@@ -0,0 +1,75 @@
+import json
+import pickle
+from copy import deepcopy
+
+import pytest
+
+from storage.lazy_analysis import LazyAnalysisResult
+
+
+class FileLoaderMock:
+    def __init__(self):
+        self.loaded_files = []
+
+    def __call__(self, file_name):
+        self.loaded_files.append(file_name)
+        if file_name == 'missing_file':
+            raise IOError('file not found')
+        if file_name == 'legacy_file':
+            return 'legacy value', False
+        return {'strings': ['foo', 'bar'], 'offsets': [0, 4]}, True
+
+
+@pytest.fixture
+def loader():
+    return FileLoaderMock()
+
+
+@pytest.fixture
+def lazy_result(loader):
+    entry = {'summary': ['foo'], 'plugin_version': '1.0', 'strings': 'result_file', 'offsets': 'result_file', 'legacy': 'legacy_file'}
+    return LazyAnalysisResult(entry, ['strings', 'offsets', 'legacy'], loader)
+
+
+def test_inline_fields_do_not_load_files(lazy_result, loader):
+    assert lazy_result['summary'] == ['foo']
+    assert lazy_result.get('plugin_version') == '1.0'
+    assert 'strings' in lazy_result
+    assert sorted(lazy_result) == ['legacy', 'offsets', 'plugin_version', 'strings', 'summary']
+    assert loader.loaded_files == []
+
+
+def test_sanitized_fields_are_loaded_on_access(lazy_result, loader):
+    assert lazy_result['strings'] == ['foo', 'bar']
+    assert lazy_result['strings'] == ['foo', 'bar']
+    assert loader.loaded_files == ['result_file']
+    assert lazy_result.get('legacy') == 'legacy value'
+    assert loader.loaded_files == ['result_file', 'legacy_file']
+
+
+def test_overwritten_fields_are_not_loaded(lazy_result, loader):
+    lazy_result['strings'] = []
+    lazy_result.update(offsets=[])
+    assert lazy_result.pop('legacy', None) == 'legacy value'
+    assert lazy_result.copy() == {'summary': ['foo'], 'plugin_version': '1.0', 'strings': [], 'offsets': []}
+    assert loader.loaded_files == ['legacy_file']
+
+
+@pytest.mark.parametrize('convert', [
+    dict, lambda result: {**result}, deepcopy, lambda result: pickle.loads(pickle.dumps(result)), lambda result: json.loads(json.dumps(result))
+])
+def test_conversions_load_all_fields(lazy_result, convert):
+    expected_result = {'summary': ['foo'], 'plugin_version': '1.0', 'strings': ['foo', 'bar'], 'offsets': [0, 4], 'legacy': 'legacy value'}
+    assert convert(lazy_result) == expected_result
+    assert lazy_result == expected_result
+
+
+def test_pickled_result_is_plain_dict(lazy_result):
+    assert type(pickle.loads(pickle.dumps(lazy_result))) is dict  # pylint: disable=unidiomatic-typecheck
+
+
+def test_missing_file(loader):
+    lazy_result = LazyAnalysisResult({'strings': 'missing_file'}, ['strings'], loader)
+    assert lazy_result['strings'] == 'missing_file'
+    assert lazy_result['strings'] == 'missing_file'
+    assert loader.loaded_files == ['missing_file']
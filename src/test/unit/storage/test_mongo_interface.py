@@ -0,0 +1,70 @@
+import os
+from configparser import ConfigParser
+
+import pytest
+
+from storage import mongo_interface
+from storage.mongo_interface import MongoInterface
+
+
+class MongoClientMock:
+    def __init__(self, uri, connect=True):
+        self.uri = uri
+        self.authenticated_users = []
+        self.admin = self
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def authenticate(self, user, pw, mechanism=None):
+        self.authenticated_users.append(user)
+
+
+class ReadOnlyInterface(MongoInterface):
+    READ_ONLY = True
+
+
+@pytest.fixture(autouse=True)
+def client_registry(monkeypatch):
+    monkeypatch.setattr(mongo_interface, 'MongoClient', MongoClientMock)
+    monkeypatch.setattr(mongo_interface, '_CLIENTS', {})
+
+
+@pytest.fixture
+def config():
+    config = ConfigParser()
+    config.add_section('data_storage')
+    for key, value in [('mongo_server', 'localhost'), ('mongo_port', '27018'), ('db_admin_user', 'admin'), ('db_admin_pw', 'admin_pw'),
+                       ('db_readonly_user', 'ro'), ('db_readonly_pw', 'ro_pw')]:
+        config.set('data_storage', key, value)
+    return config
+
+
+def test_client_is_reused_per_role(config):
+    first, second, read_only = MongoInterface(config), MongoInterface(config), ReadOnlyInterface(config)
+    assert first.client is second.client
+    assert read_only.client is not first.client
+    assert first.client.authenticated_users == ['admin']
+    assert read_only.client.authenticated_users == ['ro']
+
+
+def test_shutdown_keeps_pooled_client(config):
+    interface = MongoInterface(config)
+    interface.shutdown()
+    assert MongoInterface(config).client is interface.client
+
+
+def test_close_mongo_clients(config):
+    client = MongoInterface(config).client
+    mongo_interface.close_mongo_clients()
+    assert client.closed
+    assert MongoInterface(config).client is not client
+
+
+def test_new_client_after_fork(config, monkeypatch):
+    parent_client = MongoInterface(config).client
+    monkeypatch.setattr(mongo_interface, '_CLIENTS_PID', os.getpid() - 1)
+    child_client = MongoInterface(config).client
+    assert child_client is not parent_client
+    assert MongoInterface(config).client is child_client
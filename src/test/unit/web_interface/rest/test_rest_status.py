@@ -3,3 +3,10 @@ def test_empty_uid(test_app):
 
     assert result['status'] == 0
     assert result['system_status'] == {'backend': None, 'database': None, 'frontend': None}
+
+
+def test_plugin_metrics_without_backend_status(test_app):
+    result = test_app.get('/rest/status/plugins').json
+
+    assert result['status'] == 0
+    assert result['plugin_metrics'] == []
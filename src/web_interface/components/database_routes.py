@@ -21,6 +21,8 @@ from web_interface.components.component_base import ComponentBase
 from web_interface.security.decorator import roles_accepted
 from web_interface.security.privileges import PRIVILEGES
 
+PAGE_PLACEHOLDER = 'PAGE_NUMBER'
+
 
 class DatabaseRoutes(ComponentBase):
 
@@ -67,9 +69,9 @@ class DatabaseRoutes(ComponentBase):
         page, per_page = self._get_page_items()[0:2]
         search_parameters = self._get_search_parameters(query, only_firmwares, inverted)
         try:
-            firmware_list = self._search_database(
+            firmware_list, total, cursor = self._search_database(
                 search_parameters['query'], skip=per_page * (page - 1), limit=per_page,
-                only_firmwares=search_parameters['only_firmware'], inverted=search_parameters['inverted']
+                only_firmwares=search_parameters['only_firmware'], inverted=search_parameters['inverted'], after=self._get_keyset_cursor(page)
             )
             if self._query_has_only_one_result(firmware_list, search_parameters['query']):
                 return redirect(url_for('analysis/<uid>', uid=firmware_list[0][0]))
@@ -79,11 +81,10 @@ class DatabaseRoutes(ComponentBase):
             return render_template('error.html', message=error_message)
 
         with ConnectTo(FrontEndDbInterface, self._config) as connection:
-            total = connection.get_number_of_total_matches(search_parameters['query'], search_parameters['only_firmware'], inverted=search_parameters['inverted'])
             device_classes = connection.get_device_class_list()
             vendors = connection.get_vendor_list()
 
-        pagination = self._get_pagination(page=page, per_page=per_page, total=total, record_name='firmwares', )
+        pagination = self._get_pagination(page=page, per_page=per_page, total=total, record_name='firmwares', href=self._get_pagination_href(page, cursor))
         return render_template('database/database_browse.html',
                                firmware_list=firmware_list,
                                page=page,
@@ -117,19 +118,39 @@ class DatabaseRoutes(ComponentBase):
     def _query_has_only_one_result(result_list, query):
         return len(result_list) == 1 and query != '{}'
 
-    def _search_database(self, query, skip=0, limit=0, only_firmwares=False, inverted=False):
+    @staticmethod
+    def _get_keyset_cursor(page):
+        '''
+        the cursor of the previous page is only passed on with the links of the pagination and only valid for the next page:
+        for any other page (e.g. a jump to an arbitrary page number) None is returned and the page is fetched with skip
+        '''
+        try:
+            cursor_page, cursor = json.loads(request.args.get('after', 'null')) or (None, None)
+        except (TypeError, ValueError):
+            return None
+        return cursor if cursor_page == page - 1 else None
+
+    @staticmethod
+    def _get_pagination_href(page, cursor):
+        arguments = request.args.to_dict(flat=False)
+        arguments.update(request.view_args or {})
+        arguments.update({'page': PAGE_PLACEHOLDER, 'after': json.dumps([page, cursor])})
+        return url_for(request.endpoint, **arguments).replace(PAGE_PLACEHOLDER, '{0}')
+
+    def _search_database(self, query, skip=0, limit=0, only_firmwares=False, inverted=False, after=None):
+        '''
+        returns the meta data of one page of matches, the total number of matches and the cursor of the page
+        '''
         sorted_meta_list = list()
         with ConnectTo(FrontEndDbInterface, self._config) as connection:
-            result = connection.generic_search(query, skip, limit, only_fo_parent_firmware=only_firmwares, inverted=inverted)
-            if not isinstance(result, list):
-                raise Exception(result)
+            result, total, cursor = connection.search_page(query, skip, limit, only_fo_parent_firmware=only_firmwares, inverted=inverted, after=after)
             if query not in ('{}', {}):
                 firmware_list = [connection.firmwares.find_one(uid) or connection.file_objects.find_one(uid) for uid in result]
             else:  # if search query is empty: get only firmware objects
                 firmware_list = [connection.firmwares.find_one(uid) for uid in result]
             sorted_meta_list = sorted(connection.get_meta_list(firmware_list), key=lambda x: x[1].lower())
 
-        return sorted_meta_list
+        return sorted_meta_list, total, cursor
 
     def _build_search_query(self):
         query = {}
@@ -4,6 +4,7 @@ from helperFunctions.database import ConnectTo
 from helperFunctions.web_interface import apply_filters_to_query
 from intercom.front_end_binding import InterComFrontEndBinding
 from statistic.update import StatisticUpdater
+from statistic.work_load import get_plugin_runtime_ranking
 from storage.db_interface_frontend import FrontEndDbInterface
 from storage.db_interface_statistic import StatisticDbViewer
 from web_interface.components.component_base import ComponentBase
@@ -41,7 +42,10 @@ class StatisticRoutes(ComponentBase):
         with ConnectTo(InterComFrontEndBinding, self._config) as sc:
             plugin_dict = sc.get_available_analysis_plugins()
 
-        return render_template("system_health.html", status=status, analysis_plugin_info=plugin_dict)
+        backend_status = status[components.index('backend')]
+        plugin_metrics = get_plugin_runtime_ranking(backend_status.get('analysis') if backend_status else None)
+
+        return render_template("system_health.html", status=status, analysis_plugin_info=plugin_dict, plugin_metrics=plugin_metrics)
 
     def _get_stats_from_db(self):
         with ConnectTo(StatisticDbViewer, self._config) as stats_db:
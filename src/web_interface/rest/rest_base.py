@@ -10,7 +10,7 @@ from web_interface.rest.rest_compare import RestCompare
 from web_interface.rest.rest_file_object import RestFileObject
 from web_interface.rest.rest_firmware import RestFirmware
 from web_interface.rest.rest_missing_analyses import RestMissingAnalyses
-from web_interface.rest.rest_statistic import RestStatus
+from web_interface.rest.rest_statistic import RestPluginMetrics, RestStatus
 
 
 class RestBase:
@@ -23,6 +23,7 @@ class RestBase:
         self.api.add_resource(RestFirmware, '/rest/firmware', '/rest/firmware/<uid>', methods=['GET', 'PUT'], resource_class_kwargs={'config': config})
         self.api.add_resource(RestMissingAnalyses, RestMissingAnalyses.URL, methods=['GET'], resource_class_kwargs={'config': config})
         self.api.add_resource(RestStatus, '/rest/status', methods=['GET'], resource_class_kwargs={'config': config})
+        self.api.add_resource(RestPluginMetrics, RestPluginMetrics.URL, methods=['GET'], resource_class_kwargs={'config': config})
 
         self._wrap_response(self.api)
 
@@ -3,6 +3,7 @@ from flask_restful import Resource
 from helperFunctions.database import ConnectTo
 from helperFunctions.rest import error_message, success_message
 from intercom.front_end_binding import InterComFrontEndBinding
+from statistic.work_load import get_plugin_runtime_ranking
 from storage.db_interface_statistic import StatisticDbViewer
 from web_interface.security.decorator import roles_accepted
 from web_interface.security.privileges import PRIVILEGES
@@ -43,3 +44,17 @@ class RestStatus(Resource):
             plugins[name] = dict(description=description, version=version)
 
         return plugins
+
+
+class RestPluginMetrics(Resource):
+    URL = '/rest/status/plugins'
+
+    def __init__(self, **kwargs):
+        self.config = kwargs.get('config', None)
+
+    @roles_accepted(*PRIVILEGES['status'])
+    def get(self):
+        with ConnectTo(StatisticDbViewer, self.config) as stats_db:
+            backend_status = stats_db.get_statistic('backend')
+        analysis_workload = backend_status.get('analysis') if backend_status else None
+        return success_message({'plugin_metrics': get_plugin_runtime_ranking(analysis_workload)}, self.URL)